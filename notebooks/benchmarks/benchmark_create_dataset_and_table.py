@@ -0,0 +1,144 @@
+# Benchmark da carga de tabelas (create_dataset_and_table)
+#
+# Compara o caminho original (Polars -> Pandas -> lista de fatias -> load_table_from_dataframe)
+# com o caminho Arrow atual (fatias sem cópia -> Parquet -> load_table_from_file), medindo
+# linhas/s e pico de memória (RSS). O destino é o warehouse local do projeto (local_warehouse.py),
+# que grava Parquet em disco, de modo que o benchmark mede apenas o custo do lado do cliente, sem rede.
+# A opção --latencia simula o tempo de espera de cada job de carga no BigQuery, para medir o ganho dos envios simultâneos.
+#
+# Uso:
+#   python benchmark_create_dataset_and_table.py --linhas 3000000 --chunk-size 1000000 --latencia 2
+
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+
+import numpy as np
+import polars as pl
+
+from local_warehouse import LocalWarehouseClient
+from medicao import executar_em_processos, medir_pico_rss
+import utils
+from warehouse import bigquery, create_dataset_and_table, split_dataframe
+
+
+# Warehouse local do projeto com uma espera por job de carga, simulando o tempo de um job no BigQuery
+class ClienteWarehouseLocal(LocalWarehouseClient):
+    def __init__(self, pasta, latencia=0.0):
+        super().__init__(pasta)
+        self.latencia = latencia
+
+    def load_table_from_dataframe(self, dataframe, table_id, job_config=None, job_id=None):
+        job = super().load_table_from_dataframe(dataframe, table_id, job_config, job_id)
+        time.sleep(self.latencia)
+        return job
+
+    def load_table_from_file(self, file_obj, table_id, job_config=None, job_id=None):
+        job = super().load_table_from_file(file_obj, table_id, job_config, job_id)
+        time.sleep(self.latencia)
+        return job
+
+
+# Função que gera um DataFrame com o formato da silver.order
+def gerar_orders(linhas, seed=42):
+    rng = np.random.default_rng(seed)
+    inicio = np.datetime64("2018-12-02T00:00:00", "us")
+    cidades = np.array(["Sao Paulo", "Rio De Janeiro", "Belo Horizonte", "Curitiba", "Recife", "Salvador"])
+
+    return pl.DataFrame({
+        "order_id": pl.int_range(0, linhas, eager=True).cast(pl.Utf8).str.zfill(12),
+        "order_created_at": inicio + rng.integers(0, 60 * 24 * 3600 * 10**6, linhas).astype("timedelta64[us]"),
+        "cpf": pl.Series(rng.integers(0, 10**11, linhas)).cast(pl.Utf8).str.zfill(11),
+        "customer_id": pl.Series(rng.integers(0, linhas // 3 + 1, linhas)).cast(pl.Utf8),
+        "customer_name": np.array(["Ana", "Bruno", "Carla", "Diego", "Eva"])[rng.integers(0, 5, linhas)],
+        "delivery_address_district": np.array(["Centro", "Moema", "Boa Viagem", "Savassi"])[rng.integers(0, 4, linhas)],
+        "delivery_address_city": cidades[rng.integers(0, len(cidades), linhas)],
+        "delivery_address_state": np.array(["SP", "RJ", "MG", "PR", "PE", "BA"])[rng.integers(0, 6, linhas)],
+        "delivery_address_country": np.full(linhas, "BR"),
+        "delivery_address_zip_code": rng.integers(10000, 99999, linhas),
+        "delivery_address_latitude": rng.uniform(-30, -3, linhas),
+        "delivery_address_longitude": rng.uniform(-60, -35, linhas),
+        "merchant_id": pl.Series(rng.integers(0, 50_000, linhas)).cast(pl.Utf8),
+        "merchant_latitude": rng.uniform(-30, -3, linhas),
+        "merchant_longitude": rng.uniform(-60, -35, linhas),
+        "merchant_timezone": np.full(linhas, "America/Sao_Paulo"),
+        "order_total_amount": rng.gamma(2, 30, linhas).round(2),
+        "order_scheduled": rng.random(linhas) < 0.05,
+        "origin_platform": np.array(["ANDROID", "IOS", "DESKTOP"])[rng.integers(0, 3, linhas)],
+    }).with_columns(pl.lit(datetime.datetime.now(datetime.UTC)).alias("insert_date"))
+
+
+# Implementação original de create_dataset_and_table (conversão para Pandas + split_dataframe)
+def carga_original(df, client, chunk_size):
+    df = df.to_pandas()
+    chunks = split_dataframe(df, chunk_size)
+    for chunk in chunks:
+        job_config = bigquery.LoadJobConfig(write_disposition=bigquery.WriteDisposition.WRITE_APPEND)
+        client.load_table_from_dataframe(chunk, "case-ifood-fsg.silver.order", job_config=job_config).result()
+    return len(df)
+
+
+def carga_arrow_sequencial(df, client, chunk_size):
+    create_dataset_and_table(df, "silver", "order", client, use_chunk=True, chunk_size=chunk_size, max_in_flight=1)
+    return df.height
+
+
+def carga_arrow_concorrente(df, client, chunk_size):
+    create_dataset_and_table(df, "silver", "order", client, use_chunk=True, chunk_size=chunk_size, max_in_flight=4)
+    return df.height
+
+
+VARIACOES = {
+    "pandas_original": carga_original,
+    "arrow_sequencial": carga_arrow_sequencial,
+    "arrow_concorrente": carga_arrow_concorrente,
+}
+
+
+def _executar_variacao(nome, linhas, chunk_size, latencia, fila):
+    df = gerar_orders(linhas)
+    pasta = tempfile.mkdtemp(prefix="warehouse_local_")
+    utils.pasta_manifestos_carga = os.path.join(pasta, "manifestos_carga")
+    try:
+        client = ClienteWarehouseLocal(pasta, latencia)
+        total, tempo, inicial, pico = medir_pico_rss(VARIACOES[nome], df, client, chunk_size)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    fila.put({
+        "variacao": nome,
+        "linhas": total,
+        "tempo_s": round(tempo, 3),
+        "linhas_por_s": round(total / tempo),
+        "rss_inicial_mb": round(inicial / 1024 ** 2, 1),
+        "pico_rss_mb": round(pico / 1024 ** 2, 1),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da carga de tabelas (create_dataset_and_table)")
+    parser.add_argument("--linhas", type=int, default=3_000_000)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos de espera simulados por job de carga")
+    args = parser.parse_args()
+
+    resultados = executar_em_processos(_executar_variacao, list(VARIACOES), args.linhas, args.chunk_size, args.latencia)
+    print(pl.DataFrame(resultados))
+
+    base = resultados[0]
+    for resultado in resultados[1:]:
+        print(
+            f"{resultado['variacao']}: {resultado['linhas_por_s'] / base['linhas_por_s']:.1f}x linhas/s, "
+            f"acréscimo de RSS {resultado['pico_rss_mb'] - resultado['rss_inicial_mb']:.0f} MB "
+            f"vs {base['pico_rss_mb'] - base['rss_inicial_mb']:.0f} MB ({base['variacao']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
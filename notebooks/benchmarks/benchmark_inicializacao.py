@@ -0,0 +1,177 @@
+# Benchmark da inicialização dos notebooks e do custo de obter o cliente do warehouse
+#
+# Importação a frio: cada conjunto de imports (o que um notebook de ETL, de análise ou de gráficos precisa) roda em
+# um processo novo, --repeticoes vezes, e o resultado é a mediana do tempo de importação. Todos os casos usam
+# 'from utils import ...', que funciona na versão atual e nas anteriores; com --pasta-utils é possível medir outra
+# cópia da pasta utils (ex.: de um commit anterior, com git worktree) e comparar.
+#
+# Cliente: compara a forma anterior de get_bq_client (lê o JSON da conta de serviço e cria um bigquery.Client, com uma
+# sessão HTTP própria, a cada chamada) com o registro de clientes do warehouse.py (um cliente por processo), em
+# --chamadas chamadas e também a partir de várias threads. A conta de serviço é falsa (chave RSA gerada na hora) e
+# nenhuma requisição é enviada ao GCP: o tempo medido é o do lado do cliente, e o número de sessões HTTP indica
+# quantos pools de conexão (e, no BigQuery real, quantos handshakes TLS) cada forma abre.
+# Consulta local: tempo por consulta no warehouse local, obtendo o cliente a cada consulta, como read_sales faz.
+#
+# Uso:
+#   python benchmark_inicializacao.py
+#   python benchmark_inicializacao.py --pasta-utils /tmp/versao_anterior/notebooks/utils --repeticoes 9
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PASTA_UTILS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils")
+
+# Imports medidos a frio, do mais leve ao mais pesado
+CASOS_IMPORTACAO = {
+    "utils": "import utils",
+    "etl_bronze": "from utils import get_bq_client, open_bucket_object, iter_csv_record_batches, load_record_batches",
+    "etl_silver": "from utils import get_bq_client, apply_schema, parse_order_items, transform_orders_to_parquet, send_parquets_to_bigquery",
+    "pipeline": "import pipeline",
+    "analytics": "from utils import read_sales, calculate_ab_metrics",
+    "plotting": "from utils import plt, sns",
+}
+
+
+### IMPORTAÇÃO A FRIO ###
+
+# Função que mede o tempo de 'comando' em um processo Python novo (None se o import falhar nessa versão)
+def medir_importacao(comando, pasta_utils):
+    codigo = (
+        "import sys, time\n"
+        f"sys.path.insert(0, {pasta_utils!r})\n"
+        "inicio = time.perf_counter()\n"
+        f"{comando}\n"
+        "print(time.perf_counter() - inicio)\n"
+    )
+    processo = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True)
+    if processo.returncode != 0:
+        return None
+    return float(processo.stdout.strip().splitlines()[-1])
+
+
+def benchmark_importacao(pasta_utils, repeticoes):
+    resultados = []
+    for caso, comando in CASOS_IMPORTACAO.items():
+        tempos = [medir_importacao(comando, pasta_utils) for _ in range(repeticoes)]
+        tempos = [tempo for tempo in tempos if tempo is not None]
+        resultados.append({
+            "caso": caso,
+            "importacao_ms": round(statistics.median(tempos) * 1000) if tempos else None,
+        })
+    return resultados
+
+
+### CLIENTE DO WAREHOUSE ###
+
+# Função que grava uma conta de serviço falsa (chave RSA nova), suficiente para criar as credenciais sem rede
+def gravar_conta_servico(caminho):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    chave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = chave.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump({
+            "type": "service_account",
+            "project_id": "benchmark",
+            "private_key_id": "0",
+            "private_key": pem,
+            "client_email": "benchmark@benchmark.iam.gserviceaccount.com",
+            "client_id": "0",
+            "token_uri": "https://oauth2.googleapis.com/token",
+        }, arquivo)
+
+
+# Implementação anterior de get_bq_client: nova leitura das credenciais e novo cliente a cada chamada
+def cliente_anterior(credencial_gcp, id_projeto):
+    from google.cloud import bigquery
+    from google.oauth2 import service_account
+
+    credencial = service_account.Credentials.from_service_account_file(credencial_gcp)
+    return bigquery.Client(credentials=credencial, project=id_projeto)
+
+
+# Função que mede o tempo por chamada de obter_cliente() e quantas sessões HTTP distintas foram abertas,
+# em 'chamadas' chamadas seguidas e em outras tantas espalhadas por 'threads' threads
+def medir_cliente(obter_cliente, chamadas, threads):
+    obter_cliente()  # Primeira chamada fora da medição: importa os SDKs nas duas formas
+
+    clientes = []
+    inicio = time.perf_counter()
+    for _ in range(chamadas):
+        clientes.append(obter_cliente())
+    tempo = time.perf_counter() - inicio
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        clientes += list(executor.map(lambda _: obter_cliente(), range(chamadas)))
+
+    return {
+        "ms_por_chamada": round(tempo / chamadas * 1000, 3),
+        "sessoes_http": len({id(cliente._http) for cliente in clientes}),
+    }
+
+
+def benchmark_cliente(chamadas, threads):
+    import utils
+    import warehouse
+
+    pasta = tempfile.mkdtemp(prefix="benchmark_inicializacao_")
+    utils.credencial_gcp = os.path.join(pasta, "conta_servico.json")
+    utils.id_projeto = "benchmark"
+    gravar_conta_servico(utils.credencial_gcp)
+
+    resultados = [
+        {"variacao": "anterior (novo cliente por chamada)", **medir_cliente(lambda: cliente_anterior(utils.credencial_gcp, utils.id_projeto), chamadas, threads)},
+        {"variacao": "registro (warehouse.get_bq_client)", **medir_cliente(lambda: warehouse.get_bq_client("bigquery"), chamadas, threads)},
+    ]
+
+    # Consulta no warehouse local, obtendo o cliente a cada consulta
+    from local_warehouse import LocalWarehouseClient
+
+    utils.pasta_warehouse_local = os.path.join(pasta, "warehouse_local")
+    for variacao, obter_cliente in [
+        ("anterior (novo cliente por chamada)", lambda: LocalWarehouseClient(utils.pasta_warehouse_local, project=utils.id_projeto)),
+        ("registro (warehouse.get_bq_client)", lambda: warehouse.get_bq_client("local")),
+    ]:
+        obter_cliente().query("SELECT 1 AS x").to_arrow()
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            obter_cliente().query("SELECT 1 AS x").to_arrow()
+        tempo = time.perf_counter() - inicio
+        resultados.append({"variacao": f"consulta local, {variacao}", "ms_por_chamada": round(tempo / chamadas * 1000, 3), "sessoes_http": None})
+
+    warehouse.reset_clients()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da inicialização dos notebooks e do custo de obter o cliente do warehouse")
+    parser.add_argument("--pasta-utils", default=PASTA_UTILS, help="pasta utils medida na importação a frio")
+    parser.add_argument("--repeticoes", type=int, default=5, help="processos novos por caso de importação")
+    parser.add_argument("--chamadas", type=int, default=50, help="chamadas de get_bq_client por variação")
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    import polars as pl
+
+    print(f"Importação a frio ({os.path.abspath(args.pasta_utils)}, mediana de {args.repeticoes} processos):")
+    print(pl.DataFrame(benchmark_importacao(os.path.abspath(args.pasta_utils), args.repeticoes)))
+
+    sys.path.insert(0, PASTA_UTILS)
+    print("Cliente do warehouse (pasta utils atual):")
+    with pl.Config(fmt_str_lengths=60):
+        print(pl.DataFrame(benchmark_cliente(args.chamadas, args.threads)))
+
+
+if __name__ == "__main__":
+    main()
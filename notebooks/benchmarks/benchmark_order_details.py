@@ -0,0 +1,149 @@
+# Benchmark da decodificação da coluna 'items' da camada silver (order_details)
+#
+# Compara o laço original (map_elements com safe_json_parse + iter_rows) com o caminho
+# vetorizado parse_order_items, medindo linhas/s e pico de memória (RSS) de cada um.
+# Cada variação roda em um processo separado para que o pico de memória de uma não
+# contamine a outra.
+#
+# Uso:
+#   python benchmark_order_details.py --linhas 500000 --perc-malformadas 0.05
+
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+
+import polars as pl
+
+from medicao import executar_em_processos, medir_pico_rss
+
+
+# Função que gera a coluna 'items' sintética, com uma fração de linhas no formato "sujo" do bronze
+def gerar_order_details(linhas, perc_malformadas, seed=42):
+    rng = random.Random(seed)
+    produtos = ["Pizza Calabresa", "X-Burguer", "Açaí 500ml", "Coca-Cola Lata", "Temaki Salmão", "Marmitex"]
+    garnish = ["Bacon", "Queijo Extra", "Granola", "Leite Ninho", "Cebola"]
+
+    items, order_ids, cpfs = [], [], []
+    for i in range(linhas):
+        itens_pedido = []
+        for seq in range(1, rng.randint(1, 4) + 1):
+            itens_pedido.append({
+                "name": rng.choice(produtos),
+                "quantity": float(rng.randint(1, 3)),
+                "sequence": seq,
+                "unitPrice": {"value": str(rng.randint(500, 9000)), "currency": "BRL"},
+                "addition": {"value": "0", "currency": "BRL"},
+                "discount": {"value": str(rng.choice([0, 0, 0, 500])), "currency": "BRL"},
+                "garnishItems": [
+                    {
+                        "name": rng.choice(garnish),
+                        "quantity": 1.0,
+                        "sequence": g,
+                        "unitPrice": {"value": str(rng.randint(100, 800)), "currency": "BRL"},
+                        "addition": {"value": "0", "currency": "BRL"},
+                        "discount": {"value": "0", "currency": "BRL"}
+                    }
+                    for g in range(1, rng.randint(0, 2) + 1)
+                ]
+            })
+        texto = json.dumps(itens_pedido, ensure_ascii=False)
+
+        # Formatos malformados encontrados no bronze: aspas externas e aspas escapadas
+        if rng.random() < perc_malformadas:
+            texto = '"' + texto.replace('"', '\\"') + '"' if rng.random() < 0.5 else '"' + texto.replace('"', '""') + '"'
+
+        items.append(texto)
+        order_ids.append(f"order_{i}")
+        cpfs.append(f"{rng.randint(0, 99999999999)}")
+
+    return pl.DataFrame({"order_id": order_ids, "cpf": cpfs, "items": items})
+
+
+# Implementação original da camada silver (célula com map_elements + iter_rows em chunks de 350k)
+def explode_laco_original(df_order_details, chunk_size=350_000):
+    from etl import safe_json_parse
+
+    partes = []
+    for start in range(0, df_order_details.height, chunk_size):
+        chunk = df_order_details.slice(start, chunk_size)
+        chunk = chunk.with_columns(pl.col("items").cast(pl.Utf8).str.strip_chars().alias("items_clean"))
+        chunk = chunk.with_columns(
+            pl.col("items_clean").map_elements(safe_json_parse, return_dtype=pl.Object).alias("parsed_items")
+        )
+        chunk_valid = chunk.filter(pl.col("parsed_items").is_not_null())
+
+        exploded_rows = []
+        for row in chunk_valid.iter_rows(named=True):
+            parsed_items = row["parsed_items"]
+            if not isinstance(parsed_items, list):
+                continue
+            for item in parsed_items:
+                for tipo, registro in [("principal", item)] + [("garnish", g) for g in item.get("garnishItems", [])]:
+                    exploded_rows.append({
+                        "order_id": row["order_id"],
+                        "cpf": row["cpf"],
+                        "name": str(registro.get("name", "")),
+                        "quantity": str(registro.get("quantity", "")),
+                        "sequence": str(registro.get("sequence", "")),
+                        "unitPrice": str(registro.get("unitPrice", {}).get("value", "")),
+                        "addition": str(registro.get("addition", {}).get("value", "")),
+                        "discount": str(registro.get("discount", {}).get("value", "")),
+                        "type": tipo
+                    })
+        if exploded_rows:
+            partes.append(pl.DataFrame(exploded_rows))
+
+    return pl.concat(partes)
+
+
+def explode_vetorizado(df_order_details):
+    from etl import parse_order_items
+
+    df_order_details_explodido, _ = parse_order_items(df_order_details)
+    return df_order_details_explodido
+
+
+VARIACOES = {
+    "laco_original": explode_laco_original,
+    "vetorizado": explode_vetorizado,
+}
+
+
+def _executar_variacao(nome, linhas, perc_malformadas, fila):
+    df_order_details = gerar_order_details(linhas, perc_malformadas)
+    resultado, tempo, inicial, pico = medir_pico_rss(VARIACOES[nome], df_order_details)
+    fila.put({
+        "variacao": nome,
+        "linhas_entrada": linhas,
+        "linhas_saida": resultado.height,
+        "tempo_s": round(tempo, 3),
+        "linhas_por_s": round(linhas / tempo),
+        "rss_inicial_mb": round(inicial / 1024 ** 2, 1),
+        "pico_rss_mb": round(pico / 1024 ** 2, 1),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da decodificação da coluna items (order_details)")
+    parser.add_argument("--linhas", type=int, default=200_000)
+    parser.add_argument("--perc-malformadas", type=float, default=0.05)
+    args = parser.parse_args()
+
+    resultados = executar_em_processos(_executar_variacao, list(VARIACOES), args.linhas, args.perc_malformadas)
+    print(pl.DataFrame(resultados))
+
+    base = resultados[0]
+    for resultado in resultados[1:]:
+        print(
+            f"{resultado['variacao']}: {resultado['linhas_por_s'] / base['linhas_por_s']:.1f}x linhas/s, "
+            f"acréscimo de RSS {resultado['pico_rss_mb'] - resultado['rss_inicial_mb']:.0f} MB "
+            f"vs {base['pico_rss_mb'] - base['rss_inicial_mb']:.0f} MB ({base['variacao']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+# Suíte de benchmarks dos caminhos críticos de analytics.py, etl.py e warehouse.py, com baselines e limites de regressão
+#
+# Casos:
+#   evaluation_metrics*       calculate_evaluation_metrics (total e por cidade da loja com filtro), _price_range e _delivery_time
+#   engagement_*              as 9 variações de calculate_engagement_custormers_* (2, 3 e 3+ pedidos; total, price_range e delivery_time)
+#   parse_order_items         decodificação vetorizada da coluna 'items' da bronze.orders, com a explosão dos itens e garnishItems
+#   safe_json_parse_laco      laço original da camada silver (safe_json_parse + iter_rows), limitado a --max-linhas-laco linhas
+#   create_dataset_and_table  carga da silver.order no warehouse local (local_warehouse.py), sem rede
+#
+# Os dados vêm do gerador determinístico (dados_sinteticos.py): são gravados uma vez em Parquet na --pasta-dados e
+# reaproveitados nas execuções seguintes. As análises recebem a gold.sales lida com read_sales (uma linha por pedido);
+# no modo "lazy" recebem o LazyFrame sem coletar, para escalas que não cabem em memória. Os casos da bronze.orders
+# processam os arquivos Parquet em lotes de --linhas-por-lote linhas, incluindo a leitura de cada lote.
+# Cada caso roda em um processo separado (ou no melhor de --processos processos, em máquinas com muita oscilação) e mede
+# linhas/s (mediana das execuções, repetindo o caso ao menos --repeticoes vezes e até somar --tempo-minimo segundos)
+# e o acréscimo de RSS (pico - inicial).
+#
+# Os resultados são comparados com baselines.json, na mesma escala e modo: queda de linhas/s acima de --tolerancia,
+# ou aumento do acréscimo de RSS acima de --tolerancia-rss (e de --min-rss-mb), é regressão, e o script termina com
+# código 1. --salvar-baseline grava os resultados da execução como a nova referência. Os baselines valem para a
+# máquina em que foram medidos: em outra máquina, grave baselines novos antes de comparar.
+#
+# Uso:
+#   python benchmark_suite.py --linhas 1000000
+#   python benchmark_suite.py --linhas 1000000 --salvar-baseline
+#   python benchmark_suite.py --linhas 100000000 --modo lazy --casos engagement evaluation_metrics
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+
+import polars as pl
+import pyarrow.parquet as pq
+
+from dados_sinteticos import gravar_parquet
+from local_warehouse import LocalWarehouseClient
+from medicao import executar_em_processos, medir_pico_rss
+import utils
+from analytics import (
+    calculate_engagement_custormers_three_orders,
+    calculate_engagement_custormers_three_orders_delivery_time,
+    calculate_engagement_custormers_three_orders_price_range,
+    calculate_engagement_custormers_three_plus_orders,
+    calculate_engagement_custormers_three_plus_orders_delivery_time,
+    calculate_engagement_custormers_three_plus_orders_price_range,
+    calculate_engagement_custormers_two_orders,
+    calculate_engagement_custormers_two_orders_delivery_time,
+    calculate_engagement_custormers_two_orders_price_range,
+    calculate_evaluation_metrics,
+    calculate_evaluation_metrics_delivery_time,
+    calculate_evaluation_metrics_price_range,
+    read_sales,
+)
+from etl import parse_order_items
+from warehouse import create_dataset_and_table
+
+CAMINHO_BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+cidades_filtro = ["SAO PAULO", "RIO DE JANEIRO", "CURITIBA"]
+
+
+### CASOS ###
+
+# Função que coleta o resultado quando a análise recebeu um LazyFrame (modo "lazy")
+def _coletar(resultado):
+    return resultado.collect() if isinstance(resultado, pl.LazyFrame) else resultado
+
+# Função que monta um caso de análise: a função recebe a gold.sales por pedido e os argumentos informados
+def _analise(funcao, *args):
+    return lambda data_frame: _coletar(funcao(data_frame, *args))
+
+# Função que lê os arquivos da bronze.orders em lotes de até 'linhas_por_lote' linhas (somente as colunas informadas)
+def _lotes(partes, colunas=None):
+    arquivos, linhas_por_lote = partes
+    for arquivo, linhas in arquivos:
+        for lote in pq.ParquetFile(arquivo).iter_batches(batch_size=min(linhas, linhas_por_lote), columns=colunas):
+            if linhas <= 0:
+                break
+            yield pl.from_arrow(lote).head(linhas)
+            linhas -= lote.num_rows
+
+# Função que monta um caso da bronze.orders: a função recebe um lote por vez, para que a memória não cresça com a escala
+def _por_lote(funcao, colunas):
+    def executar(partes):
+        for df in _lotes(partes, colunas):
+            funcao(df)
+    return executar
+
+# Laço original da camada silver (o mesmo de benchmark_order_details.py)
+def _laco_original(df_order_details):
+    from benchmark_order_details import explode_laco_original
+    return explode_laco_original(df_order_details)
+
+# Carga de todos os lotes na silver.order de um warehouse local temporário (uma carga por lote)
+def _carga_warehouse_local(partes):
+    pasta = tempfile.mkdtemp(prefix="warehouse_local_")
+    utils.pasta_manifestos_carga = os.path.join(pasta, "manifestos_carga")
+    try:
+        client = LocalWarehouseClient(pasta)
+        for df in _lotes(partes):
+            df = df.drop("items")
+            create_dataset_and_table(df, "silver", "order", client, use_chunk=True, chunk_size=1_000_000, max_in_flight=4)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+# Cada caso: (tabela de origem, função medida)
+CASOS = {
+    "evaluation_metrics": ("gold.sales", _analise(calculate_evaluation_metrics, None, None)),
+    "evaluation_metrics_cidades": ("gold.sales", _analise(calculate_evaluation_metrics, ["merchant_city"], cidades_filtro)),
+    "evaluation_metrics_price_range": ("gold.sales", _analise(calculate_evaluation_metrics_price_range, None)),
+    "evaluation_metrics_delivery_time": ("gold.sales", _analise(calculate_evaluation_metrics_delivery_time, None)),
+    "engagement_two_orders": ("gold.sales", _analise(calculate_engagement_custormers_two_orders, None, None)),
+    "engagement_two_orders_price_range": ("gold.sales", _analise(calculate_engagement_custormers_two_orders_price_range, None)),
+    "engagement_two_orders_delivery_time": ("gold.sales", _analise(calculate_engagement_custormers_two_orders_delivery_time, None)),
+    "engagement_three_orders": ("gold.sales", _analise(calculate_engagement_custormers_three_orders, None, None)),
+    "engagement_three_orders_price_range": ("gold.sales", _analise(calculate_engagement_custormers_three_orders_price_range, None)),
+    "engagement_three_orders_delivery_time": ("gold.sales", _analise(calculate_engagement_custormers_three_orders_delivery_time, None)),
+    "engagement_three_plus_orders": ("gold.sales", _analise(calculate_engagement_custormers_three_plus_orders, None, None)),
+    "engagement_three_plus_orders_price_range": ("gold.sales", _analise(calculate_engagement_custormers_three_plus_orders_price_range, None)),
+    "engagement_three_plus_orders_delivery_time": ("gold.sales", _analise(calculate_engagement_custormers_three_plus_orders_delivery_time, None)),
+    "parse_order_items": ("bronze.orders", _por_lote(parse_order_items, ["order_id", "cpf", "items"])),
+    "safe_json_parse_laco": ("bronze.orders", _por_lote(_laco_original, ["order_id", "cpf", "items"])),
+    "create_dataset_and_table": ("bronze.orders", _carga_warehouse_local),
+}
+
+
+### EXECUÇÃO DOS CASOS ###
+
+# Função que prepara a entrada do caso e retorna (entrada, linhas de entrada)
+def _preparar(nome, linhas, modo, pasta_dados, max_linhas_laco, linhas_por_lote):
+    tabela, _ = CASOS[nome]
+    arquivos = gravar_parquet(tabela, linhas, pasta_dados)
+
+    if tabela == "gold.sales":
+        lazy_frame = read_sales(source=arquivos)
+        if modo == "lazy":
+            return lazy_frame, linhas
+        data_frame = lazy_frame.collect()
+        return data_frame, data_frame.height
+
+    # bronze.orders: lista de (arquivo, linhas a ler), limitada no laço original, que é lento demais para as escalas maiores,
+    # e o tamanho dos lotes lidos de cada arquivo
+    restante = max_linhas_laco if nome == "safe_json_parse_laco" else None
+    partes = []
+    for arquivo in arquivos:
+        linhas_arquivo = pq.ParquetFile(arquivo).metadata.num_rows
+        if restante is not None:
+            linhas_arquivo = min(linhas_arquivo, restante)
+            restante -= linhas_arquivo
+        if linhas_arquivo > 0:
+            partes.append((arquivo, linhas_arquivo))
+    return (partes, linhas_por_lote), sum(linhas_arquivo for _, linhas_arquivo in partes)
+
+# Função que monta o resultado de um caso que falhou
+def _resultado_com_erro(nome, erro):
+    return {"caso": nome, "linhas": None, "tempo_s": None, "linhas_por_s": None, "acrescimo_rss_mb": None, "erro": erro}
+
+# Cada caso roda ao menos 'repeticoes' vezes e até somar 'tempo_minimo' segundos (no máximo 'max_repeticoes' vezes),
+# para que os casos de poucos milissegundos não oscilem de uma execução para outra; vale a mediana dos tempos
+def _executar_caso(nome, linhas, modo, pasta_dados, repeticoes, tempo_minimo, max_linhas_laco, linhas_por_lote, fila, max_repeticoes=50):
+    # Sempre publica um resultado na fila, mesmo com erro, para que o processo principal não fique esperando
+    try:
+        entrada, linhas_entrada = _preparar(nome, linhas, modo, pasta_dados, max_linhas_laco, linhas_por_lote)
+        tempos, acrescimos = [], []
+        while len(tempos) < repeticoes or (sum(tempos) < tempo_minimo and len(tempos) < max_repeticoes):
+            _, tempo, inicial, pico = medir_pico_rss(CASOS[nome][1], entrada)
+            tempos.append(tempo)
+            acrescimos.append(pico - inicial)
+
+        fila.put({
+            "caso": nome,
+            "linhas": linhas_entrada,
+            "tempo_s": round(statistics.median(tempos), 3),
+            "linhas_por_s": round(linhas_entrada / statistics.median(tempos)),
+            "acrescimo_rss_mb": round(max(acrescimos) / 1024 ** 2, 1),
+            "erro": None,
+        })
+    except Exception as e:
+        fila.put(_resultado_com_erro(nome, str(e)))
+
+
+# Função que combina as execuções de um caso em processos diferentes: vale o melhor resultado (maior linhas/s e menor
+# acréscimo de RSS), para descartar processos prejudicados por outra carga na máquina
+def _melhor_execucao(execucoes):
+    validas = [execucao for execucao in execucoes if execucao["erro"] is None]
+    if not validas:
+        return execucoes[0]
+
+    melhor = dict(min(validas, key=lambda execucao: execucao["tempo_s"]))
+    melhor["acrescimo_rss_mb"] = min(execucao["acrescimo_rss_mb"] for execucao in validas)
+    return melhor
+
+
+### BASELINES ###
+
+# Função que identifica a escala e o modo de uma execução nos baselines
+def _chave_baseline(linhas, modo):
+    return f"{linhas}_{modo}"
+
+# Função que lê os baselines gravados (dicionário vazio se o arquivo não existe)
+def ler_baselines(caminho=CAMINHO_BASELINES):
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+# Função que grava os resultados sem erro como baseline da escala e do modo (os demais baselines são mantidos)
+def salvar_baselines(resultados, linhas, modo, caminho=CAMINHO_BASELINES):
+    baselines = ler_baselines(caminho)
+    chave = _chave_baseline(linhas, modo)
+    baseline = baselines.get(chave, {})
+    baseline["_ambiente"] = {"cpus": os.cpu_count(), "polars": pl.__version__}
+
+    for resultado in resultados:
+        if resultado["erro"] is None:
+            baseline[resultado["caso"]] = {
+                "linhas": resultado["linhas"],
+                "linhas_por_s": resultado["linhas_por_s"],
+                "acrescimo_rss_mb": resultado["acrescimo_rss_mb"],
+            }
+
+    baselines[chave] = baseline
+    with open(caminho + ".tmp", "w", encoding="utf-8") as arquivo:
+        json.dump(baselines, arquivo, indent=2, sort_keys=True)
+    os.replace(caminho + ".tmp", caminho)
+    return caminho
+
+# Função que compara os resultados com o baseline da mesma escala e modo
+def comparar_baseline(resultados, baseline, tolerancia=0.3, tolerancia_rss=0.25, min_rss_mb=20):
+    """
+    Retorna um DataFrame com uma linha por caso e a coluna 'situacao': "ok", "regressao" (linhas/s caiu mais que
+    'tolerancia', ou o acréscimo de RSS subiu mais que 'tolerancia_rss' e mais que 'min_rss_mb'), "sem baseline"
+    ou "erro". O limite absoluto em MB evita acusar regressão nos casos que quase não alocam memória.
+    """
+    linhas = []
+    for resultado in resultados:
+        base = baseline.get(resultado["caso"])
+        linha = {
+            **resultado,
+            "base_linhas_por_s": base["linhas_por_s"] if base else None,
+            "base_acrescimo_rss_mb": base["acrescimo_rss_mb"] if base else None,
+            "variacao_linhas_por_s": None,
+            "situacao": "ok",
+        }
+
+        if resultado["erro"] is not None:
+            linha["situacao"] = "erro"
+        elif base is None:
+            linha["situacao"] = "sem baseline"
+        else:
+            linha["variacao_linhas_por_s"] = round(resultado["linhas_por_s"] / base["linhas_por_s"] - 1, 3)
+            aumento_rss = resultado["acrescimo_rss_mb"] - base["acrescimo_rss_mb"]
+            if linha["variacao_linhas_por_s"] < -tolerancia or (
+                aumento_rss > min_rss_mb and aumento_rss > tolerancia_rss * base["acrescimo_rss_mb"]
+            ):
+                linha["situacao"] = "regressao"
+
+        linhas.append(linha)
+
+    return pl.DataFrame(linhas, schema_overrides={"erro": pl.Utf8, "base_linhas_por_s": pl.Int64, "base_acrescimo_rss_mb": pl.Float64, "variacao_linhas_por_s": pl.Float64})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suíte de benchmarks dos caminhos críticos de analytics.py, etl.py e warehouse.py")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="linhas geradas da gold.sales e da bronze.orders")
+    parser.add_argument("--modo", choices=["eager", "lazy"], default="eager")
+    parser.add_argument("--casos", nargs="*", default=None, help="casos (ou prefixos de casos) a executar; todos se omitido")
+    parser.add_argument("--repeticoes", type=int, default=3, help="execuções mínimas de cada caso")
+    parser.add_argument("--tempo-minimo", type=float, default=2.0, help="segundos mínimos medidos por caso")
+    parser.add_argument("--processos", type=int, default=1, help="processos independentes por caso (vale o melhor)")
+    parser.add_argument("--max-linhas-laco", type=int, default=200_000)
+    parser.add_argument("--linhas-por-lote", type=int, default=250_000, help="linhas por lote nos casos da bronze.orders")
+    parser.add_argument("--pasta-dados", default=os.path.join(tempfile.gettempdir(), "case_ifood_dados_sinteticos"))
+    parser.add_argument("--tolerancia", type=float, default=0.3, help="queda máxima de linhas/s (fração)")
+    parser.add_argument("--tolerancia-rss", type=float, default=0.25, help="aumento máximo do acréscimo de RSS (fração)")
+    parser.add_argument("--min-rss-mb", type=float, default=20)
+    parser.add_argument("--salvar-baseline", action="store_true")
+    args = parser.parse_args()
+
+    casos = [nome for nome in CASOS if args.casos is None or any(nome.startswith(prefixo) for prefixo in args.casos)]
+    if not casos:
+        raise SystemExit(f"Nenhum caso encontrado. Opções: {list(CASOS)}")
+
+    # Gera os dados uma única vez, antes dos processos dos casos
+    for tabela in sorted({CASOS[nome][0] for nome in casos}):
+        print(f"Preparando {tabela} ({args.linhas:,} linhas) em {args.pasta_dados}")
+        gravar_parquet(tabela, args.linhas, args.pasta_dados)
+
+    nomes = [nome for nome in casos for _ in range(args.processos)]
+    execucoes = executar_em_processos(
+        _executar_caso, nomes, args.linhas, args.modo, args.pasta_dados, args.repeticoes, args.tempo_minimo, args.max_linhas_laco, args.linhas_por_lote
+    )
+    # Processos encerrados sem resultado (ex.: falta de memória) viram casos com erro
+    execucoes = [
+        execucao if execucao is not None else _resultado_com_erro(nome, "processo encerrado sem resultado (falta de memória?)")
+        for nome, execucao in zip(nomes, execucoes)
+    ]
+    resultados = [_melhor_execucao([execucao for execucao in execucoes if execucao["caso"] == nome]) for nome in casos]
+
+    baseline = ler_baselines().get(_chave_baseline(args.linhas, args.modo), {})
+    ambiente = baseline.get("_ambiente")
+    if ambiente and ambiente != {"cpus": os.cpu_count(), "polars": pl.__version__}:
+        print(f"Aviso: baseline medido em outro ambiente ({ambiente}); a comparação pode não ser válida.")
+
+    comparacao = comparar_baseline(resultados, baseline, args.tolerancia, args.tolerancia_rss, args.min_rss_mb)
+    with pl.Config(tbl_rows=-1, tbl_cols=-1, tbl_width_chars=200):
+        print(comparacao.drop("erro"))
+
+    for resultado in comparacao.filter(pl.col("situacao") == "erro").iter_rows(named=True):
+        print(f"Erro em {resultado['caso']}: {resultado['erro']}")
+
+    if args.salvar_baseline:
+        print(f"Baseline gravado em {salvar_baselines(resultados, args.linhas, args.modo)}")
+        return
+
+    regressoes = comparacao.filter(pl.col("situacao").is_in(["regressao", "erro"]))["caso"].to_list()
+    if regressoes:
+        print(f"Regressões encontradas: {regressoes}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
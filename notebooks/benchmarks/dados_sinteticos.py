@@ -0,0 +1,387 @@
+# Gerador determinístico de dados sintéticos com o formato das tabelas do projeto
+#
+# Tabelas disponíveis:
+#   gold.sales      uma linha por item do pedido (mesmas colunas da consulta da camada gold)
+#   bronze.orders   uma linha por pedido, com a coluna 'items' em JSON (inclusive nos formatos "sujos" do bronze:
+#                   aspas externas com \" ou "" e itens adicionais em garnishItems) e uma fração de pedidos duplicados
+#   bronze.consumer uma linha por cliente
+#   bronze.ab_test  uma linha por cliente, com o grupo do teste A/B
+#
+# Os dados são gerados em blocos de chunk_size linhas, cada um com a sua própria semente (seed, tabela, início do bloco),
+# então a mesma chamada gera sempre os mesmos dados e escalas de 1M a 100M de linhas cabem em memória quando os blocos
+# são gravados em Parquet um a um (gravar_parquet). Os atributos de clientes e lojas vêm de um hash do id, de modo que
+# um cliente tem o mesmo nome, grupo e idioma em todas as tabelas e em todos os blocos.
+#
+# Uso:
+#   python dados_sinteticos.py --tabela gold.sales --linhas 10000000 --pasta D:\dados_sinteticos
+
+import argparse
+import datetime
+import json
+import os
+import time
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+
+_INICIO_PEDIDOS = np.datetime64("2018-12-02T00:00:00", "us")
+_DURACAO_PEDIDOS_US = 8 * 7 * 24 * 3600 * 10**6  # 8 semanas de pedidos
+
+# Cidades (com o estado) e o peso de cada uma no total de pedidos
+_CIDADES = [
+    ("SAO PAULO", "SP", 0.30), ("RIO DE JANEIRO", "RJ", 0.16), ("BELO HORIZONTE", "MG", 0.08),
+    ("CURITIBA", "PR", 0.07), ("PORTO ALEGRE", "RS", 0.06), ("RECIFE", "PE", 0.06),
+    ("SALVADOR", "BA", 0.06), ("FORTALEZA", "CE", 0.05), ("BRASILIA", "DF", 0.05),
+    ("GOIANIA", "GO", 0.04), ("CAMPINAS", "SP", 0.04), ("MANAUS", "AM", 0.03)
+]
+_BAIRROS = ["Centro", "Moema", "Pinheiros", "Copacabana", "Savassi", "Boa Viagem", "Batel", "Meireles", "Asa Sul", "Bela Vista"]
+_NOMES = ["Ana", "Bruno", "Carla", "Diego", "Eduarda", "Fábio", "Gabriela", "Heitor", "Íris", "João", "Lívia", "Márcio", "Natália", "Otávio", "Paula", "Renato"]
+_IDIOMAS = ["pt-br", "pt-br", "pt-br", "pt-br", "en-us", "es-es"]
+_PLATAFORMAS = ["ANDROID", "ANDROID", "IOS", "IOS", "DESKTOP"]
+_PRODUTOS = ["Pizza Calabresa", "X-Burguer", "Açaí 500ml", "Coca-Cola Lata", "Temaki Salmão", "Marmitex", "Pastel de Queijo", "Yakisoba", "Combo \"Família\""]
+_GARNISH = ["Bacon", "Queijo Extra", "Granola", "Leite Ninho", "Cebola", "Molho Especial"]
+
+_ID_TABELAS = {"gold.sales": 1, "bronze.orders": 2, "bronze.consumer": 3, "bronze.ab_test": 4}
+
+
+### ATRIBUTOS DETERMINÍSTICOS POR ID ###
+
+# Função que espalha os bits de um inteiro de 64 bits (finalizador do splitmix64)
+def _mix64(valores):
+    valores = np.asarray(valores, dtype=np.uint64)
+    valores = valores ^ (valores >> np.uint64(30))
+    valores = valores * np.uint64(0xBF58476D1CE4E5B9)
+    valores = valores ^ (valores >> np.uint64(27))
+    valores = valores * np.uint64(0x94D049BB133111EB)
+    return valores ^ (valores >> np.uint64(31))
+
+# Função que retorna um número uniforme em [0, 1) para cada id, fixo para o mesmo (id, seed, sal)
+def _uniforme(ids, seed, sal):
+    with np.errstate(over="ignore"):
+        chave = np.asarray(ids, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15) + np.uint64(seed * 1000 + sal)
+        return (_mix64(chave) >> np.uint64(11)).astype(np.float64) / 2.0 ** 53
+
+# Função que retorna opcoes[indices] como Series (sem criar arrays de texto do numpy, que são lentos para converter)
+def _valores(opcoes, indices):
+    return pl.Series(list(opcoes)).gather(np.asarray(indices, dtype=np.int64))
+
+# Função que escolhe o índice de uma das 'quantidade' opções para cada id (com 'pesos', quando informados)
+def _escolher(ids, quantidade, seed, sal, pesos=None):
+    u = _uniforme(ids, seed, sal)
+    if pesos is None:
+        return (u * quantidade).astype(np.int64)
+    acumulado = np.cumsum(pesos) / np.sum(pesos)
+    return np.minimum(np.searchsorted(acumulado, u, side="right"), quantidade - 1)
+
+# Função que formata ids numéricos como texto de tamanho fixo (ex.: 'c0000001234')
+def _formatar_ids(ids, prefixo, largura):
+    return (pl.lit(prefixo) + pl.Series(ids, dtype=pl.Int64).cast(pl.Utf8).str.zfill(largura)).alias("_id")
+
+# Função que monta os atributos dos clientes (os mesmos em orders, consumer e ab_test)
+def _clientes(ids, seed):
+    cidade = (_uniforme(ids, seed, 1) * len(_CIDADES)).astype(np.int64)
+    return pl.DataFrame({
+        "customer_id": pl.select(_formatar_ids(ids, "c", 10)).to_series(),
+        "customer_name": _valores(_NOMES, _escolher(ids, len(_NOMES), seed, 2)),
+        "language": _valores(_IDIOMAS, _escolher(ids, len(_IDIOMAS), seed, 3)),
+        "created_at": np.datetime64("2017-01-01T00:00:00", "us") + (_uniforme(ids, seed, 4) * 700 * 86400 * 10**6).astype("timedelta64[us]"),
+        "active": _uniforme(ids, seed, 5) < 0.9,
+        "customer_phone_area": pl.Series((11 + _uniforme(ids, seed, 6) * 88).astype(np.int64)).cast(pl.Utf8),
+        "customer_phone_number": pl.Series((900000000 + _uniforme(ids, seed, 7) * 99999999).astype(np.int64)).cast(pl.Utf8),
+        "is_target": _valores(["control", "target"], _uniforme(ids, seed, 8) < 0.55),
+        "_cidade": cidade
+    })
+
+# Função que monta os atributos das lojas
+def _lojas(ids, seed):
+    cidade = _escolher(ids, len(_CIDADES), seed, 11, [peso for _, _, peso in _CIDADES])
+    price_range = 1 + (_uniforme(ids, seed, 12) * 5).astype(np.int64)
+    return pl.DataFrame({
+        "merchant_id": pl.select(_formatar_ids(ids, "m", 8)).to_series(),
+        "merchant_created_at": np.datetime64("2016-01-01T00:00:00", "us") + (_uniforme(ids, seed, 13) * 900 * 86400 * 10**6).astype("timedelta64[us]"),
+        "merchant_enabled": _uniforme(ids, seed, 14) < 0.95,
+        "price_range": price_range,
+        "average_ticket": (15 * price_range + _uniforme(ids, seed, 15) * 40).round(0),
+        "takeout_time": (_uniforme(ids, seed, 16) * 40).astype(np.int64),
+        "delivery_time": (10 + _uniforme(ids, seed, 17) * 80).astype(np.int64),
+        "minimum_order_value": (_uniforme(ids, seed, 18) * 30).round(0),
+        "merchant_city": _valores([cidade for cidade, _, _ in _CIDADES], cidade),
+        "merchant_state": _valores([estado for _, estado, _ in _CIDADES], cidade),
+        "_cidade": cidade
+    })
+
+
+### BLOCOS DE CADA TABELA ###
+
+# Função que gera os pedidos de um bloco (nível de pedido, com os atributos do cliente e da loja)
+def _pedidos(rng, inicio, linhas, clientes, lojas, seed):
+    ids_pedidos = np.arange(inicio, inicio + linhas, dtype=np.int64)
+
+    # Poucos clientes concentram muitos pedidos (u² favorece os ids menores), para haver clientes com 1, 2, 3 ou mais pedidos
+    ids_clientes = (rng.random(linhas) ** 2 * clientes).astype(np.int64)
+    ids_lojas = (rng.random(linhas) ** 1.5 * lojas).astype(np.int64)
+
+    df_clientes = _clientes(ids_clientes, seed)
+    df_lojas = _lojas(ids_lojas, seed)
+
+    # Na maior parte dos pedidos o endereço de entrega fica na cidade da loja; nos demais, na cidade do cliente
+    cidade_entrega = np.where(rng.random(linhas) < 0.9, df_lojas["_cidade"].to_numpy(), df_clientes["_cidade"].to_numpy())
+
+    agendado = rng.random(linhas) < 0.05
+    criado_em = _INICIO_PEDIDOS + rng.integers(0, _DURACAO_PEDIDOS_US, linhas).astype("timedelta64[us]")
+
+    return pl.DataFrame({
+        "order_id": pl.select(_formatar_ids(ids_pedidos, "o", 12)).to_series(),
+        "order_created_at": criado_em,
+        "order_total_amount": (rng.gamma(2.0, 18.0, linhas) + 10 * df_lojas["price_range"].to_numpy()).round(2),
+        "customer_id": df_clientes["customer_id"],
+        "cpf": pl.Series(rng.integers(0, 10**11, linhas)).cast(pl.Utf8).str.zfill(11),
+        "customer_name": df_clientes["customer_name"],
+        "delivery_address_district": _valores(_BAIRROS, rng.integers(0, len(_BAIRROS), linhas)),
+        "delivery_address_city": _valores([cidade for cidade, _, _ in _CIDADES], cidade_entrega),
+        "delivery_address_state": _valores([estado for _, estado, _ in _CIDADES], cidade_entrega),
+        "delivery_address_country": _valores(["BR"], np.zeros(linhas)),
+        "delivery_address_zip_code": rng.integers(10000, 99999, linhas),
+        "delivery_address_latitude": rng.uniform(-30, -3, linhas).round(6),
+        "delivery_address_longitude": rng.uniform(-60, -35, linhas).round(6),
+        "merchant_id": df_lojas["merchant_id"],
+        "merchant_latitude": rng.uniform(-30, -3, linhas).round(6),
+        "merchant_longitude": rng.uniform(-60, -35, linhas).round(6),
+        "merchant_timezone": _valores(["America/Sao_Paulo"], np.zeros(linhas)),
+        "order_scheduled": agendado,
+        "order_scheduled_date": np.where(agendado, criado_em + np.timedelta64(2 * 3600 * 10**6, "us"), np.datetime64("NaT", "us")),
+        "origin_platform": _valores(_PLATAFORMAS, rng.integers(0, len(_PLATAFORMAS), linhas))
+    }), df_clientes, df_lojas
+
+# Função que gera os itens de cada pedido (itens principais e garnish), um item por linha
+def _itens(rng, pedidos):
+    quantidade_itens = rng.choice([1, 1, 1, 2, 2, 3, 4], pedidos)
+    pedido = np.repeat(np.arange(pedidos), quantidade_itens)
+    inicio_pedido = np.repeat(np.cumsum(quantidade_itens) - quantidade_itens, quantidade_itens)
+    linhas = len(pedido)
+
+    return pl.DataFrame({
+        "_pedido": pedido,
+        "_item": np.arange(linhas),
+        "sequence": np.arange(linhas) - inicio_pedido + 1,
+        "name": _valores(_PRODUTOS, rng.integers(0, len(_PRODUTOS), linhas)),
+        "quantity": rng.integers(1, 4, linhas).astype(np.float64),
+        "unitPrice": rng.integers(500, 9000, linhas),
+        "addition": np.zeros(linhas, dtype=np.int64),
+        "discount": rng.choice([0, 0, 0, 500], linhas),
+        "_garnish": rng.choice([0, 0, 1, 2], linhas)
+    })
+
+# Função que gera os itens adicionais (garnishItems) de cada item
+def _garnish(rng, itens):
+    quantidade = itens["_garnish"].to_numpy()
+    item = np.repeat(itens["_item"].to_numpy(), quantidade)
+    inicio_item = np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+    linhas = len(item)
+
+    return pl.DataFrame({
+        "_item": item,
+        "sequence": np.arange(linhas) - inicio_item + 1,
+        "name": _valores(_GARNISH, rng.integers(0, len(_GARNISH), linhas)),
+        "quantity": np.ones(linhas),
+        "unitPrice": rng.integers(100, 800, linhas),
+        "addition": np.zeros(linhas, dtype=np.int64),
+        "discount": np.zeros(linhas, dtype=np.int64)
+    })
+
+# Função que junta (separados por ", ") grupos de textos consecutivos, com 'quantidades' textos em cada grupo
+def _juntar(textos, quantidades):
+    offsets = np.concatenate([[0], np.cumsum(quantidades)]).astype(np.int64)
+    valores = textos.cast(pl.Utf8).rechunk().to_arrow(compat_level=pl.CompatLevel.oldest())
+    listas = pa.LargeListArray.from_arrays(pa.array(offsets), valores)
+    return pl.Series(pc.binary_join(listas, pa.scalar(", ", pa.large_string())))
+
+# Função que monta o JSON de um item (mesmo formato do json.dumps usado pelo bronze); com garnish_items, inclui a lista garnishItems
+def _json_item(garnish_items=None):
+    valor = lambda coluna: pl.format('{"value": "{}", "currency": "BRL"}', pl.col(coluna).cast(pl.Utf8))
+    partes = [
+        # Aspas no nome do produto ficam escapadas (\"), como no json.dumps
+        pl.format('"name": "{}"', pl.col("name").str.replace_all('"', '\\"', literal=True)),
+        pl.format('"quantity": {}', pl.col("quantity").cast(pl.Utf8)),
+        pl.format('"sequence": {}', pl.col("sequence").cast(pl.Utf8)),
+        pl.format('"unitPrice": {}', valor("unitPrice")),
+        pl.format('"addition": {}', valor("addition")),
+        pl.format('"discount": {}', valor("discount"))
+    ]
+    if garnish_items is not None:
+        partes.append(pl.format('"garnishItems": [{}]', garnish_items))
+    return pl.concat_str([pl.lit("{"), pl.concat_str(partes, separator=", "), pl.lit("}")])
+
+# Função que gera um bloco da gold.sales: uma linha por item (principal ou garnish); pedidos sem detalhes têm uma linha
+# com as colunas do item nulas e has_details = False, como no LEFT JOIN da camada gold
+def _bloco_sales(rng, inicio, linhas, total, seed, clientes=None, lojas=50_000, perc_sem_detalhes=0.03):
+    # Cada pedido gera em média ~2,5 linhas; gera pedidos de sobra e corta o bloco em 'linhas'
+    pedidos = linhas // 2 + 1
+    df_pedidos, df_clientes, df_lojas = _pedidos(rng, inicio, pedidos, clientes or max(1, total // 8), lojas, seed)
+
+    itens = _itens(rng, pedidos)
+    garnish = _garnish(rng, itens)
+    colunas_item = ["_pedido", "sequence", "name", "quantity", "unitPrice", "addition", "discount"]
+
+    df_itens = pl.concat([
+        itens.select(colunas_item).with_columns(pl.lit("principal").alias("product_type"), pl.col("sequence").cast(pl.Int64)),
+        garnish.join(itens.select("_item", "_pedido"), on="_item", how="left").select(colunas_item).with_columns(
+            pl.lit("garnish").alias("product_type"), pl.col("sequence").cast(pl.Int64)
+        )
+    ]).sort("_pedido", maintain_order=True)
+
+    sem_detalhes = pl.Series(rng.random(pedidos) < perc_sem_detalhes)
+    df_itens = df_itens.with_columns(
+        sem_detalhes.gather(df_itens["_pedido"]).alias("_sem_detalhes")
+    ).filter(
+        ~pl.col("_sem_detalhes") | (pl.col("_pedido").is_first_distinct())
+    ).with_columns([
+        pl.when(~pl.col("_sem_detalhes")).then(pl.col(coluna)).alias(coluna)
+        for coluna in ["name", "quantity", "unitPrice", "addition", "discount", "product_type", "sequence"]
+    ]).head(linhas)
+
+    indices = df_itens["_pedido"]
+    pedidos_itens = df_pedidos.select(pl.all().gather(indices))
+    clientes_itens = df_clientes.drop("customer_id", "customer_name", "_cidade").select(pl.all().gather(indices))
+    lojas_itens = df_lojas.drop("merchant_id", "_cidade").select(pl.all().gather(indices))
+
+    return pl.concat([pedidos_itens, clientes_itens, lojas_itens, df_itens], how="horizontal").select([
+        "order_id", "order_created_at",
+        pl.col("name").alias("product"), "quantity",
+        (pl.col("unitPrice") / 100).alias("unitPrice"), (pl.col("addition") / 100).alias("addition"), (pl.col("discount") / 100).alias("discount"),
+        "order_total_amount", "product_type", "sequence", "customer_id", "cpf", "customer_name",
+        pl.col("created_at").alias("customer_created_at"), pl.col("active").alias("customer_active"),
+        pl.concat_str(["customer_phone_area", "customer_phone_number"], separator="-").alias("customer_phone"),
+        "is_target", pl.col("language").alias("customer_language"),
+        "delivery_address_district", "delivery_address_city", "delivery_address_state", "delivery_address_country",
+        "merchant_id", "merchant_created_at", "merchant_enabled", "price_range", "average_ticket", "takeout_time",
+        "delivery_time", "minimum_order_value", "merchant_city", "merchant_state",
+        (~pl.col("_sem_detalhes")).alias("has_details"),
+        "order_scheduled", "order_scheduled_date", "origin_platform"
+    ])
+
+# Função que gera um bloco da bronze.orders, com a coluna 'items' em JSON
+def _bloco_bronze_orders(rng, inicio, linhas, total, seed, clientes=None, lojas=50_000, perc_malformadas=0.05, perc_duplicados=0.02):
+    df_pedidos, _, _ = _pedidos(rng, inicio, linhas, clientes or max(1, total // 3), lojas, seed)
+
+    itens = _itens(rng, linhas)
+    garnish = _garnish(rng, itens)
+
+    # JSON de cada garnish -> lista de garnishItems de cada item -> JSON de cada item -> lista de itens do pedido
+    # (os garnish de um item e os itens de um pedido são linhas consecutivas, então as listas saem direto dos offsets)
+    garnish_items = _juntar(garnish.select(_json_item()).to_series(), itens["_garnish"].to_numpy())
+    json_itens = itens.with_columns(garnish_items.alias("_garnish_items")).select(_json_item(pl.col("_garnish_items"))).to_series()
+    items = "[" + _juntar(json_itens, np.bincount(itens["_pedido"].to_numpy(), minlength=linhas)) + "]"
+
+    # Formatos malformados encontrados no bronze: aspas externas com as aspas internas escapadas (\") ou dobradas ("")
+    # (a troca é feita somente nas linhas sorteadas)
+    sorteio = rng.random(linhas)
+    for indices, aspas in [
+        (np.flatnonzero(sorteio < perc_malformadas / 2), '\\"'),
+        (np.flatnonzero((sorteio >= perc_malformadas / 2) & (sorteio < perc_malformadas)), '""')
+    ]:
+        if len(indices):
+            items = items.scatter(indices, '"' + items.gather(indices).str.replace_all('"', aspas, literal=True) + '"')
+
+    df_orders = df_pedidos.with_columns(items.alias("items"))
+
+    # Pedidos duplicados: uma fração das linhas repete o order_id de outra linha do bloco (com outro cpf)
+    duplicados = np.flatnonzero(rng.random(linhas) < perc_duplicados)
+    if len(duplicados):
+        origem = rng.integers(0, linhas, len(duplicados))
+        order_ids = df_orders["order_id"].to_numpy().copy()
+        order_ids[duplicados] = order_ids[origem]
+        df_orders = df_orders.with_columns(pl.Series("order_id", order_ids))
+
+    return df_orders.with_columns(pl.lit(datetime.datetime(2019, 2, 1, tzinfo=datetime.timezone.utc)).alias("insert_date"))
+
+# Função que gera um bloco da bronze.consumer (clientes 'inicio' a 'inicio + linhas')
+def _bloco_consumer(rng, inicio, linhas, total, seed):
+    return _clientes(np.arange(inicio, inicio + linhas), seed).select([
+        "customer_id", "language", "created_at", "active", "customer_name", "customer_phone_area", "customer_phone_number"
+    ])
+
+# Função que gera um bloco da bronze.ab_test (clientes 'inicio' a 'inicio + linhas')
+def _bloco_ab_test(rng, inicio, linhas, total, seed):
+    return _clientes(np.arange(inicio, inicio + linhas), seed).select(["customer_id", "is_target"])
+
+GERADORES = {
+    "gold.sales": _bloco_sales,
+    "bronze.orders": _bloco_bronze_orders,
+    "bronze.consumer": _bloco_consumer,
+    "bronze.ab_test": _bloco_ab_test,
+}
+
+
+### GERAÇÃO EM BLOCOS E GRAVAÇÃO EM PARQUET ###
+
+# Função que gera a tabela em blocos de chunk_size linhas (um DataFrame por bloco)
+def iter_blocos(tabela, linhas, seed=42, chunk_size=1_000_000, **opcoes):
+    """
+    Cada bloco usa a semente (seed, tabela, início do bloco), então os mesmos parâmetros geram sempre os mesmos
+    dados, e blocos diferentes podem ser gerados separadamente. 'opcoes' vai para o gerador da tabela
+    (ex.: clientes, lojas, perc_malformadas, perc_duplicados). Em gold.sales e bronze.orders os clientes
+    vêm de 0 a 'clientes' (padrão: ~3 pedidos por cliente), os mesmos ids de bronze.consumer e bronze.ab_test.
+    """
+    if tabela not in GERADORES:
+        raise ValueError(f"Tabela desconhecida: {tabela}. Opções: {list(GERADORES)}")
+
+    for inicio in range(0, linhas, chunk_size):
+        rng = np.random.default_rng([seed, _ID_TABELAS[tabela], inicio])
+        yield GERADORES[tabela](rng, inicio, min(chunk_size, linhas - inicio), linhas, seed, **opcoes)
+
+# Função que gera a tabela inteira em memória
+def gerar_tabela(tabela, linhas, seed=42, chunk_size=1_000_000, **opcoes):
+    return pl.concat(list(iter_blocos(tabela, linhas, seed, chunk_size, **opcoes)))
+
+# Função que grava a tabela em arquivos 'part-*.parquet' (um por bloco), reaproveitando uma geração anterior igual
+def gravar_parquet(tabela, linhas, pasta, seed=42, chunk_size=1_000_000, **opcoes):
+    """
+    Grava em '{pasta}/{tabela}_{linhas}_{seed}/' e retorna a lista de arquivos. Um arquivo '_parametros.json' marca
+    a geração completa; se ele já existe com os mesmos parâmetros, os arquivos são reaproveitados sem gerar de novo.
+    """
+    pasta_tabela = os.path.join(pasta, f"{tabela.replace('.', '_')}_{linhas}_{seed}")
+    marcador = os.path.join(pasta_tabela, "_parametros.json")
+    parametros = {"tabela": tabela, "linhas": linhas, "seed": seed, "chunk_size": chunk_size, **opcoes}
+
+    if os.path.exists(marcador):
+        with open(marcador, encoding="utf-8") as arquivo:
+            if json.load(arquivo) == parametros:
+                return sorted(os.path.join(pasta_tabela, nome) for nome in os.listdir(pasta_tabela) if nome.endswith(".parquet"))
+        os.remove(marcador)
+
+    os.makedirs(pasta_tabela, exist_ok=True)
+    for nome in os.listdir(pasta_tabela):
+        if nome.endswith(".parquet"):
+            os.remove(os.path.join(pasta_tabela, nome))
+
+    arquivos = []
+    for indice, bloco in enumerate(iter_blocos(tabela, linhas, seed, chunk_size, **opcoes)):
+        caminho = os.path.join(pasta_tabela, f"part-{indice:05d}.parquet")
+        bloco.write_parquet(caminho)
+        arquivos.append(caminho)
+
+    with open(marcador, "w", encoding="utf-8") as arquivo:
+        json.dump(parametros, arquivo)
+
+    return arquivos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador determinístico de dados sintéticos")
+    parser.add_argument("--tabela", choices=list(GERADORES), required=True)
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--pasta", required=True)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    arquivos = gravar_parquet(args.tabela, args.linhas, args.pasta, args.seed, args.chunk_size)
+    print(f"{args.tabela}: {args.linhas:,} linhas em {len(arquivos)} arquivos ({time.perf_counter() - inicio:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
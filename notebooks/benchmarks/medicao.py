@@ -0,0 +1,69 @@
+# Funções auxiliares compartilhadas pelos benchmarks: medição de tempo e pico de memória (RSS)
+
+import multiprocessing
+import queue
+import threading
+import time
+
+
+# Função que executa 'funcao' medindo o tempo e o pico de RSS do processo (amostrado em uma thread paralela).
+# Usa o psutil quando disponível; caso contrário, recorre ao módulo resource (somente Linux/macOS).
+def medir_pico_rss(funcao, *args, **kwargs):
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    if psutil is None:
+        import resource
+        inicial = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        inicio = time.perf_counter()
+        resultado = funcao(*args, **kwargs)
+        tempo = time.perf_counter() - inicio
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return resultado, tempo, inicial, pico
+
+    processo = psutil.Process()
+    inicial = processo.memory_info().rss
+    pico = [inicial]
+    parar = threading.Event()
+
+    def amostrar():
+        while not parar.is_set():
+            pico[0] = max(pico[0], processo.memory_info().rss)
+            parar.wait(0.01)
+
+    thread = threading.Thread(target=amostrar, daemon=True)
+    thread.start()
+    inicio = time.perf_counter()
+    resultado = funcao(*args, **kwargs)
+    tempo = time.perf_counter() - inicio
+    parar.set()
+    thread.join()
+    return resultado, tempo, inicial, pico[0]
+
+
+# Função que executa cada variação em um processo novo (spawn), para que o pico de memória
+# de uma variação não contamine a outra. 'executar' recebe (nome, *args, fila) e publica um dicionário na fila.
+# Uma variação cujo processo termina sem publicar o resultado (ex.: encerrado por falta de memória) retorna None.
+def executar_em_processos(executar, nomes, *args):
+    contexto = multiprocessing.get_context("spawn")
+    fila = contexto.Queue()
+    resultados = []
+
+    for nome in nomes:
+        processo = contexto.Process(target=executar, args=(nome, *args, fila))
+        processo.start()
+
+        resultado = None
+        while resultado is None:
+            try:
+                resultado = fila.get(timeout=1)
+            except queue.Empty:
+                if not processo.is_alive() and fila.empty():
+                    break
+
+        resultados.append(resultado)
+        processo.join()
+
+    return resultados
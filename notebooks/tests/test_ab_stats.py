@@ -0,0 +1,68 @@
+# Testes do ab_stats.py (sem rede)
+#
+# Uso:
+#   python -m pytest notebooks/tests
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+
+import numpy as np
+import polars as pl
+import pytest
+from scipy import stats
+
+from ab_stats import ab_test_stats
+
+
+# Vendas com uma linha por pedido; o gasto do grupo target é um pouco maior em todas as cidades
+@pytest.fixture
+def vendas():
+    rng = np.random.default_rng(11)
+    pedidos = 3000
+    clientes = rng.integers(0, 900, pedidos)
+    is_target = np.where(clientes % 2 == 0, "target", "control")
+    return pl.DataFrame({
+        "order_id": [f"o{i}" for i in range(pedidos)],
+        "customer_id": [f"c{i}" for i in clientes],
+        "is_target": is_target,
+        "merchant_city": np.array(["Recife", "Natal", "Curitiba"])[clientes % 3],
+        "amount": rng.gamma(2.0, 30.0, pedidos) * np.where(is_target == "target", 1.1, 1.0)
+    })
+
+
+def test_welch_igual_ao_scipy(vendas):
+    resultado = ab_test_stats(vendas, "merchant_city", alpha=0.1)
+    assert resultado.height == 3
+
+    gasto_por_cliente = vendas.group_by("merchant_city", "is_target", "customer_id").agg(pl.col("amount").sum())
+    for linha in resultado.iter_rows(named=True):
+        gastos = gasto_por_cliente.filter(pl.col("merchant_city") == linha["merchant_city"])
+        target = gastos.filter(pl.col("is_target") == "target")["amount"].to_numpy()
+        control = gastos.filter(pl.col("is_target") == "control")["amount"].to_numpy()
+
+        esperado = stats.ttest_ind(target, control, equal_var=False)
+        intervalo = esperado.confidence_interval(0.9)
+
+        assert linha["unique_customers_target"] == len(target)
+        assert linha["unique_customers_control"] == len(control)
+        assert linha["arpu_absolute_diff"] == pytest.approx(target.mean() - control.mean())
+        assert linha["t_statistic"] == pytest.approx(esperado.statistic)
+        assert linha["welch_df"] == pytest.approx(esperado.df)
+        assert linha["p_value"] == pytest.approx(esperado.pvalue)
+        assert (linha["ci_low"], linha["ci_high"]) == pytest.approx((intervalo.low, intervalo.high))
+
+
+def test_total_sem_recorte_igual_ao_scipy(vendas):
+    linha = ab_test_stats(vendas).row(0, named=True)
+
+    gastos = vendas.group_by("is_target", "customer_id").agg(pl.col("amount").sum())
+    esperado = stats.ttest_ind(
+        gastos.filter(pl.col("is_target") == "target")["amount"].to_numpy(),
+        gastos.filter(pl.col("is_target") == "control")["amount"].to_numpy(),
+        equal_var=False
+    )
+
+    assert linha["t_statistic"] == pytest.approx(esperado.statistic)
+    assert linha["p_value"] == pytest.approx(esperado.pvalue)
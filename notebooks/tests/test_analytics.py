@@ -0,0 +1,154 @@
+# Testes do analytics.py (sem rede)
+#
+# Uso:
+#   python -m pytest notebooks/tests
+
+import datetime
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+
+import numpy as np
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+import sqlglot
+from sqlglot import exp
+
+from analytics import _build_sales_query, calculate_ab_metrics, calculate_ab_metrics_rollup, grouping_sets_cube, quantile_bucket, read_sales
+from local_warehouse import LocalWarehouseClient
+from warehouse import create_dataset_and_table
+
+
+# Resumo por cliente no formato da gold.customer_summary (somente as colunas usadas nas métricas)
+@pytest.fixture
+def resumo():
+    return pl.DataFrame({
+        "customer_id": ["c1", "c2", "c3"],
+        "is_target": ["target", "control", "target"],
+        "merchant_city": ["Recife", "Curitiba", "Recife"],
+        "orders": [1, 2, 4],
+        "revenue": [10.0, 30.0, 80.0],
+    })
+
+
+def test_resumo_por_cliente_com_colunas_do_resumo(resumo):
+    metricas = calculate_ab_metrics(resumo, "merchant_city", filter_cities=["Recife"])
+    assert metricas.select("is_target", "merchant_city", "orders", "unique_customers").rows() == [("target", "Recife", 5, 2)]
+
+
+@pytest.mark.parametrize("argumentos", [
+    {"columns_groupby": "price_range"},
+    {"filter_cities": ["Recife"]},
+])
+def test_resumo_por_cliente_recusa_colunas_fora_do_resumo(resumo, argumentos):
+    with pytest.raises(ValueError, match="resumo por cliente"):
+        calculate_ab_metrics(resumo.drop("merchant_city"), **argumentos)
+
+
+# Encadeamento when/then com quantile usado antes de quantile_bucket (as faixas eram Q1..Q4)
+def _faixas_encadeamento_original(column, n):
+    expressao = pl.when(pl.col(column) <= pl.col(column).quantile(1 / n)).then(pl.lit("Q1"))
+    for i in range(2, n):
+        expressao = expressao.when(pl.col(column) <= pl.col(column).quantile(i / n)).then(pl.lit(f"Q{i}"))
+    return expressao.otherwise(pl.lit(f"Q{n}"))
+
+
+@pytest.mark.parametrize("n", [4, 5])
+def test_faixas_iguais_ao_encadeamento_original(n):
+    # Muitos valores repetidos (pontos de corte empatados) e nulos, que ficavam na última faixa
+    df = pl.DataFrame({
+        "merchant_city": ["Recife", "Natal"] * 30,
+        "delivery_time": [None, 10, 10, 10, 10, 10, 20, 20, 30, 45] * 6
+    })
+
+    faixas = df.select(quantile_bucket(df, "delivery_time", n=n))["delivery_time_category"]
+    assert faixas.to_list() == df.select(_faixas_encadeamento_original("delivery_time", n))["literal"].to_list()
+    assert faixas.null_count() == 0
+
+    recife = df.filter(pl.col("merchant_city") == "Recife")
+    faixas = recife.select(quantile_bucket(df, "delivery_time", n=n, filter_cities=["Recife"], alias="faixa"))["faixa"]
+    assert faixas.to_list() == recife.select(_faixas_encadeamento_original("delivery_time", n))["literal"].to_list()
+
+
+# Vendas com uma linha por pedido (clientes com 1 a vários pedidos, em cidades e ranges de preço diferentes)
+@pytest.fixture
+def vendas():
+    rng = np.random.default_rng(7)
+    pedidos = 600
+    return pl.DataFrame({
+        "order_id": [f"o{i}" for i in range(pedidos)],
+        "customer_id": [f"c{i}" for i in rng.integers(0, 150, pedidos)],
+        "merchant_city": rng.choice(["Recife", "Natal", "Curitiba"], pedidos),
+        "price_range": rng.integers(1, 5, pedidos),
+        "delivery_time": rng.choice([20, 30, 30, 45, 60], pedidos),
+        # Valores inteiros: as somas não dependem da ordem, e os arredondamentos de TKM e ARPU são comparáveis
+        "amount": rng.integers(10, 200, pedidos).astype(float)
+    }).with_columns(
+        pl.when(pl.col("customer_id").str.slice(1).cast(pl.Int32) % 2 == 0).then(pl.lit("target")).otherwise(pl.lit("control")).alias("is_target")
+    )
+
+
+@pytest.mark.parametrize("filter_cities", [None, ["Recife", "Natal"]])
+def test_rollup_igual_a_uma_chamada_por_recorte(vendas, filter_cities):
+    grouping_sets = grouping_sets_cube(["merchant_city", "price_range", "delivery_time_category"])
+    rollup = calculate_ab_metrics_rollup(vendas, grouping_sets, filter_cities, ntiles={"delivery_time": 4})
+
+    vendas_com_faixas = vendas.with_columns(quantile_bucket(vendas, "delivery_time", 4, filter_cities))
+    assert rollup["dimension"].n_unique() == len(grouping_sets)
+
+    for conjunto in grouping_sets:
+        esperado = calculate_ab_metrics(vendas_com_faixas, conjunto, filter_cities)
+        segmento = pl.concat_str([pl.col(coluna).cast(pl.Utf8) for coluna in conjunto], separator=" | ") if conjunto else pl.lit("total")
+        esperado = esperado.with_columns(segmento.alias("segment")).drop(conjunto)
+
+        recorte = rollup.filter(pl.col("dimension") == (", ".join(conjunto) or "total")).drop("dimension")
+        assert_frame_equal(
+            recorte.select(esperado.columns).sort("is_target", "segment"),
+            esperado.sort("is_target", "segment")
+        )
+
+
+def test_consulta_de_vendas_com_somente_as_colunas_e_filtros_pedidos():
+    qry, job_config = _build_sales_query(
+        ["order_id", "order_month", "amount"], ["Recife"], ["target"], "2019-02-01", None, "merchant_city"
+    )
+    select = sqlglot.parse_one(qry, read="bigquery")
+
+    assert [coluna.alias_or_name for coluna in select.expressions] == ["order_id", "order_month", "amount"]
+    assert sorted({coluna.name for coluna in select.args["where"].find_all(exp.Column)}) == ["is_target", "merchant_city", "order_created_at"]
+    assert sorted(parametro.name for parametro in job_config.query_parameters) == ["cities", "segments", "start_date"]
+
+
+def test_vendas_iguais_no_warehouse_e_nos_arquivos_locais(vendas, tmp_path):
+    inicio = datetime.datetime(2019, 1, 1, tzinfo=datetime.UTC)
+    pedidos = vendas.with_columns(
+        (pl.lit(inicio) + pl.duration(hours=pl.int_range(pl.len()) * 5)).alias("order_created_at")
+    )
+
+    client = LocalWarehouseClient(str(tmp_path / "warehouse"))
+    create_dataset_and_table(pedidos, "gold", "orders", client)
+
+    # Nos arquivos da gold.sales há uma linha por item; o valor do pedido se repete em order_total_amount
+    itens = pl.concat([pedidos, pedidos.filter(pl.col("price_range") > 2)]).rename({"amount": "order_total_amount"})
+    itens.slice(0, 400).write_parquet(tmp_path / "sales_1.parquet")
+    itens.slice(400).write_parquet(tmp_path / "sales_2.parquet")
+
+    filtros = dict(
+        columns=["order_id", "order_month", "amount", "merchant_city"], cities=["Recife", "Natal"],
+        segments=["target"], start_date="2019-01-20", end_date=datetime.date(2019, 2, 10), compact=False
+    )
+    do_warehouse = read_sales(**filtros, client=client, use_cache=False).collect().sort("order_id")
+    dos_arquivos = read_sales(**filtros, source=str(tmp_path / "sales_*.parquet")).collect().sort("order_id")
+
+    esperado = pedidos.filter(
+        pl.col("merchant_city").is_in(["Recife", "Natal"]) & (pl.col("is_target") == "target")
+        & pl.col("order_created_at").dt.date().is_between(datetime.date(2019, 1, 20), datetime.date(2019, 2, 10))
+    ).select(
+        "order_id", pl.col("order_created_at").dt.truncate("1mo").dt.date().alias("order_month"), "amount", "merchant_city"
+    ).sort("order_id")
+
+    assert esperado.height > 0
+    assert_frame_equal(do_warehouse, esperado)
+    assert_frame_equal(dos_arquivos, esperado)
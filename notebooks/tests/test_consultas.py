@@ -0,0 +1,57 @@
+# Testes das consultas em SQL do BigQuery (sem rede): as regras que o warehouse local aceita, mas o BigQuery recusa
+#
+# Uso:
+#   python -m pytest notebooks/tests
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+
+import pyarrow as pa
+import pytest
+import sqlglot
+from sqlglot import exp
+
+import etl
+import sketches
+
+
+# Função que retorna os SELECTs da consulta com QUALIFY sem WHERE, GROUP BY nem HAVING (recusados pelo BigQuery)
+def qualify_sem_filtro(qry):
+    arvore = sqlglot.parse_one(qry, read="bigquery")
+    return [
+        select.sql(dialect="bigquery")[:80]
+        for select in arvore.find_all(exp.Select)
+        if select.args.get("qualify") and not any(select.args.get(clausula) for clausula in ("where", "group", "having"))
+    ]
+
+
+@pytest.mark.parametrize("nome", ["qry_gold_sales", "qry_gold_orders", "qry_gold_customer_summary"])
+def test_consultas_da_gold_usam_qualify_com_where(nome):
+    qry = getattr(etl, nome).format(particao="2019-01-06")
+    assert qualify_sem_filtro(qry) == []
+
+
+# Cliente que guarda as consultas recebidas e retorna um resultado vazio
+class ClienteQueGuardaConsultas:
+    def __init__(self):
+        self.consultas = []
+
+    def query(self, qry, job_config=None):
+        self.consultas.append(qry)
+        return self
+
+    def to_arrow(self):
+        return pa.table({"column": pa.array([], pa.string())})
+
+
+@pytest.mark.parametrize("semanas", [None, ["2019-01-06"]])
+def test_leitura_dos_sketches_usa_qualify_com_where(semanas):
+    client = ClienteQueGuardaConsultas()
+    sketches.read_segment_sketches(semanas, client=client, use_cache=False)
+    assert qualify_sem_filtro(client.consultas[0]) == []
+
+
+def test_regra_do_qualify_detecta_consulta_sem_where():
+    assert qualify_sem_filtro("SELECT * FROM t QUALIFY ROW_NUMBER() OVER (PARTITION BY id) = 1") != []
@@ -0,0 +1,78 @@
+# Testes do etl.py (sem rede)
+#
+# Uso:
+#   python -m pytest notebooks/tests
+
+import html
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+
+import polars as pl
+
+from benchmark_order_details import explode_laco_original, gerar_order_details
+from etl import normalize_text_columns, parse_order_items, safe_json_parse
+
+
+# Linhas que o caminho rápido não decodifica: a que parece uma lista JSON mas é inválida obriga a
+# decodificação estrita a dividir o bloco até isolá-la
+linhas_malformadas = pl.DataFrame({
+    "order_id": ["m1", "m2", "m3", "m4"],
+    "cpf": ["1", "2", "3", "4"],
+    "items": ['[{"name": }]', '[{"name": "Pizza"', None, '{"name": "Pizza"}']
+})
+
+
+# Mesmas colunas e linhas, sem depender da ordem; quantity é comparada como número, como na camada silver
+# (o laço original gravava str(1.0) = "1.0", e a decodificação tipada grava "1")
+def _normalizar(df_itens):
+    colunas = ["order_id", "cpf", "name", "quantity", "sequence", "unitPrice", "addition", "discount", "type"]
+    return df_itens.select(colunas).with_columns(pl.col("quantity").cast(pl.Float64)).sort(pl.all())
+
+
+def test_itens_iguais_ao_laco_original():
+    df = gerar_order_details(600, perc_malformadas=0.3)
+    df = pl.concat([df.slice(0, 250), linhas_malformadas, df.slice(250)])
+
+    df_itens, df_invalidos = parse_order_items(df, batch_size=128)
+
+    assert _normalizar(df_itens).equals(_normalizar(explode_laco_original(df, chunk_size=200)))
+
+    # O laço original descartava em silêncio as linhas que o safe_json_parse não recupera; aqui elas são devolvidas
+    esperados = [
+        order_id for order_id, items in df.select("order_id", "items").iter_rows()
+        if safe_json_parse(items.strip() if items is not None else None) is None
+    ]
+    assert sorted(df_invalidos["order_id"].to_list()) == sorted(esperados) == ["m1", "m2", "m3"]
+
+
+# Mesmas etapas de normalize_text_columns aplicadas valor a valor com a biblioteca padrão
+def _normalizar_texto(valor, titlecase):
+    if valor is None:
+        return None
+    valor = html.unescape(valor)
+    if titlecase:
+        valor = valor.title()
+    return valor.replace('"', "").replace("'", "").strip()
+
+
+def test_normalizacao_de_texto_igual_a_aplicada_valor_a_valor():
+    valores = [
+        "  joão d'ávila ", "MARIA &amp; JOSÉ", "&quot;Bar do Zé&quot;", "O&#39;Brien", "sem entidade",
+        "R&D", "&lt;tag&gt;", None, "\"entre aspas\"", "&amp;quot;duplo&amp;quot;", ""
+    ]
+    df = pl.DataFrame({"customer_name": valores * 3, "cidade": valores[::-1] * 3})
+
+    for titlecase in (False, True):
+        normalizado = normalize_text_columns(df.lazy(), ["customer_name"], titlecase=titlecase)
+        assert isinstance(normalizado, pl.LazyFrame)
+
+        normalizado = normalizado.collect()
+        assert normalizado["customer_name"].to_list() == [_normalizar_texto(valor, titlecase) for valor in df["customer_name"]]
+        assert normalizado["cidade"].equals(df["cidade"])
+
+    # Sem columns, todas as colunas de texto são normalizadas
+    normalizado = normalize_text_columns(df)
+    assert normalizado["cidade"].to_list() == [_normalizar_texto(valor, False) for valor in df["cidade"]]
@@ -0,0 +1,120 @@
+# Testes do pipeline.py no warehouse local (sem rede)
+#
+# Uso:
+#   python -m pytest notebooks/tests
+
+import datetime
+import gzip
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+
+import polars as pl
+import pytest
+
+import pipeline
+import utils
+from warehouse import create_dataset_and_table
+from local_warehouse import LocalWarehouseClient
+
+
+# Warehouse local em que toda carga falha, como um job de carga recusado pelo BigQuery
+class ClienteComFalha(LocalWarehouseClient):
+    def load_table_from_file(self, file_obj, table_id, job_config=None, job_id=None):
+        raise RuntimeError("carga recusada")
+
+
+@pytest.fixture
+def projeto(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "pasta_manifestos_carga", str(tmp_path / "manifestos_carga"))
+
+    origem = tmp_path / "origem"
+    origem.mkdir()
+    with gzip.open(origem / "consumer.csv.gz", "wt", encoding="utf-8") as arquivo:
+        arquivo.write("customer_id,language,created_at,active,customer_name,customer_phone_area,customer_phone_number\n")
+        arquivo.write("c1,pt-br,2018-12-01 10:00:00,True,Ana,11,999990000\n")
+        arquivo.write("c2,pt-br,2018-12-02 11:00:00,False,Bruno,21,988880000\n")
+    return tmp_path
+
+
+# Função que executa somente a etapa bronze.consumer e retorna a situação dela
+def executar_bronze_consumer(projeto, client):
+    resumo = pipeline.run_pipeline(
+        client=client,
+        origem=str(projeto / "origem"),
+        max_workers=1,
+        somente=["bronze.consumer"],
+        caminho_estado=str(projeto / "estado_pipeline.json"),
+        pasta=str(projeto)
+    )
+    return resumo.filter(resumo["etapa"] == "bronze.consumer").row(0, named=True)
+
+
+def test_carga_com_falha_nao_e_registrada_como_executada(projeto):
+    etapa = executar_bronze_consumer(projeto, ClienteComFalha(str(projeto / "warehouse")))
+    assert etapa["situacao"] == "erro"
+    assert "carga recusada" in etapa["erro"]
+
+    estado = pipeline.load_state(str(projeto / "estado_pipeline.json"))
+    assert estado.get("bronze.consumer", {}).get("situacao") != "executada"
+
+    # O arquivo não mudou, mas a etapa que falhou é executada de novo e carrega as linhas
+    client = LocalWarehouseClient(str(projeto / "warehouse"))
+    etapa = executar_bronze_consumer(projeto, client)
+    assert etapa["situacao"] == "executada"
+    assert client.query("SELECT COUNT(*) FROM bronze.consumer").to_arrow().column(0)[0].as_py() == 2
+
+    # Sem mudanças, a próxima execução ignora a etapa
+    assert executar_bronze_consumer(projeto, client)["situacao"] == "ignorada"
+
+
+# Etapa que grava uma linha na tabela de saída com a insert_date da execução; com falhas[nome] = True, gera erro
+def _etapa(nome, entradas, execucoes, falhas):
+    def funcao(contexto):
+        if falhas.get(nome):
+            raise RuntimeError(f"falha em {nome}")
+        execucoes.append(nome)
+        camada, tabela = nome.split(".")
+        create_dataset_and_table(pl.DataFrame({"insert_date": [contexto.insert_date]}), camada, tabela, contexto.client)
+        return {}
+    return pipeline.Etapa(nome, funcao, entradas=entradas)
+
+
+def test_etapas_sem_mudancas_ignoradas_e_dependentes_de_falha_bloqueadas(projeto):
+    client = LocalWarehouseClient(str(projeto / "warehouse"))
+    execucoes, falhas = [], {}
+    etapas = [
+        _etapa("bronze.a", ["externa.origem"], execucoes, falhas),
+        _etapa("silver.b", ["bronze.a"], execucoes, falhas),
+        _etapa("silver.c", ["externa.origem"], execucoes, falhas),
+        _etapa("gold.d", ["silver.b", "silver.c"], execucoes, falhas)
+    ]
+
+    def executar():
+        execucoes.clear()
+        resumo = pipeline.run_pipeline(
+            etapas, client=client, origem=str(projeto / "origem"), max_workers=2,
+            caminho_estado=str(projeto / "estado_pipeline.json"), pasta=str(projeto)
+        )
+        return dict(resumo.select("etapa", "situacao").iter_rows())
+
+    def carregar_origem():
+        create_dataset_and_table(pl.DataFrame({"insert_date": [datetime.datetime.now(datetime.UTC)]}), "externa", "origem", client)
+
+    carregar_origem()
+    falhas["silver.b"] = True
+    assert executar() == {"bronze.a": "executada", "silver.b": "erro", "silver.c": "executada", "gold.d": "bloqueada"}
+
+    # A próxima execução recomeça pela etapa que falhou; as concluídas, sem mudanças nas entradas, são ignoradas
+    falhas.clear()
+    assert executar() == {"bronze.a": "ignorada", "silver.b": "executada", "silver.c": "ignorada", "gold.d": "executada"}
+    assert sorted(execucoes) == ["gold.d", "silver.b"]
+
+    assert set(executar().values()) == {"ignorada"}
+    assert execucoes == []
+
+    # Uma nova carga na tabela externa refaz todas as etapas que dependem dela
+    carregar_origem()
+    assert set(executar().values()) == {"executada"}
+    assert sorted(execucoes) == ["bronze.a", "gold.d", "silver.b", "silver.c"]
@@ -0,0 +1,74 @@
+# Testes do profiling.py (sem rede)
+#
+# Uso:
+#   python -m pytest notebooks/tests
+
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+
+import profiling
+from profiling import compare_reports, finish_run, profile_stage, start_run
+
+
+# Relatório mínimo no formato gravado por finish_run (somente as medidas usadas na comparação)
+def _relatorio(*etapas):
+    return {"stages": [
+        {"path": path, "wall_time_s": tempo, "rss_peak_delta_mb": rss, "bytes_processed": bytes_processados}
+        for path, tempo, rss, bytes_processados in etapas
+    ]}
+
+
+def test_regressoes_marcadas(tmp_path):
+    base = _relatorio(
+        ("mais_lenta", 2.0, 10.0, None),
+        ("rapida_demais_para_comparar", 0.1, 10.0, None),
+        ("mais_memoria", 1.0, 100.0, None),
+        ("mais_bytes", 1.0, 10.0, 1000),
+        ("igual", 1.0, 10.0, 1000),
+        ("chamada_duas_vezes", 0.4, 10.0, None),
+        ("chamada_duas_vezes", 0.4, 10.0, None),
+        ("removida", 1.0, 10.0, None)
+    )
+    novo = _relatorio(
+        ("mais_lenta", 3.0, 10.0, None),
+        ("rapida_demais_para_comparar", 0.3, 10.0, None),
+        ("mais_memoria", 1.0, 200.0, None),
+        ("mais_bytes", 1.0, 10.0, 1500),
+        ("igual", 1.1, 10.0, 1000),
+        ("chamada_duas_vezes", 0.5, 10.0, None),
+        ("chamada_duas_vezes", 0.5, 10.0, None),
+        ("nova", 5.0, 500.0, None)
+    )
+
+    # O relatório também pode ser lido do arquivo JSON
+    caminho_base = tmp_path / "perfil_base.json"
+    caminho_base.write_text(json.dumps(base), encoding="utf-8")
+
+    comparacao = {linha["path"]: linha for linha in compare_reports(str(caminho_base), novo).iter_rows(named=True)}
+
+    regressoes = sorted(path for path, linha in comparacao.items() if linha["regression"])
+    assert regressoes == ["chamada_duas_vezes", "mais_bytes", "mais_lenta", "mais_memoria"]
+
+    assert comparacao["chamada_duas_vezes"]["calls_new"] == 2
+    assert comparacao["chamada_duas_vezes"]["wall_time_change"] == 0.25
+    assert comparacao["mais_lenta"]["wall_time_change"] == 0.5
+    assert comparacao["removida"]["wall_time_s_new"] is None
+    assert comparacao["nova"]["wall_time_s_base"] is None
+    assert comparacao["igual"]["bytes_change"] == 0
+
+
+def test_relatorio_gravado_comparado_com_ele_mesmo(tmp_path):
+    start_run("teste", str(tmp_path))
+    with profile_stage("etapa") as etapa:
+        with profile_stage("subetapa"):
+            pass
+        etapa.rows_out = 3
+    caminho = finish_run()
+
+    assert profiling._execucao is None
+    comparacao = compare_reports(caminho, caminho)
+    assert sorted(comparacao["path"].to_list()) == ["etapa", "etapa/subetapa"]
+    assert not comparacao["regression"].any()
@@ -0,0 +1,64 @@
+# Testes do schemas.py (sem rede)
+#
+# Uso:
+#   python -m pytest notebooks/tests
+
+import os
+import sys
+import warnings
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+
+import polars as pl
+import pytest
+from polars.exceptions import CategoricalRemappingWarning
+
+from schemas import apply_schema, schemas_tabelas
+from sketches import build_sketches, merge_sketches
+
+
+def test_importar_schemas_nao_liga_o_cache_de_strings():
+    assert not pl.using_string_cache()
+
+
+def test_customer_name_continua_texto():
+    for tabela, schema in schemas_tabelas.items():
+        if "customer_name" in schema:
+            assert schema["customer_name"] == pl.Utf8, tabela
+
+    df = apply_schema(pl.DataFrame({"customer_name": ["Ana", "Bruno"], "language": ["pt-br", "en-us"]}), "silver.consumer")
+    assert df.schema["customer_name"] == pl.Utf8
+    assert df.schema["language"] == pl.Categorical("lexical")
+
+
+def test_conversao_estrita():
+    df = apply_schema(pl.DataFrame({"price_range": [1, 5], "is_target": ["target", "control"]}).lazy(), "gold.orders").collect()
+    assert df.schema["price_range"] == pl.Int8
+    assert df.schema["is_target"] == pl.Enum(["control", "target"])
+
+    # Valores fora do Enum ou do intervalo do inteiro geram erro, em vez de virar nulo
+    with pytest.raises(pl.exceptions.InvalidOperationError):
+        apply_schema(pl.DataFrame({"is_target": ["target", "teste"]}), "gold.orders")
+    with pytest.raises(pl.exceptions.InvalidOperationError):
+        apply_schema(pl.DataFrame({"price_range": [1, 300]}), "gold.orders")
+
+    with pytest.raises(ValueError):
+        apply_schema(pl.DataFrame({"price_range": [1]}), "gold.inexistente")
+
+
+def test_sketches_de_semanas_diferentes_combinados_com_cache_local():
+    semanas = [
+        pl.DataFrame({"merchant_city": ["Recife", "Curitiba"], "customer_id": ["c1", "c2"]}),
+        pl.DataFrame({"merchant_city": ["Curitiba", "Natal"], "customer_id": ["c3", "c2"]})
+    ]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", CategoricalRemappingWarning)
+        with pl.StringCache():
+            sketches = [
+                build_sketches(apply_schema(semana, "gold.orders"), segments=["merchant_city"], columns=["customer_id"], precision=8)
+                for semana in semanas
+            ]
+            combinado = merge_sketches(sketches, ["merchant_city"])
+
+    assert sorted(combinado["merchant_city"].cast(pl.Utf8).unique().to_list()) == ["Curitiba", "Natal", "Recife"]
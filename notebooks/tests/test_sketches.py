@@ -0,0 +1,74 @@
+# Testes do sketches.py (sem rede)
+#
+# Uso:
+#   python -m pytest notebooks/tests
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+
+import numpy as np
+import polars as pl
+import pytest
+
+from sketches import approx_ab_counts, build_sketches, estimate_distinct, merge_sketches
+
+
+# Pedidos de duas semanas: os clientes (cada um em um grupo do teste) se repetem entre as semanas e entre os pedidos
+@pytest.fixture
+def pedidos():
+    rng = np.random.default_rng(3)
+    linhas = 60_000
+    clientes = rng.integers(0, 20_000, linhas)
+    return pl.DataFrame({
+        "order_id": [f"pedido_{i}" for i in range(linhas)],
+        "customer_id": [f"cliente_{i}" for i in clientes],
+        "semana": np.where(np.arange(linhas) < linhas // 2, "2019-01-06", "2019-01-13"),
+        "is_target": np.where(clientes % 2 == 0, "target", "control")
+    })
+
+
+@pytest.mark.parametrize("precision", [10, 12])
+@pytest.mark.parametrize("distintos", [40, 3_000, 50_000])
+def test_estimativa_dentro_de_tres_erros_padrao(distintos, precision):
+    df = pl.DataFrame({"customer_id": [f"c{i}" for i in range(distintos)]})
+    estimativa = estimate_distinct(build_sketches(df, columns="customer_id", precision=precision)).row(0, named=True)
+
+    assert estimativa["relative_error"] == pytest.approx(1.04 / np.sqrt(2 ** precision))
+    assert abs(estimativa["approx_distinct"] / distintos - 1) <= 3 * estimativa["relative_error"]
+
+
+def test_sketches_das_semanas_combinados_iguais_ao_sketch_do_periodo(pedidos):
+    por_semana = [
+        build_sketches(pedidos.filter(pl.col("semana") == semana), segments=["semana", "is_target"])
+        for semana in pedidos["semana"].unique().sort()
+    ]
+    combinado = merge_sketches(por_semana, ["is_target"])
+    periodo = build_sketches(pedidos, segments=["is_target"])
+
+    ordem = ["column", "is_target", "idx"]
+    assert combinado.select(periodo.columns).sort(ordem).equals(periodo.sort(ordem))
+
+    # Clientes que compraram nas duas semanas são contados uma única vez
+    contagens = approx_ab_counts(por_semana, ["semana"]).join(
+        pedidos.group_by("is_target", "semana").agg(
+            pl.col("order_id").n_unique().alias("orders_exato"),
+            pl.col("customer_id").n_unique().alias("unique_customers_exato")
+        ),
+        on=["is_target", "semana"]
+    )
+    erro = 3 * 1.04 / np.sqrt(2 ** 12)
+    assert contagens.height == 4
+    assert ((contagens["orders"] / contagens["orders_exato"] - 1).abs() <= erro).all()
+    assert ((contagens["unique_customers"] / contagens["unique_customers_exato"] - 1).abs() <= erro).all()
+
+    total = approx_ab_counts(merge_sketches(por_semana, ["is_target"]))
+    clientes = pedidos["customer_id"].n_unique()
+    assert abs(total["total_customers"][0] / clientes - 1) <= erro
+    assert total["total_customers"][0] < contagens["unique_customers"].sum()
+
+
+def test_precisoes_diferentes_nao_se_combinam(pedidos):
+    with pytest.raises(ValueError):
+        merge_sketches([build_sketches(pedidos, precision=10), build_sketches(pedidos, precision=12)])
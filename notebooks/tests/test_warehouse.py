@@ -0,0 +1,143 @@
+# Testes do warehouse.py no warehouse local (sem rede)
+#
+# Uso:
+#   python -m pytest notebooks/tests
+
+import datetime
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+
+import polars as pl
+import pyarrow as pa
+import pytest
+
+import utils
+import warehouse
+from local_warehouse import LocalWarehouseClient
+
+
+# Warehouse local que guarda a configuração de cada job de carga
+class ClienteComConfiguracao(LocalWarehouseClient):
+    def __init__(self, pasta):
+        super().__init__(pasta)
+        self.configuracoes = []
+
+    def load_table_from_file(self, file_obj, table_id, job_config=None, job_id=None):
+        self.configuracoes.append(job_config)
+        return super().load_table_from_file(file_obj, table_id, job_config=job_config, job_id=job_id)
+
+
+def test_particionamento_somente_na_criacao_da_tabela(tmp_path):
+    client = ClienteComConfiguracao(str(tmp_path / "warehouse"))
+    tabela = pa.table({"order_id": ["a", "b"], "insert_date": pa.array([0, 1], pa.timestamp("us", tz="UTC"))})
+
+    for _ in range(2):
+        warehouse._load_chunk(client, tabela, "silver.order", partition_field="insert_date", clustering_fields=["order_id"])
+
+    criacao, append = client.configuracoes
+    assert criacao.time_partitioning.field == "insert_date"
+    assert criacao.clustering_fields == ["order_id"]
+    assert append.time_partitioning is None
+    assert append.clustering_fields is None
+
+
+def test_identificador_da_carga_cobre_o_conteudo_inteiro():
+    df = pl.DataFrame({"order_id": [str(i) for i in range(10)], "valor": list(range(10))})
+    meio_alterado = df.with_columns(pl.when(pl.col("valor") == 5).then(50).otherwise(pl.col("valor")).alias("valor"))
+
+    assert warehouse._load_fingerprint(df, "silver.order", 3) == warehouse._load_fingerprint(df.to_arrow(), "silver.order", 3)
+    assert warehouse._load_fingerprint(df, "silver.order", 3) != warehouse._load_fingerprint(meio_alterado, "silver.order", 3)
+
+
+def test_manifesto_apagado_ao_fim_da_carga(tmp_path):
+    client = LocalWarehouseClient(str(tmp_path / "warehouse"))
+    df = pl.DataFrame({"order_id": [str(i) for i in range(10)]})
+    pasta_manifesto = tmp_path / "manifestos_carga"
+
+    linhas = warehouse.load_chunks_concurrently(df, "silver.order", client, chunk_size=3, pasta_manifesto=str(pasta_manifesto))
+    assert linhas == 10
+    assert list(pasta_manifesto.iterdir()) == []
+
+
+# Warehouse local em que todo job de carga falha
+class ClienteComFalhaNaCarga(LocalWarehouseClient):
+    def load_table_from_file(self, file_obj, table_id, job_config=None, job_id=None):
+        raise RuntimeError("falha simulada")
+
+
+def test_erro_na_carga_e_propagado(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "pasta_manifestos_carga", str(tmp_path / "manifestos_carga"))
+    client = ClienteComFalhaNaCarga(str(tmp_path / "warehouse"))
+    df = pl.DataFrame({"order_id": [str(i) for i in range(10)]})
+
+    with pytest.raises(RuntimeError, match="falha simulada"):
+        warehouse.create_dataset_and_table(df, "silver", "order", client)
+
+    with pytest.raises(RuntimeError, match="Falha nos chunks"):
+        warehouse.create_dataset_and_table(df, "silver", "order", client, use_chunk=True, chunk_size=3, max_retries=1)
+
+    with pytest.raises(ValueError):
+        warehouse.create_dataset_and_table([1, 2, 3], "silver", "order", client)
+
+
+def test_falha_em_uma_particao_gera_erro_depois_das_demais(tmp_path):
+    client = LocalWarehouseClient(str(tmp_path / "warehouse"))
+    registradas = []
+    insert_date = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+
+    with pytest.raises(RuntimeError, match=r"\['x'\]"):
+        warehouse.materialize_partitions(
+            client, "SELECT CAST('{particao}' AS INT64) AS valor", ["1", "x", "2", "3"], "gold.teste", insert_date,
+            max_workers=2, ao_materializar=registradas.append
+        )
+
+    assert sorted(registradas) == ["1", "2", "3"]
+    assert client.query("SELECT COUNT(*) FROM gold.teste").to_arrow().column(0)[0].as_py() == 3
+
+
+# Warehouse local que guarda as consultas executadas (exceto as de versão da tabela)
+class ClienteQueGuardaConsultas(LocalWarehouseClient):
+    def __init__(self, pasta):
+        super().__init__(pasta)
+        self.consultas = []
+
+    def query(self, qry, job_config=None, job_id=None):
+        if "MAX(insert_date)" not in qry:
+            self.consultas.append(qry)
+        return super().query(qry, job_config=job_config, job_id=job_id)
+
+
+def test_cache_de_consultas(tmp_path):
+    client = ClienteQueGuardaConsultas(str(tmp_path / "warehouse"))
+    pasta_cache = str(tmp_path / "cache")
+    qry = "SELECT COUNT(*) AS pedidos FROM gold.orders"
+
+    def carregar(pedidos, dia):
+        insert_date = datetime.datetime(2024, 1, dia, tzinfo=datetime.UTC)
+        warehouse.create_dataset_and_table(
+            pl.DataFrame({"order_id": [f"{dia}_{i}" for i in range(pedidos)], "insert_date": [insert_date] * pedidos}),
+            "gold", "orders", client
+        )
+
+    def consultar():
+        antes = len(client.consultas)
+        pedidos = warehouse.cached_query(client, qry, "gold.orders", pasta=pasta_cache)["pedidos"][0]
+        return pedidos, len(client.consultas) > antes
+
+    carregar(3, 1)
+    assert consultar() == (3, True)
+    assert consultar() == (3, False)
+
+    # invalidate_cache apaga somente os resultados da tabela informada
+    assert warehouse.invalidate_cache("gold.sales", pasta=pasta_cache) == 0
+    assert consultar() == (3, False)
+    assert warehouse.invalidate_cache("gold.orders", pasta=pasta_cache) == 1
+    assert consultar() == (3, True)
+
+    # Uma nova carga muda a versão da tabela (última insert_date) e invalida o resultado
+    carregar(2, 2)
+    assert warehouse.table_version(client, "gold.orders").startswith("2024-01-02")
+    assert consultar() == (5, True)
+    assert consultar() == (5, False)
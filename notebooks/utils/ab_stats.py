@@ -0,0 +1,167 @@
+from concurrent.futures import ProcessPoolExecutor
+from scipy import stats
+import numpy as np
+import polars as pl
+import os
+
+from profiling import profiled
+from analytics import _normalize_columns_groupby, _per_customer_plan
+
+# Estatísticas do teste A/B por segmento, calculadas para todos os segmentos de uma vez (sem laços por cidade).
+# A unidade de análise é o cliente: ARPU é a média do gasto por cliente e a variância é a do gasto por cliente.
+
+
+### ESTATÍSTICAS POR SEGMENTO (WELCH E COHEN'S D) ###
+
+# Função que calcula, por segmento e grupo, clientes, ARPU e variância do gasto por cliente (um único group_by)
+def _customer_spend_moments(data_frame, columns_groupby, filter_cities):
+    per_customer = _per_customer_plan(data_frame, columns_groupby, filter_cities)
+
+    momentos = per_customer.group_by(["is_target"] + columns_groupby).agg([
+        pl.len().alias("unique_customers"),
+        pl.col("revenue").mean().alias("ARPU"),
+        pl.col("revenue").var().alias("var_arpu")
+    ])
+
+    # Uma linha por segmento, com as colunas de cada grupo lado a lado (sufixos _target e _control)
+    target = momentos.filter(pl.col("is_target") == "target").drop("is_target")
+    control = momentos.filter(pl.col("is_target") == "control").drop("is_target")
+
+    if columns_groupby:
+        return target.join(control, on=columns_groupby, how="inner", suffix="_control").rename({
+            "unique_customers": "unique_customers_target", "ARPU": "ARPU_target", "var_arpu": "var_arpu_target"
+        })
+
+    return target.rename({
+        "unique_customers": "unique_customers_target", "ARPU": "ARPU_target", "var_arpu": "var_arpu_target"
+    }).join(control.rename({
+        "unique_customers": "unique_customers_control", "ARPU": "ARPU_control", "var_arpu": "var_arpu_control"
+    }), how="cross")
+
+# Função que calcula as estatísticas do ARPU (teste vs. controle) para todos os segmentos em uma única passada
+@profiled()
+def ab_test_stats(data_frame, columns_groupby=None, filter_cities=None, alpha=0.05):
+    """
+    Retorna uma linha por segmento com clientes, ARPU e desvio padrão do gasto por cliente de cada grupo,
+    a diferença absoluta e percentual do ARPU, o Cohen's d (desvio padrão combinado sqrt((s1² + s2²) / 2),
+    o mesmo usado nas análises), o teste t de Welch (estatística, graus de liberdade e p-valor bicaudal)
+    e o intervalo de confiança de (1 - alpha) para a diferença absoluta do ARPU.
+    Segmentos sem clientes em um dos grupos ficam de fora.
+    """
+    columns_groupby = _normalize_columns_groupby(columns_groupby)
+    resultado = _customer_spend_moments(data_frame, columns_groupby, filter_cities).with_columns([
+        (pl.col("ARPU_target") - pl.col("ARPU_control")).alias("arpu_absolute_diff"),
+        (pl.col("ARPU_target") / pl.col("ARPU_control") - 1).alias("arpu_percent_diff"),
+        pl.col("var_arpu_target").sqrt().alias("std_arpu_target"),
+        pl.col("var_arpu_control").sqrt().alias("std_arpu_control"),
+        (pl.col("var_arpu_target") / pl.col("unique_customers_target")).alias("_erro_target"),
+        (pl.col("var_arpu_control") / pl.col("unique_customers_control")).alias("_erro_control")
+    ]).with_columns([
+        (pl.col("arpu_absolute_diff") / ((pl.col("var_arpu_target") + pl.col("var_arpu_control")) / 2).sqrt()).alias("cohens_d"),
+        (pl.col("_erro_target") + pl.col("_erro_control")).sqrt().alias("standard_error"),
+        # Graus de liberdade de Welch-Satterthwaite
+        ((pl.col("_erro_target") + pl.col("_erro_control")) ** 2 / (
+            pl.col("_erro_target") ** 2 / (pl.col("unique_customers_target") - 1)
+            + pl.col("_erro_control") ** 2 / (pl.col("unique_customers_control") - 1)
+        )).alias("welch_df")
+    ]).with_columns([
+        (pl.col("arpu_absolute_diff") / pl.col("standard_error")).alias("t_statistic")
+    ]).collect()
+
+    # p-valor e valor crítico da distribuição t calculados de forma vetorizada para todos os segmentos
+    with np.errstate(invalid="ignore", divide="ignore"):
+        graus_liberdade = resultado["welch_df"].to_numpy()
+        p_valor = 2 * stats.t.sf(np.abs(resultado["t_statistic"].to_numpy()), graus_liberdade)
+        margem = stats.t.ppf(1 - alpha / 2, graus_liberdade) * resultado["standard_error"].to_numpy()
+
+    resultado = resultado.with_columns([
+        pl.Series("p_value", p_valor).fill_nan(None),
+        (pl.col("arpu_absolute_diff") - pl.Series(margem).fill_nan(None)).alias("ci_low"),
+        (pl.col("arpu_absolute_diff") + pl.Series(margem).fill_nan(None)).alias("ci_high")
+    ])
+
+    return resultado.select(columns_groupby + [
+        "unique_customers_target", "unique_customers_control",
+        "ARPU_target", "ARPU_control", "std_arpu_target", "std_arpu_control",
+        "arpu_absolute_diff", "arpu_percent_diff", "cohens_d",
+        "standard_error", "t_statistic", "welch_df", "p_value", "ci_low", "ci_high"
+    ]).sort(columns_groupby or "ARPU_target")
+
+
+### INTERVALOS DE CONFIANÇA POR BOOTSTRAP ###
+
+# Função que gera as médias de reamostragens de um grupo em blocos de matrizes de índices (reamostragens x clientes)
+# O tamanho do bloco é limitado por max_elements, para que a memória não cresça com o número de clientes
+def _bootstrap_means(valores, n_resamples, rng, max_elements):
+    tamanho = len(valores)
+    medias = np.empty(n_resamples)
+    linhas_por_bloco = max(1, max_elements // max(tamanho, 1))
+
+    for inicio in range(0, n_resamples, linhas_por_bloco):
+        fim = min(inicio + linhas_por_bloco, n_resamples)
+        indices = rng.integers(0, tamanho, size=(fim - inicio, tamanho))
+        medias[inicio:fim] = valores[indices].mean(axis=1)
+
+    return medias
+
+# Função executada em cada processo: reamostra os dois grupos de um segmento e devolve os percentis das diferenças
+def _bootstrap_segment(valores_target, valores_control, n_resamples, semente, alpha, max_elements):
+    rng_target, rng_control = [np.random.default_rng(filho) for filho in semente.spawn(2)]
+    medias_target = _bootstrap_means(valores_target, n_resamples, rng_target, max_elements)
+    medias_control = _bootstrap_means(valores_control, n_resamples, rng_control, max_elements)
+
+    diferencas = medias_target - medias_control
+    with np.errstate(invalid="ignore", divide="ignore"):
+        diferencas_percentuais = medias_target / medias_control - 1
+
+    percentis = [100 * alpha / 2, 100 * (1 - alpha / 2)]
+    return (*np.percentile(diferencas, percentis), *np.percentile(diferencas_percentuais, percentis))
+
+# Função que calcula intervalos de confiança por bootstrap (percentil) da diferença do ARPU para todos os segmentos
+@profiled()
+def bootstrap_ab_ci(data_frame, columns_groupby=None, filter_cities=None, n_resamples=2000, alpha=0.05,
+                    seed=None, max_workers=None, max_elements=2_000_000):
+    """
+    Cada segmento é reamostrado em lotes vetorizados (matrizes de índices de até max_elements posições) e os
+    segmentos são distribuídos em um pool de processos. As sementes vêm de um único SeedSequence(seed), então o
+    resultado com a mesma semente é o mesmo, independentemente do número de processos.
+    max_workers=1 executa tudo no processo atual.
+    Retorna, por segmento, o intervalo da diferença absoluta (bootstrap_ci_low/high) e percentual
+    (bootstrap_percent_ci_low/high) do ARPU.
+    """
+    columns_groupby = _normalize_columns_groupby(columns_groupby)
+
+    gastos = _per_customer_plan(data_frame, columns_groupby, filter_cities).group_by(columns_groupby or pl.lit(0).alias("_total")).agg([
+        pl.col("revenue").filter(pl.col("is_target") == "target").alias("target"),
+        pl.col("revenue").filter(pl.col("is_target") == "control").alias("control")
+    ]).filter(
+        (pl.col("target").list.len() > 0) & (pl.col("control").list.len() > 0)
+    ).with_columns([
+        # Valores ordenados: a ordem do group_by não é determinística e mudaria o resultado para a mesma semente
+        pl.col("target").list.sort(),
+        pl.col("control").list.sort()
+    ]).collect()
+
+    if columns_groupby:
+        gastos = gastos.sort(columns_groupby)
+
+    sementes = np.random.SeedSequence(seed).spawn(gastos.height)
+    tarefas = [
+        (np.asarray(target, dtype=np.float64), np.asarray(control, dtype=np.float64), n_resamples, semente, alpha, max_elements)
+        for target, control, semente in zip(gastos["target"].to_list(), gastos["control"].to_list(), sementes)
+    ]
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(tarefas) <= 1:
+        intervalos = [_bootstrap_segment(*tarefa) for tarefa in tarefas]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            intervalos = list(executor.map(_bootstrap_segment, *zip(*tarefas)))
+
+    intervalos = np.array(intervalos, dtype=np.float64).reshape(-1, 4)
+    return gastos.select(columns_groupby).with_columns([
+        pl.Series("bootstrap_ci_low", intervalos[:, 0]),
+        pl.Series("bootstrap_ci_high", intervalos[:, 1]),
+        pl.Series("bootstrap_percent_ci_low", intervalos[:, 2]),
+        pl.Series("bootstrap_percent_ci_high", intervalos[:, 3])
+    ])
@@ -0,0 +1,732 @@
+import datetime
+import gc
+import weakref
+from itertools import combinations
+
+import polars as pl
+
+from profiling import profiled
+from schemas import apply_schema
+from utils import lazy_import
+from warehouse import cached_query, get_bq_client
+
+bigquery = lazy_import("google.cloud.bigquery") # parâmetros das consultas; o SDK só é importado na primeira consulta
+
+# Variável global para armazenar o dataframe
+df_sales = None
+
+### LEITURA DE VENDAS COM PROJEÇÃO E FILTROS ###
+
+# Colunas que podem ser lidas da gold.orders (uma linha por pedido) e a expressão SQL de cada uma
+# 'amount' é o valor do pedido, por isso sempre vem acompanhado de order_id
+colunas_sales = {
+    "order_id": "order_id",
+    "order_created_at": "order_created_at",
+    "order_month": "DATE(DATE_TRUNC(order_created_at, MONTH))",
+    "amount": "amount",
+    "customer_id": "customer_id",
+    "customer_name": "customer_name",
+    "customer_created_at": "customer_created_at",
+    "customer_active": "customer_active",
+    "is_target": "is_target",
+    "delivery_address_district": "delivery_address_district",
+    "delivery_address_city": "delivery_address_city",
+    "delivery_address_state": "delivery_address_state",
+    "merchant_id": "merchant_id",
+    "merchant_city": "merchant_city",
+    "merchant_enabled": "merchant_enabled",
+    "price_range": "price_range",
+    "average_ticket": "average_ticket",
+    "delivery_time": "delivery_time",
+    "minimum_order_value": "minimum_order_value",
+    "origin_platform": "origin_platform"
+}
+
+# Função que valida as colunas pedidas e inclui order_id quando 'amount' é pedido
+def _sales_columns(columns):
+    columns = list(colunas_sales) if columns is None else list(columns)
+
+    desconhecidas = [coluna for coluna in columns if coluna not in colunas_sales]
+    if desconhecidas:
+        raise ValueError(f"Colunas desconhecidas em gold.orders: {desconhecidas}")
+
+    if "amount" in columns and "order_id" not in columns:
+        columns = ["order_id"] + columns
+
+    return columns
+
+# Função que converte 'AAAA-MM-DD' (ou date/datetime) em date
+def _as_date(valor):
+    if isinstance(valor, datetime.datetime):
+        return valor.date()
+    if isinstance(valor, datetime.date):
+        return valor
+    return datetime.date.fromisoformat(valor)
+
+# Função que monta a consulta da gold.orders somente com as colunas e filtros pedidos (valores enviados como parâmetros)
+def _build_sales_query(columns, cities, segments, start_date, end_date, city_column):
+    filtros = []
+    parametros = []
+
+    if start_date is not None:
+        filtros.append("DATE(order_created_at) >= @start_date")
+        parametros.append(bigquery.ScalarQueryParameter("start_date", "DATE", _as_date(start_date)))
+    if end_date is not None:
+        filtros.append("DATE(order_created_at) <= @end_date")
+        parametros.append(bigquery.ScalarQueryParameter("end_date", "DATE", _as_date(end_date)))
+    if segments is not None:
+        filtros.append("is_target IN UNNEST(@segments)")
+        parametros.append(bigquery.ArrayQueryParameter("segments", "STRING", list(segments)))
+    if cities is not None:
+        filtros.append(f"{city_column} IN UNNEST(@cities)")
+        parametros.append(bigquery.ArrayQueryParameter("cities", "STRING", list(cities)))
+
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    select = ",\n                ".join(
+        coluna if colunas_sales[coluna] == coluna else f"{colunas_sales[coluna]} AS {coluna}"
+        for coluna in columns
+    )
+
+    # gold.orders já tem uma linha por pedido; sem order_id, o DISTINCT mantém uma linha por combinação das colunas
+    distinct = "" if "order_id" in columns else "DISTINCT"
+
+    qry = f"""
+            SELECT {distinct}
+                {select}
+            FROM gold.orders
+            {where}
+        """
+
+    return qry, bigquery.QueryJobConfig(query_parameters=parametros)
+
+# Função que lê arquivos Parquet locais (ex.: 'sales_*.parquet' da camada gold) aplicando as mesmas colunas e filtros
+def _scan_local_sales(source, columns, cities, segments, start_date, end_date, city_column):
+    lazy_frame = pl.scan_parquet(source)
+
+    if start_date is not None:
+        lazy_frame = lazy_frame.filter(pl.col("order_created_at").dt.date() >= _as_date(start_date))
+    if end_date is not None:
+        lazy_frame = lazy_frame.filter(pl.col("order_created_at").dt.date() <= _as_date(end_date))
+    if segments is not None:
+        lazy_frame = lazy_frame.filter(pl.col("is_target").is_in(list(segments)))
+    if cities is not None:
+        lazy_frame = lazy_frame.filter(pl.col(city_column).is_in(list(cities)))
+
+    if "order_month" in columns:
+        lazy_frame = lazy_frame.with_columns(
+            pl.col("order_created_at").dt.truncate("1mo").dt.date().alias("order_month")
+        )
+
+    chaves = [coluna for coluna in columns if coluna != "amount"]
+
+    # Mesmo resultado do GROUP BY ALL: uma linha por combinação das colunas, com o valor do pedido em 'amount'
+    if "amount" in columns:
+        return lazy_frame.group_by(chaves).agg(
+            pl.col("order_total_amount").max().alias("amount")
+        ).select(columns)
+
+    return lazy_frame.select(chaves).unique()
+
+# Função que lê as vendas trazendo somente as colunas e linhas necessárias para a análise
+def read_sales(columns=None, cities=None, segments=("target", "control"), start_date=None, end_date=None, city_column="merchant_city", source=None, client=None, use_cache=True, compact=True):
+    """
+    Retorna um LazyFrame com uma linha por pedido e as colunas pedidas (todas as de colunas_sales se None),
+    filtrado por cidade (city_column), segmento (is_target) e intervalo de datas do pedido (inclusivo).
+    A leitura é feita na gold.orders, e não na gold.sales (uma linha por item do pedido).
+    Os filtros e a projeção são enviados ao BigQuery na própria consulta, ou aplicados na leitura
+    dos arquivos 'sales_*.parquet' informados em 'source' (caminho ou padrão glob), sem baixar o restante.
+    Com compact=True, as colunas recebem os tipos compactos de schemas_tabelas["gold.orders"].
+    Arquivos gravados com colunas categóricas (extract_partitions_to_parquet com schema_tabela) têm cada um a
+    própria codificação: para ler vários deles, colete o resultado dentro de 'with pl.StringCache():'.
+    """
+    columns = _sales_columns(columns)
+    schema = (lambda lazy_frame: apply_schema(lazy_frame, "gold.orders")) if compact else (lambda lazy_frame: lazy_frame)
+
+    if city_column not in colunas_sales:
+        raise ValueError(f"Coluna de cidade desconhecida: {city_column}")
+
+    if source is not None:
+        return schema(_scan_local_sales(source, columns, cities, segments, start_date, end_date, city_column))
+
+    client = client or get_bq_client()
+    qry, job_config = _build_sales_query(columns, cities, segments, start_date, end_date, city_column)
+
+    if use_cache:
+        return schema(cached_query(client, qry, "gold.orders", job_config=job_config).lazy())
+
+    return schema(pl.from_arrow(client.query(qry, job_config=job_config).to_arrow()).lazy())
+
+# Função para rodar a consulta SQL e retornar o DataFrame
+@profiled()
+def get_sales_data():
+    global df_sales  # Usando a variável global
+    
+    if df_sales is None:  # Carregar dados apenas se ainda não estiver carregado
+        # Todas as colunas de colunas_sales (ou lendo do cache local, se gold.sales não mudou), já com os tipos compactos
+        df_sales = apply_schema(read_sales(compact=False).collect(), "gold.orders", report=True)
+        gc.collect()  # Coletar lixo para liberar memória
+
+    return df_sales
+
+# Função para retornar apenas algumas colunas do Banco
+def get_sales_data_some_columns():
+    df_sales = read_sales(columns=[
+        "order_id",
+        "order_month",
+        "amount",
+        "customer_id",
+        "customer_name",
+        "is_target",
+        "delivery_address_city",
+        "delivery_address_state",
+        "merchant_id",
+        "merchant_city",
+        "price_range",
+        "delivery_time",
+        "origin_platform"
+    ]).collect()
+    gc.collect()  # Coletar lixo para liberar memória
+
+    return df_sales
+
+# Colunas da gold.customer_summary (uma linha por cliente e grupo do teste A/B)
+colunas_customer_summary = [
+    "customer_id", "is_target", "customer_name", "customer_created_at", "customer_active",
+    "delivery_address_city", "delivery_address_state", "merchant_city",
+    "orders", "revenue", "first_order_at", "last_order_at", "distinct_merchants"
+]
+
+# Função que lê o resumo por cliente (gold.customer_summary), já pronto para as métricas de ARPU e recompra
+def read_customer_summary(columns=None, segments=("target", "control"), client=None, use_cache=True, compact=True):
+    """
+    Retorna um LazyFrame com uma linha por cliente e grupo (is_target): pedidos, receita, primeiro e
+    último pedido e as principais dimensões do cliente. Pode ser passado direto para calculate_ab_metrics
+    e para as funções do ab_stats, que usam 'orders' e 'revenue' sem reagregar os pedidos.
+    As cidades e o estado são os do primeiro pedido do cliente.
+    Com compact=True, as colunas recebem os tipos compactos de schemas_tabelas["gold.customer_summary"].
+    """
+    columns = list(colunas_customer_summary) if columns is None else list(columns)
+
+    desconhecidas = [coluna for coluna in columns if coluna not in colunas_customer_summary]
+    if desconhecidas:
+        raise ValueError(f"Colunas desconhecidas em gold.customer_summary: {desconhecidas}")
+
+    parametros = []
+    where = ""
+    if segments is not None:
+        where = "WHERE is_target IN UNNEST(@segments)"
+        parametros.append(bigquery.ArrayQueryParameter("segments", "STRING", list(segments)))
+
+    qry = f"""
+            SELECT
+                {", ".join(columns)}
+            FROM gold.customer_summary
+            {where}
+        """
+    job_config = bigquery.QueryJobConfig(query_parameters=parametros)
+
+    client = client or get_bq_client()
+    if use_cache:
+        lazy_frame = cached_query(client, qry, "gold.customer_summary", job_config=job_config).lazy()
+    else:
+        lazy_frame = pl.from_arrow(client.query(qry, job_config=job_config).to_arrow()).lazy()
+
+    return apply_schema(lazy_frame, "gold.customer_summary") if compact else lazy_frame
+
+### FAIXAS POR QUANTIL (N-TILES) ###
+
+# Pontos de corte já calculados: {(id do DataFrame, linhas, coluna, n, cidades): (referência ao DataFrame, pontos)}
+_quantile_cache = {}
+
+# Função que calcula (uma única vez por DataFrame, coluna, n e filtro de cidades) os pontos de corte dos n-tiles
+def quantile_cut_points(data_frame, column, n=4, filter_cities=None):
+    """
+    Retorna os quantis 1/n, 2/n, ..., (n-1)/n de 'column', calculados em um único select sobre as linhas
+    de filter_cities (merchant_city). Para DataFrames, o resultado fica em cache enquanto o DataFrame existir.
+    """
+    cidades = tuple(filter_cities) if filter_cities is not None else None
+    chave = None
+
+    if isinstance(data_frame, pl.DataFrame):
+        chave = (id(data_frame), data_frame.height, column, n, cidades)
+        referencia, pontos = _quantile_cache.get(chave, (None, None))
+        if referencia is not None and referencia() is data_frame:
+            return pontos
+
+    lazy_frame = data_frame.lazy()
+    if cidades is not None:
+        lazy_frame = lazy_frame.filter(pl.col("merchant_city").is_in(cidades))
+
+    pontos = list(lazy_frame.select([
+        pl.col(column).quantile(i / n).alias(f"q{i}") for i in range(1, n)
+    ]).collect().row(0))
+
+    if chave is not None:
+        # Remove as entradas de DataFrames que já foram liberados
+        for chave_antiga in [k for k, (ref, _) in _quantile_cache.items() if ref() is None]:
+            del _quantile_cache[chave_antiga]
+        _quantile_cache[chave] = (weakref.ref(data_frame), pontos)
+
+    return pontos
+
+# Função que retorna a expressão com a faixa (Q1..Qn) de cada linha, por busca binária nos pontos de corte
+def quantile_bucket(data_frame, column, n=4, filter_cities=None, alias=None):
+    """
+    Q1 recebe os valores <= primeiro ponto de corte, Q2 os valores até o segundo e assim por diante
+    (mesmo critério do encadeamento when/then com quantile). A coluna gerada se chama
+    '{column}_category', a menos que alias seja informado.
+    """
+    pontos = quantile_cut_points(data_frame, column, n, filter_cities)
+    indice = pl.lit(pl.Series(pontos, dtype=pl.Float64)).search_sorted(pl.col(column).cast(pl.Float64), side="left")
+
+    # Valores nulos ficam na última faixa, como no 'otherwise' do encadeamento original
+    indice = pl.when(pl.col(column).is_null()).then(pl.lit(n - 1, dtype=pl.UInt32)).otherwise(indice)
+
+    return pl.concat_str(pl.lit("Q"), (indice + 1).cast(pl.Utf8)).alias(alias or f"{column}_category")
+
+# Função para calcular métricas de avaliação do teste A/B
+@profiled()
+def calculate_evaluation_metrics(data_frame, columns_groupby, filter_cities):
+
+    if filter_cities == None and columns_groupby == None:
+        DataFrame = data_frame.group_by(["is_target"]).agg([
+            pl.col("order_id").n_unique().alias("orders"),
+            pl.col("customer_id").n_unique().alias("unique_customers"),
+            pl.col("amount").sum().alias("revenue"),
+            (pl.col("amount").sum() / pl.col("order_id").n_unique()).round(2).alias("TKM"),
+            (pl.col("amount").sum() / pl.col("customer_id").n_unique()).round(2).alias("ARPU")
+        ]).with_columns([
+            pl.col("revenue").sum().alias("total_revenue"),
+            pl.col("orders").sum().alias("total_orders"),
+            pl.col("unique_customers").sum().alias("total_customers")
+        ]).sort("is_target", descending=True)
+    elif filter_cities == None:
+        DataFrame = data_frame.group_by(["is_target"] + columns_groupby).agg([
+        pl.col("order_id").n_unique().alias("orders"),
+        pl.col("customer_id").n_unique().alias("unique_customers"),
+        pl.col("amount").sum().alias("revenue"),
+        (pl.col("amount").sum() / pl.col("order_id").n_unique()).round(2).alias("TKM"),
+        (pl.col("amount").sum() / pl.col("customer_id").n_unique()).round(2).alias("ARPU")
+    ]).with_columns([
+        pl.col("revenue").sum().over(columns_groupby).alias("total_revenue"),
+        pl.col("orders").sum().over(columns_groupby).alias("total_orders"),
+        pl.col("unique_customers").sum().over(columns_groupby).alias("total_customers")
+    ]).sort("is_target", descending=True)
+    else:
+        DataFrame = data_frame.filter(pl.col("merchant_city").is_in(filter_cities)).group_by(["is_target"] + columns_groupby).agg([
+        pl.col("order_id").n_unique().alias("orders"),
+        pl.col("customer_id").n_unique().alias("unique_customers"),
+        pl.col("amount").sum().alias("revenue"),
+        (pl.col("amount").sum() / pl.col("order_id").n_unique()).round(2).alias("TKM"),
+        (pl.col("amount").sum() / pl.col("customer_id").n_unique()).round(2).alias("ARPU")
+    ]).with_columns([
+        pl.col("revenue").sum().over(columns_groupby).alias("total_revenue"),
+        pl.col("orders").sum().over(columns_groupby).alias("total_orders"),
+        pl.col("unique_customers").sum().over(columns_groupby).alias("total_customers")
+    ]).sort("is_target", descending=True)
+    
+    return DataFrame
+
+# Função que calcula as métricas por range de preço
+@profiled()
+def calculate_evaluation_metrics_price_range(data_frame, filter_cities):
+
+    if filter_cities == None:
+        DataFrame = data_frame.group_by(["is_target","price_range"]).agg([
+        pl.col("order_id").n_unique().alias("orders"),
+        pl.col("customer_id").n_unique().alias("unique_customers"),
+        pl.col("amount").sum().alias("revenue"),
+        (pl.col("amount").sum() / pl.col("order_id").n_unique()).round(2).alias("TKM"),
+        (pl.col("amount").sum() / pl.col("customer_id").n_unique()).round(2).alias("ARPU")
+    ]).with_columns([
+        pl.col("revenue").sum().over("price_range").alias("total_revenue"),
+        pl.col("orders").sum().over("price_range").alias("total_orders"),
+        pl.col("unique_customers").sum().over("price_range").alias("total_customers")
+    ]).sort("is_target", descending=True)
+    else:
+        DataFrame = data_frame.filter(pl.col("merchant_city").is_in(filter_cities)).group_by(["is_target","price_range"]).agg([
+        pl.col("order_id").n_unique().alias("orders"),
+        pl.col("customer_id").n_unique().alias("unique_customers"),
+        pl.col("amount").sum().alias("revenue"),
+        (pl.col("amount").sum() / pl.col("order_id").n_unique()).round(2).alias("TKM"),
+        (pl.col("amount").sum() / pl.col("customer_id").n_unique()).round(2).alias("ARPU")
+    ]).with_columns([
+        pl.col("revenue").sum().over("price_range").alias("total_revenue"),
+        pl.col("orders").sum().over("price_range").alias("total_orders"),
+        pl.col("unique_customers").sum().over("price_range").alias("total_customers")
+    ]).sort("is_target", descending=True)
+    
+    return DataFrame
+
+# função que calcula as métricas por tempo de entrega
+@profiled()
+def calculate_evaluation_metrics_delivery_time(data_frame, filter_cities):
+    # Quartis de delivery_time calculados uma única vez por dataset e filtro (ver quantile_bucket)
+    delivery_time_category = quantile_bucket(data_frame, "delivery_time", 4, filter_cities)
+
+    if filter_cities is not None:
+        data_frame = data_frame.filter(pl.col("merchant_city").is_in(filter_cities))
+
+    DataFrame = data_frame.with_columns([
+        delivery_time_category
+    ]).group_by(["is_target","delivery_time_category"]).agg([
+        pl.col("order_id").n_unique().alias("orders"),
+        pl.col("customer_id").n_unique().alias("unique_customers"),
+        pl.col("amount").sum().alias("revenue"),
+        (pl.col("amount").sum() / pl.col("order_id").n_unique()).round(2).alias("TKM"),
+        (pl.col("amount").sum() / pl.col("customer_id").n_unique()).round(2).alias("ARPU")
+    ]).with_columns([
+        pl.col("revenue").sum().over("delivery_time_category").alias("total_revenue"),
+        pl.col("orders").sum().over("delivery_time_category").alias("total_orders"),
+        pl.col("unique_customers").sum().over("delivery_time_category").alias("total_customers")
+    ]).sort("is_target", descending=True)
+    
+    return DataFrame
+
+### FUNÇÕES QUE CALCULAM CLIENTES COM 2 PEDIDOS ###
+
+# Função para calcular a qtde de clientes que fizeram 2 pedidos
+@profiled()
+def calculate_engagement_custormers_two_orders(data_frame, columns_groupby, filter_cities):
+    if filter_cities is None and columns_groupby == None:
+        customers_with_2_orders = data_frame.group_by(["is_target","customer_id"]).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") == 2).group_by(["is_target"]).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_2_orders") 
+    ])
+    elif filter_cities is None:
+        customers_with_2_orders = data_frame.group_by(["is_target","customer_id"] + columns_groupby).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") == 2).group_by(["is_target"] + columns_groupby).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_2_orders") 
+    ])
+    else:
+        customers_with_2_orders = data_frame.filter(pl.col("merchant_city").is_in(filter_cities)).group_by(["is_target","customer_id"] + columns_groupby).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") == 2).group_by(["is_target"] + columns_groupby).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_2_orders") 
+    ])
+    return customers_with_2_orders
+
+
+
+# Função que retorna a qtde de clientes que fizeram 2 pedidos agregado por range de preço
+@profiled()
+def calculate_engagement_custormers_two_orders_price_range(data_frame, filter_cities):
+    if filter_cities is None:
+        customers_with_2_orders = data_frame.group_by(["is_target","customer_id","price_range"]).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") == 2).group_by(["is_target", "price_range"]).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_2_orders") 
+    ])
+    else:
+        customers_with_2_orders = data_frame.filter(pl.col("merchant_city").is_in(filter_cities)).group_by(["is_target","customer_id","price_range"]).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") == 2).group_by(["is_target","price_range"]).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_2_orders") 
+    ])
+    return customers_with_2_orders
+
+# Função que retorna a qtde de clientes que fizeram 2 pedidos agregado por tempo de entrega
+@profiled()
+def calculate_engagement_custormers_two_orders_delivery_time(data_frame, filter_cities):
+    delivery_time_category = quantile_bucket(data_frame, "delivery_time", 4, filter_cities)
+
+    if filter_cities is not None:
+        data_frame = data_frame.filter(pl.col("merchant_city").is_in(filter_cities))
+
+    customers_with_2_orders = data_frame.with_columns([
+        delivery_time_category
+    ]).group_by(["is_target","customer_id","delivery_time_category"]).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") == 2).group_by(["is_target","delivery_time_category"]).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_2_orders")
+    ])
+    return customers_with_2_orders
+
+### FUNÇÕES QUE CALCULAM CLIENTES COM 3 PEDIDOS ###
+
+# Função para calcular a qtde de clientes que fizeram 3 pedidos
+@profiled()
+def calculate_engagement_custormers_three_orders(data_frame, columns_groupby, filter_cities):
+    if filter_cities is None and columns_groupby == None:
+        customers_with_3_orders = data_frame.group_by(["is_target","customer_id"]).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") == 3).group_by(["is_target"]).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_3_orders")
+    ])
+    elif filter_cities == None:
+        customers_with_3_orders = data_frame.group_by(["is_target","customer_id"] + columns_groupby).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") == 3).group_by(["is_target"]  + columns_groupby).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_3_orders")
+    ])
+    else:
+        customers_with_3_orders = data_frame.filter(pl.col("merchant_city").is_in(filter_cities)).group_by(["is_target","customer_id"] + columns_groupby).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") == 3).group_by(["is_target"]  + columns_groupby).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_3_orders")
+    ])
+    return customers_with_3_orders
+
+
+# Função que retorna a qtde de clientes que fizeram 3 pedidos agregado por range de preço
+@profiled()
+def calculate_engagement_custormers_three_orders_price_range(data_frame, filter_cities):
+    if filter_cities is None:
+        customers_with_3_orders = data_frame.group_by(["is_target","customer_id","price_range"]).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") == 3).group_by(["is_target", "price_range"]).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_3_orders") 
+    ])
+    else:
+        customers_with_3_orders = data_frame.filter(pl.col("merchant_city").is_in(filter_cities)).group_by(["is_target","customer_id","price_range"]).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") == 3).group_by(["is_target","price_range"]).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_3_orders") 
+    ])
+    return customers_with_3_orders
+
+
+
+# Função que retorna a qtde de clientes que fizeram 3 pedidos agregado por tempo de entrega
+@profiled()
+def calculate_engagement_custormers_three_orders_delivery_time(data_frame, filter_cities):
+    delivery_time_category = quantile_bucket(data_frame, "delivery_time", 4, filter_cities)
+
+    if filter_cities is not None:
+        data_frame = data_frame.filter(pl.col("merchant_city").is_in(filter_cities))
+
+    customers_with_3_orders = data_frame.with_columns([
+        delivery_time_category
+    ]).group_by(["is_target","customer_id","delivery_time_category"]).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") == 3).group_by(["is_target","delivery_time_category"]).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_3_orders")
+    ])
+    return customers_with_3_orders
+
+### FUNÇÕES QUE CALCULAM CLIENTES COM MAIS DE 3 PEDIDOS ###
+
+# Função para calcular a qtde de clientes que fizeram mais de 3 pedidos
+@profiled()
+def calculate_engagement_custormers_three_plus_orders(data_frame, columns_groupby, filter_cities):
+    if filter_cities is None and columns_groupby == None:
+        customers_with_3_plus_orders = data_frame.group_by(["is_target","customer_id"]).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") > 3).group_by(["is_target"]).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_3_plus_orders")
+    ])
+    elif filter_cities == None:
+        customers_with_3_plus_orders = data_frame.group_by(["is_target","customer_id"] + columns_groupby).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") > 3).group_by(["is_target"] + columns_groupby).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_3_plus_orders")
+    ])
+    else:
+        customers_with_3_plus_orders = data_frame.filter(pl.col("merchant_city").is_in(filter_cities)).group_by(["is_target","customer_id"] + columns_groupby).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") > 3).group_by(["is_target"] + columns_groupby).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_3_plus_orders")
+    ])
+    return customers_with_3_plus_orders
+
+
+# Função para calcular a qtde de clientes que fizeram mais de 3 pedidos por Range de preço
+@profiled()
+def calculate_engagement_custormers_three_plus_orders_price_range(data_frame, filter_cities):
+    if filter_cities is None:
+        customers_with_3_plus_orders = data_frame.group_by(["is_target","customer_id","price_range"]).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") > 3).group_by(["is_target","price_range"]).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_3_plus_orders")
+    ])
+    else:
+        customers_with_3_plus_orders = data_frame.filter(pl.col("merchant_city").is_in(filter_cities)).group_by(["is_target","customer_id","price_range"]).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") > 3).group_by(["is_target","price_range"]).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_3_plus_orders")
+    ])
+    return customers_with_3_plus_orders
+
+
+# Função para calcular a qtde de clientes que fizeram mais de 3 pedidos por Tempo de entrega
+@profiled()
+def calculate_engagement_custormers_three_plus_orders_delivery_time(data_frame, filter_cities):
+    delivery_time_category = quantile_bucket(data_frame, "delivery_time", 4, filter_cities)
+
+    if filter_cities is not None:
+        data_frame = data_frame.filter(pl.col("merchant_city").is_in(filter_cities))
+
+    customers_with_3_plus_orders = data_frame.with_columns([
+        delivery_time_category
+    ]).group_by(["is_target","customer_id","delivery_time_category"]).agg([
+        pl.col("order_id").count().alias("orders")
+    ]).filter(pl.col("orders") > 3).group_by(["is_target","delivery_time_category"]).agg([
+        pl.col("customer_id").n_unique().alias("customers_with_3_plus_orders")
+    ])
+    return customers_with_3_plus_orders
+
+### MÉTRICAS DO TESTE A/B EM UMA ÚNICA PASSADA ###
+
+# Função auxiliar que padroniza as colunas de agrupamento (aceita None, string ou lista)
+def _normalize_columns_groupby(columns_groupby):
+    if columns_groupby is None:
+        return []
+    if isinstance(columns_groupby, str):
+        return [columns_groupby]
+    return list(columns_groupby)
+
+# Função que monta a pré-agregação por cliente (uma linha por grupo, segmento e cliente)
+# Um resumo já agregado por cliente (gold.customer_summary, com 'orders' e 'revenue' e sem 'order_id') é usado como está
+def _per_customer_plan(data_frame, columns_groupby, filter_cities):
+    lazy_frame = data_frame.lazy()
+    colunas = lazy_frame.collect_schema().names()
+    resumo_por_cliente = "order_id" not in colunas and {"orders", "revenue"} <= set(colunas)
+
+    # No resumo, os recortes e o filtro de cidades só podem usar as colunas guardadas nele (as cidades são as do
+    # primeiro pedido do cliente); dimensões de cada pedido (ex.: price_range) exigem as vendas de read_sales
+    if resumo_por_cliente:
+        usadas = columns_groupby + (["merchant_city"] if filter_cities is not None else [])
+        ausentes = [coluna for coluna in usadas if coluna not in colunas]
+        if ausentes:
+            raise ValueError(
+                f"Colunas {ausentes} não existem no resumo por cliente (gold.customer_summary); "
+                "use read_sales para recortar ou filtrar por atributos de cada pedido."
+            )
+
+    if filter_cities is not None:
+        lazy_frame = lazy_frame.filter(pl.col("merchant_city").is_in(filter_cities))
+
+    if resumo_por_cliente:
+        return lazy_frame.select(["is_target"] + columns_groupby + ["customer_id", "orders", "revenue"])
+
+    return lazy_frame.group_by(["is_target"] + columns_groupby + ["customer_id"]).agg([
+        pl.col("order_id").n_unique().alias("orders"),
+        pl.col("amount").sum().alias("revenue")
+    ])
+
+# Função que consolida a pré-agregação por cliente nas métricas por grupo e segmento
+def _aggregate_ab_metrics(per_customer, columns_groupby):
+    if columns_groupby:
+        total = lambda coluna: pl.col(coluna).sum().over(columns_groupby)
+    else:
+        total = lambda coluna: pl.col(coluna).sum()
+
+    return per_customer.group_by(["is_target"] + columns_groupby).agg([
+        pl.col("orders").sum().alias("orders"),
+        pl.len().alias("unique_customers"),
+        pl.col("revenue").sum().alias("revenue"),
+        (pl.col("orders") == 2).sum().alias("customers_with_2_orders"),
+        (pl.col("orders") == 3).sum().alias("customers_with_3_orders"),
+        (pl.col("orders") > 3).sum().alias("customers_with_3_plus_orders")
+    ]).with_columns([
+        (pl.col("revenue") / pl.col("orders")).round(2).alias("TKM"),
+        (pl.col("revenue") / pl.col("unique_customers")).round(2).alias("ARPU"),
+        total("revenue").alias("total_revenue"),
+        total("orders").alias("total_orders"),
+        total("unique_customers").alias("total_customers"),
+        (pl.col("customers_with_2_orders") / pl.col("unique_customers")).round(3).alias("percent_customers_with_2_orders"),
+        (pl.col("customers_with_3_orders") / pl.col("unique_customers")).round(3).alias("percent_customers_with_3_orders"),
+        (pl.col("customers_with_3_plus_orders") / pl.col("unique_customers")).round(3).alias("percent_customers_with_3_plus_orders")
+    ]).select(
+        ["is_target"] + columns_groupby + [
+            "orders", "unique_customers", "revenue", "TKM", "ARPU",
+            "total_revenue", "total_orders", "total_customers",
+            "customers_with_2_orders", "percent_customers_with_2_orders",
+            "customers_with_3_orders", "percent_customers_with_3_orders",
+            "customers_with_3_plus_orders", "percent_customers_with_3_plus_orders"
+        ]
+    ).sort("is_target", descending=True)
+
+# Função que calcula todas as métricas do teste A/B (ARPU, TKM e recompra) a partir de um único plano
+@profiled()
+def calculate_ab_metrics(data_frame, columns_groupby=None, filter_cities=None, ntiles=None):
+    """
+    Substitui calculate_evaluation_metrics + calculate_engagement_custormers_* e os joins por 'is_target'.
+    Os dados são lidos uma única vez e pré-agregados por cliente; pedidos, clientes únicos, receita,
+    TKM, ARPU e a qtde/percentual de clientes com 2, 3 e mais de 3 pedidos saem dessa mesma agregação.
+    Aceita DataFrame ou LazyFrame do Polars, com uma linha por pedido (read_sales) ou por cliente (read_customer_summary).
+    Com o resumo por cliente, columns_groupby e filter_cities só podem usar colunas do resumo (senão, ValueError).
+    ntiles ({coluna: n}, ex.: {"delivery_time": 4, "average_ticket": 5}) agrupa também pelas faixas
+    '{coluna}_category' (Q1..Qn) de cada coluna numérica.
+    """
+    columns_groupby = _normalize_columns_groupby(columns_groupby)
+
+    if ntiles:
+        data_frame = data_frame.with_columns([
+            quantile_bucket(data_frame, column, n, filter_cities) for column, n in ntiles.items()
+        ])
+        columns_groupby = columns_groupby + [f"{column}_category" for column in ntiles]
+    per_customer = _per_customer_plan(data_frame, columns_groupby, filter_cities)
+
+    return _aggregate_ab_metrics(per_customer, columns_groupby).collect()
+
+### MÉTRICAS POR VÁRIOS RECORTES (GROUPING SETS / ROLLUP / CUBE) ###
+
+# Função que gera todos os subconjuntos das dimensões (equivalente ao GROUP BY CUBE), do total ao recorte completo
+def grouping_sets_cube(dimensions):
+    dimensions = _normalize_columns_groupby(dimensions)
+    return [list(conjunto) for tamanho in range(len(dimensions) + 1) for conjunto in combinations(dimensions, tamanho)]
+
+# Função que gera os prefixos das dimensões (equivalente ao GROUP BY ROLLUP), do total ao recorte completo
+def grouping_sets_rollup(dimensions):
+    dimensions = _normalize_columns_groupby(dimensions)
+    return [dimensions[:tamanho] for tamanho in range(len(dimensions) + 1)]
+
+# Função que calcula as métricas do teste A/B para vários recortes a partir de uma única pré-agregação
+@profiled()
+def calculate_ab_metrics_rollup(data_frame, grouping_sets, filter_cities=None, ntiles=None):
+    """
+    Equivalente a chamar calculate_ab_metrics uma vez por recorte, mas os dados são lidos uma única vez:
+    a pré-agregação por cliente é feita no recorte mais fino (união de todas as dimensões) e cada recorte
+    é obtido somando essa pré-agregação. Isso vale porque as dimensões são atributos do pedido (cidade,
+    range de preço, faixa de tempo de entrega...), ou seja, cada pedido cai em um único grupo do recorte fino.
+    grouping_sets é uma lista de recortes (ex.: [["price_range"], ["delivery_time_category"], []]);
+    use grouping_sets_cube/grouping_sets_rollup para gerar todas as combinações. [] é o total.
+    Retorna um único DataFrame em formato longo, com as colunas 'dimension' (nome das dimensões do recorte)
+    e 'segment' (valores das dimensões, separados por ' | '), seguidas das métricas de calculate_ab_metrics.
+    """
+    grouping_sets = [_normalize_columns_groupby(conjunto) for conjunto in grouping_sets]
+
+    if ntiles:
+        data_frame = data_frame.with_columns([
+            quantile_bucket(data_frame, column, n, filter_cities) for column, n in ntiles.items()
+        ])
+
+    # União das dimensões de todos os recortes, na ordem em que aparecem
+    todas_dimensoes = list(dict.fromkeys(coluna for conjunto in grouping_sets for coluna in conjunto))
+
+    # Pré-agregação fina, materializada uma única vez e reaproveitada por todos os recortes
+    per_customer_fine = _per_customer_plan(data_frame, todas_dimensoes, filter_cities).collect()
+
+    resultados = []
+    for conjunto in grouping_sets:
+        per_customer = per_customer_fine.lazy().group_by(["is_target"] + conjunto + ["customer_id"]).agg([
+            pl.col("orders").sum(),
+            pl.col("revenue").sum()
+        ])
+
+        if conjunto:
+            segmento = pl.concat_str([pl.col(coluna).cast(pl.Utf8) for coluna in conjunto], separator=" | ")
+        else:
+            segmento = pl.lit("total")
+
+        resultados.append(
+            _aggregate_ab_metrics(per_customer, conjunto).with_columns([
+                pl.lit(", ".join(conjunto) or "total").alias("dimension"),
+                segmento.alias("segment")
+            ]).drop(conjunto)
+        )
+
+    metricas = pl.concat(pl.collect_all(resultados), how="vertical")
+    return metricas.select(["dimension", "segment"] + [coluna for coluna in metricas.columns if coluna not in ("dimension", "segment")])
+
+# Função que extrai um recorte do resultado de calculate_ab_metrics_rollup, no formato de calculate_ab_metrics
+# (a coluna 'segment' volta a se chamar como a dimensão e, se informado, volta ao tipo original)
+def get_rollup_set(df_rollup, dimension, dtype=None):
+    recorte = df_rollup.filter(pl.col("dimension") == dimension).drop("dimension").rename({"segment": dimension})
+    recorte = recorte.select(["is_target", dimension] + [coluna for coluna in recorte.columns if coluna not in ("is_target", dimension)])
+    if dtype is not None:
+        recorte = recorte.with_columns(pl.col(dimension).cast(dtype))
+    return recorte
@@ -0,0 +1,700 @@
+import html # biblioteca para decodificar HTML
+import json # biblioteca para manipulação de JSON
+import os
+import re # biblioteca para expressões regulares
+import threading
+from functools import lru_cache
+
+import polars as pl
+
+import utils # configuração do projeto (caminhos das marcas d'água)
+from profiling import profiled
+from schemas import apply_schema
+from warehouse import read_manifest, write_manifest
+
+### CARGA INCREMENTAL (MARCAS D'ÁGUA POR SEMANA) ###
+
+# Trava das marcas d'água: etapas executadas ao mesmo tempo (ex.: silver.order e silver.order_details no pipeline.py)
+# atualizam o mesmo arquivo
+_trava_marcas_dagua = threading.Lock()
+
+# Função que lê as marcas d'água: {tabela_destino: {semana: última insert_date da origem já processada}}
+def load_watermarks(caminho=None):
+    return read_manifest(caminho or utils.arquivo_marcas_dagua) or {}
+
+# Função que grava as marcas d'água
+def save_watermarks(marcas, caminho=None):
+    caminho = caminho or utils.arquivo_marcas_dagua
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    write_manifest(caminho, marcas)
+
+# Função que lista as semanas da tabela de origem com a última data de inserção de cada uma
+def list_partitions(client, tabela_origem, coluna_data="order_created_at"):
+    qry = f"""
+        SELECT
+            CAST(DATE(DATE_TRUNC({coluna_data}, WEEK)) AS STRING) AS semana,
+            MAX(insert_date) AS ultima_insercao
+        FROM {tabela_origem}
+        WHERE {coluna_data} IS NOT NULL
+        GROUP BY 1
+        ORDER BY 1
+    """
+    df = pl.from_arrow(client.query(qry).to_arrow())
+    return {semana: str(ultima_insercao) for semana, ultima_insercao in df.iter_rows()}
+
+# Função que retorna somente as semanas novas ou recarregadas na origem desde a última execução para tabela_destino
+def get_pending_partitions(client, tabela_origem, tabela_destino, coluna_data="order_created_at", caminho=None):
+    """
+    Compara a última insert_date de cada semana da origem com a marca d'água registrada para
+    tabela_destino. Retorna {semana: ultima_insercao}, que deve ser passado para
+    mark_partitions_processed depois que a carga da tabela_destino terminar com sucesso.
+    """
+    processadas = load_watermarks(caminho).get(tabela_destino, {})
+    particoes = list_partitions(client, tabela_origem, coluna_data)
+    pendentes = {semana: ultima for semana, ultima in particoes.items() if processadas.get(semana) != ultima}
+
+    print(f"{tabela_destino}: {len(pendentes)} de {len(particoes)} semanas pendentes {sorted(pendentes)}")
+    return pendentes
+
+# Função que registra as semanas processadas na marca d'água da tabela_destino
+def mark_partitions_processed(tabela_destino, particoes, caminho=None):
+    with _trava_marcas_dagua:
+        marcas = load_watermarks(caminho)
+        marcas.setdefault(tabela_destino, {}).update(particoes)
+        save_watermarks(marcas, caminho)
+    print(f"Marca d'água de {tabela_destino} atualizada com {len(particoes)} semanas.")
+
+### NORMALIZAÇÃO DE TEXTO (aspas, caixa, espaços e entidades HTML) ###
+
+# Função que desfaz as entidades HTML de um valor; memoizada, pois os mesmos nomes se repetem muito
+@lru_cache(maxsize=200_000)
+def _unescape_html_cached(valor):
+    return html.unescape(valor)
+
+# Função que desfaz as entidades HTML de uma coluna: somente as linhas com '&' são decodificadas,
+# uma vez por valor distinto, e o resultado volta para a coluna com um replace nativo do Polars
+def _unescape_html_series(series):
+    com_entidade = series.str.contains("&", literal=True).fill_null(False)
+    if not com_entidade.any():
+        return series
+
+    distintos = series.filter(com_entidade).unique()
+    decodificados = pl.Series([_unescape_html_cached(valor) for valor in distintos.to_list()], dtype=pl.Utf8)
+    return series.replace(distintos, decodificados)
+
+# Função que normaliza colunas de texto com expressões nativas do Polars (aceita DataFrame ou LazyFrame)
+@profiled()
+def normalize_text_columns(data_frame, columns=None, titlecase=False, remove_quotes=True, strip=True, unescape_html=True):
+    """
+    Aplica, nesta ordem: decodificação das entidades HTML (somente nas linhas com '&', memoizada por valor),
+    title case, remoção de aspas simples e duplas e remoção de espaços nas pontas.
+    Sem columns, normaliza todas as colunas de texto. Retorna o mesmo tipo recebido.
+    """
+    if columns is None:
+        columns = [nome for nome, tipo in data_frame.collect_schema().items() if tipo == pl.Utf8]
+
+    expressoes = []
+    for coluna in columns:
+        expressao = pl.col(coluna)
+        if unescape_html:
+            expressao = expressao.map_batches(_unescape_html_series, return_dtype=pl.Utf8, is_elementwise=True)
+        if titlecase:
+            expressao = expressao.str.to_titlecase()
+        if remove_quotes:
+            expressao = expressao.str.replace_all('"', "", literal=True).str.replace_all("'", "", literal=True)
+        if strip:
+            expressao = expressao.str.strip_chars()
+        expressoes.append(expressao.alias(coluna))
+
+    return data_frame.with_columns(expressoes)
+
+### CAMADA SILVER: MERCHANTS, AB_TEST E CONSUMER (ÚLTIMA CARGA DA BRONZE) ###
+# Consultas e transformações usadas pelo notebook etl_camada_silver e pelo pipeline.py
+
+# Consulta da última carga de uma tabela da bronze ('{tabela}' e '{colunas}' são substituídos)
+qry_ultima_carga_bronze = """
+    WITH ultima_carga AS (
+        SELECT MAX(insert_date) AS last_date
+        FROM bronze.{tabela}
+    )
+    SELECT {colunas}
+    FROM bronze.{tabela} t
+    INNER JOIN ultima_carga uc
+        ON t.insert_date = uc.last_date
+"""
+
+# Colunas lidas da bronze para cada tabela da silver
+colunas_bronze_silver = {
+    "merchants": [
+        "id AS merchant_id", "created_at", "enabled", "price_range", "average_ticket", "takeout_time", "delivery_time",
+        "minimum_order_value", "merchant_zip_code", "merchant_city", "merchant_state", "merchant_country"
+    ],
+    "ab_test": ["customer_id", "is_target"],
+    "consumer": [
+        "customer_id", "language", "created_at", "active", "customer_name", "customer_phone_area", "customer_phone_number"
+    ]
+}
+
+# Função que lê a última carga de uma tabela da bronze, com as colunas usadas na silver
+def read_last_bronze_load(client, tabela):
+    qry = qry_ultima_carga_bronze.format(tabela=tabela, colunas=", ".join(colunas_bronze_silver[tabela]))
+    return pl.from_arrow(client.query(qry).to_arrow())
+
+# Função que transforma a última carga da bronze.merchants no formato da silver.merchants
+def transform_merchants(df_merchants, insert_date, report=False):
+    # Converte a data e capitaliza os nomes de cidades; a cidade vira categórica depois do title case
+    df_merchants = apply_schema(df_merchants, "bronze.merchants").with_columns(
+        pl.col("created_at").str.to_datetime(time_unit="ms"),
+        pl.col("merchant_city").str.to_titlecase(),
+        pl.lit(insert_date).alias("insert_date")
+    )
+    return apply_schema(df_merchants, "silver.merchants", report=report)
+
+# Função que transforma a última carga da bronze.ab_test no formato da silver.ab_test
+def transform_ab_test(df_ab_test, insert_date, report=False):
+    df_ab_test = apply_schema(df_ab_test, "bronze.ab_test", report=report)
+    return df_ab_test.with_columns(pl.lit(insert_date).alias("insert_date"))
+
+# Função que transforma a última carga da bronze.consumer no formato da silver.consumer
+def transform_consumer(df_consumer, insert_date, report=False):
+    # Remove aspas e espaços nas pontas e desfaz entidades HTML (somente os valores com '&' passam pelo html.unescape)
+    df_consumer = normalize_text_columns(df_consumer).with_columns(
+        pl.col("created_at").str.to_datetime(time_unit="ms"),
+        pl.lit(insert_date).alias("insert_date")
+    )
+    # Idioma e nome como categóricas, depois da normalização dos textos
+    return apply_schema(df_consumer, "silver.consumer", report=report)
+
+### CAMADA SILVER: PEDIDOS (order) POR SEMANA ###
+
+# Consulta por semana do cabeçalho dos pedidos: '{particao}' é substituído pela semana em cada extração
+# Cada semana considera somente a última carga dela na bronze, já sem pedidos duplicados. A última carga de cada semana
+# vem de uma agregação (sem janela sobre a tabela inteira) e a deduplicação (ROW_NUMBER) só ordena os registros dos
+# pedidos da semana, inclusive os repetidos em outras semanas. O intervalo em order_created_at permite ao BigQuery ler
+# somente as partições da semana quando a bronze.orders é particionada por DATE(order_created_at).
+qry_silver_orders = """
+    WITH cargas AS (
+        SELECT
+            DATE_TRUNC(order_created_at, WEEK) AS inicio_semana,
+            MAX(insert_date) AS last_date
+        FROM bronze.orders
+        GROUP BY 1
+    ),
+    pedidos_semana AS (
+        SELECT o.order_id
+        FROM bronze.orders o
+        INNER JOIN cargas c
+            ON DATE_TRUNC(o.order_created_at, WEEK) = c.inicio_semana
+            AND o.insert_date = c.last_date
+        WHERE o.order_created_at >= TIMESTAMP('{particao}')
+            AND o.order_created_at < TIMESTAMP_ADD(TIMESTAMP('{particao}'), INTERVAL 7 DAY)
+    ),
+    base AS (
+        -- Remove os pedidos duplicados mantendo o primeiro registro de cada pedido (o mesmo critério de order_details)
+        SELECT
+            CAST(DATE(c.inicio_semana) AS STRING) AS semana,
+            o.* EXCEPT(items)
+        FROM bronze.orders o
+        INNER JOIN cargas c
+            ON DATE_TRUNC(o.order_created_at, WEEK) = c.inicio_semana
+            AND o.insert_date = c.last_date
+        WHERE o.order_id IN (SELECT order_id FROM pedidos_semana)
+        QUALIFY ROW_NUMBER() OVER(PARTITION BY o.order_id ORDER BY o.order_created_at ASC) = 1
+    )
+    SELECT * EXCEPT(semana)
+    FROM base
+    WHERE semana = '{particao}'
+"""
+
+# Consulta por semana dos itens dos pedidos, com o mesmo critério de deduplicação e as mesmas restrições à semana
+# (a coluna 'order_id' não é única por pedido na bronze)
+qry_silver_order_details = """
+    WITH cargas AS (
+        SELECT
+            DATE_TRUNC(order_created_at, WEEK) AS inicio_semana,
+            MAX(insert_date) AS last_date
+        FROM bronze.orders
+        GROUP BY 1
+    ),
+    pedidos_semana AS (
+        SELECT o.order_id
+        FROM bronze.orders o
+        INNER JOIN cargas c
+            ON DATE_TRUNC(o.order_created_at, WEEK) = c.inicio_semana
+            AND o.insert_date = c.last_date
+        WHERE o.order_created_at >= TIMESTAMP('{particao}')
+            AND o.order_created_at < TIMESTAMP_ADD(TIMESTAMP('{particao}'), INTERVAL 7 DAY)
+    ),
+    base AS (
+        SELECT
+            CAST(DATE(c.inicio_semana) AS STRING) AS semana,
+            o.order_id,
+            o.cpf,
+            o.items
+        FROM bronze.orders o
+        INNER JOIN cargas c
+            ON DATE_TRUNC(o.order_created_at, WEEK) = c.inicio_semana
+            AND o.insert_date = c.last_date
+        WHERE o.order_id IN (SELECT order_id FROM pedidos_semana)
+        QUALIFY ROW_NUMBER() OVER(PARTITION BY o.order_id ORDER BY o.order_created_at ASC) = 1
+    )
+    SELECT * EXCEPT(semana)
+    FROM base
+    WHERE semana = '{particao}'
+"""
+
+# Função com as transformações do cabeçalho do pedido (silver.order), aplicada de forma lazy
+def transform_orders(lazy_frame):
+    lazy_frame = normalize_text_columns(lazy_frame, ["customer_name"], titlecase=True)
+    lazy_frame = normalize_text_columns(lazy_frame, ["delivery_address_district"], titlecase=True, remove_quotes=False)
+
+    return lazy_frame.with_columns(
+        pl.col("cpf").cast(pl.Utf8).str.zfill(11), # preenchendo CPF com zeros à esquerda
+        pl.col("delivery_address_city").str.to_titlecase()
+    ).select(
+        "order_id",
+        "order_created_at",
+        "cpf",
+        "customer_id",
+        "customer_name",
+        "delivery_address_district",
+        "delivery_address_city",
+        "delivery_address_state",
+        "delivery_address_country",
+        "delivery_address_zip_code",
+        "delivery_address_latitude",
+        "delivery_address_longitude",
+        "delivery_address_external_id",
+        "merchant_id",
+        "merchant_latitude",
+        "merchant_longitude",
+        "merchant_timezone",
+        "order_total_amount",
+        "order_scheduled",
+        "order_scheduled_date",
+        "origin_platform"
+    )
+
+# Função que transforma os Parquets extraídos por semana e grava o resultado de cada semana em um novo Parquet
+@profiled()
+def transform_orders_to_parquet(arquivos, pasta_destino, prefixo="order"):
+    """
+    arquivos é o dicionário {semana: caminho} retornado por extract_partitions_to_parquet, já sem pedidos
+    duplicados (a deduplicação é feita na consulta, com QUALIFY). Cada semana é lida com scan_parquet,
+    transformada e gravada com sink_parquet em '{pasta_destino}/{prefixo}_{semana}.parquet', uma semana por
+    vez e sem juntar as semanas em memória, já com os tipos compactos de schemas_tabelas["silver.order"].
+    Os arquivos gerados podem ser enviados com send_parquets_to_bigquery. Retorna um dicionário {semana: caminho}.
+    """
+    os.makedirs(pasta_destino, exist_ok=True)
+    arquivos_transformados = {}
+
+    for semana, caminho in arquivos.items():
+        caminho_destino = os.path.join(pasta_destino, f"{prefixo}_{semana}.parquet")
+
+        # Grava em um arquivo temporário e renomeia, para não deixar Parquet incompleto em caso de falha
+        apply_schema(transform_orders(pl.scan_parquet(caminho)), "silver.order").sink_parquet(caminho_destino + ".tmp")
+        os.replace(caminho_destino + ".tmp", caminho_destino)
+
+        arquivos_transformados[semana] = caminho_destino
+        print(f"Semana {semana} transformada em {caminho_destino}")
+
+    return arquivos_transformados
+
+# Função criada para limpar e tratar colunas no formato json
+def safe_json_parse(text):
+    try:
+
+         # Garante que o texto é string
+        if not isinstance(text, str):
+            return None
+        
+        # Etapa 1: limpeza básica
+        text = text.strip()
+
+        # Remove aspas externas: "...." → ....
+        if text.startswith('"') and text.endswith('"'):
+            text = text[1:-1]
+
+        # Etapa 2: transforma \\\" → " (escape duplo)
+        text = text.replace('\\\"', '"')
+
+        # Etapa 3: transforma \" → " (escape simples)
+        text = text.replace('\"', '"')
+
+        # Etapa 4: substitui aspas duplas duplicadas no início e fim: ""abc"" → "abc"
+        text = re.sub(r'""([^"]*?)""', r'"\1"', text)
+
+        # Etapa 5: reduz excesso de aspas seguidas internas: """ → "
+        text = re.sub(r'"+', r'"', text)
+
+        # Etapa 6: remove barras soltas antes de aspas
+        text = re.sub(r'\\"', r'"', text)
+
+        # Etapa 7: parse final
+        return json.loads(text)
+
+    except Exception:
+        return None
+
+### DECODIFICAÇÃO VETORIZADA DA COLUNA 'items' (order_details) ###
+
+# Schema tipado dos itens do pedido. Os campos ficam como texto, igual ao laço original com str(),
+# e são convertidos para número na etapa de transformação da camada silver.
+_items_valor = pl.Struct({"value": pl.Utf8})
+
+_items_garnish_dtype = pl.Struct({
+    "name": pl.Utf8,
+    "quantity": pl.Utf8,
+    "sequence": pl.Utf8,
+    "unitPrice": _items_valor,
+    "addition": _items_valor,
+    "discount": _items_valor
+})
+
+items_json_dtype = pl.List(pl.Struct({
+    **{campo.name: campo.dtype for campo in _items_garnish_dtype.fields},
+    "garnishItems": pl.List(_items_garnish_dtype)
+}))
+
+# Função que decodifica um bloco de JSON de forma estrita; quando o bloco falha, divide ao meio
+# até isolar as linhas malformadas (que retornam nulo)
+def _decode_items_strict(series):
+    if series.len() == 0:
+        return pl.Series(series.name, [], dtype=items_json_dtype)
+
+    try:
+        return series.str.json_decode(items_json_dtype)
+    except pl.exceptions.PolarsError:
+        if series.len() == 1:
+            return pl.Series(series.name, [None], dtype=items_json_dtype)
+        meio = series.len() // 2
+        return pl.concat([
+            _decode_items_strict(series.slice(0, meio)),
+            _decode_items_strict(series.slice(meio))
+        ])
+
+# Versão colunar das etapas de limpeza do safe_json_parse (mesmas regras, aplicadas como expressões do Polars)
+def _safe_json_clean_expr(coluna):
+    texto = pl.col(coluna).str.strip_chars()
+    entre_aspas = texto.str.starts_with('"') & texto.str.ends_with('"')
+    texto = pl.when(entre_aspas).then(texto.str.strip_prefix('"').str.strip_suffix('"')).otherwise(texto)
+
+    return (
+        texto
+        .str.replace_all('\\"', '"', literal=True)
+        .str.replace_all(r'""([^"]*?)""', r'"${1}"')
+        .str.replace_all(r'"+', '"')
+        .str.replace_all('\\"', '"', literal=True)
+    )
+
+# Função que repara, via safe_json_parse, as linhas que nem a limpeza colunar conseguiu recuperar
+def _repair_items(series):
+    reparados = []
+    for text in series.to_list():
+        parsed = safe_json_parse(text)
+        if parsed is None:
+            reparados.append(None)
+        elif isinstance(parsed, list):
+            reparados.append(json.dumps(parsed))
+        else:
+            reparados.append("[]")  # o laço original ignorava conteúdos que não são lista
+    return pl.Series(series.name, reparados, dtype=pl.Utf8)
+
+# Função que seleciona as colunas no layout da tabela order_details
+def _select_order_details(data_frame, tipo):
+    return data_frame.select(
+        pl.col("order_id"),
+        pl.col("cpf"),
+        pl.col("name"),
+        pl.col("quantity"),
+        pl.col("sequence"),
+        pl.col("unitPrice").struct.field("value").alias("unitPrice"),
+        pl.col("addition").struct.field("value").alias("addition"),
+        pl.col("discount").struct.field("value").alias("discount"),
+        pl.lit(tipo).alias("type")
+    )
+
+# Função que decodifica e 'explode' um bloco de linhas da coluna 'items'
+def _parse_order_items_batch(data_frame):
+    df = data_frame.select(
+        pl.col("order_id"),
+        pl.col("cpf"),
+        pl.col("items").cast(pl.Utf8).str.strip_chars().alias("items_clean")
+    )
+
+    # Candidatas ao caminho rápido: texto que já começa e termina como uma lista JSON
+    candidata = pl.col("items_clean").str.starts_with("[") & pl.col("items_clean").str.ends_with("]")
+    df = df.with_columns(candidata.fill_null(False).alias("candidata"))
+
+    df_rapido = df.filter(pl.col("candidata"))
+    df_rapido = df_rapido.with_columns(_decode_items_strict(df_rapido["items_clean"]).alias("parsed_items"))
+
+    # Linhas malformadas (ou que falharam na decodificação estrita) passam pela limpeza colunar
+    df_reparo = pl.concat([
+        df.filter(~pl.col("candidata")),
+        df_rapido.filter(pl.col("parsed_items").is_null()).drop("parsed_items")
+    ])
+    df_reparo = df_reparo.with_columns(_safe_json_clean_expr("items_clean").alias("items_reparado"))
+    df_reparo = df_reparo.with_columns(_decode_items_strict(df_reparo["items_reparado"]).alias("parsed_items"))
+
+    # O que ainda falhar segue para o safe_json_parse, linha a linha
+    df_python = df_reparo.filter(pl.col("parsed_items").is_null()).drop("parsed_items")
+    df_python = df_python.with_columns(_repair_items(df_python["items_clean"]).alias("items_reparado"))
+    df_python = df_python.with_columns(_decode_items_strict(df_python["items_reparado"]).alias("parsed_items"))
+
+    df_invalidos = df_python.filter(pl.col("parsed_items").is_null()).select(
+        pl.col("order_id").cast(pl.Utf8),
+        pl.col("cpf").cast(pl.Utf8),
+        pl.col("items_clean").alias("items")
+    )
+
+    df_parsed = pl.concat([
+        df_rapido.filter(pl.col("parsed_items").is_not_null()).select("order_id", "cpf", "parsed_items"),
+        df_reparo.filter(pl.col("parsed_items").is_not_null()).select("order_id", "cpf", "parsed_items"),
+        df_python.filter(pl.col("parsed_items").is_not_null()).select("order_id", "cpf", "parsed_items")
+    ])
+
+    # Explode os itens principais e, a partir deles, os garnishItems
+    df_itens = df_parsed.explode("parsed_items").drop_nulls("parsed_items").unnest("parsed_items")
+    df_garnish = df_itens.select("order_id", "cpf", "garnishItems").explode("garnishItems").drop_nulls("garnishItems").unnest("garnishItems")
+
+    df_order_details = pl.concat([
+        _select_order_details(df_itens, "principal"),
+        _select_order_details(df_garnish, "garnish")
+    ])
+
+    return df_order_details, df_invalidos
+
+# Função que decodifica e 'explode' a coluna 'items' (itens principais e garnishItems) de forma vetorizada
+@profiled()
+def parse_order_items(data_frame, batch_size=50_000):
+    """
+    Decodifica a coluna 'items' com um schema tipado e gera uma linha por item (principal e garnish),
+    no mesmo layout do laço com iter_rows usado na camada silver.
+    Somente as linhas que não passam na decodificação estrita seguem para o reparo (limpeza colunar
+    com as regras do safe_json_parse e, em último caso, o próprio safe_json_parse).
+    Processa em blocos de batch_size linhas e retorna uma tupla (df_order_details_explodido, df_invalidos).
+    """
+    resultados = []
+    invalidos = []
+
+    for inicio in range(0, data_frame.height, batch_size):
+        df_order_details, df_invalidos = _parse_order_items_batch(data_frame.slice(inicio, batch_size))
+        resultados.append(df_order_details)
+        invalidos.append(df_invalidos)
+
+    if not resultados:
+        return _parse_order_items_batch(data_frame)
+
+    return pl.concat(resultados), pl.concat(invalidos)
+
+# Função que transforma os itens decodificados (parse_order_items) no formato da silver.order_details
+def transform_order_details(df_itens, insert_date, report=False):
+    # Ordena os itens por pedido e sequência, converte os valores (centavos para reais) e remove os itens duplicados
+    df_itens = df_itens.sort(by=["order_id", "sequence"]).with_columns(
+        pl.col("cpf").cast(pl.Utf8).str.zfill(11),
+        pl.col("name").str.to_titlecase(),
+        pl.col("quantity").cast(pl.Float64),
+        pl.col("sequence").cast(pl.Int32),
+        pl.col("unitPrice").cast(pl.Float64) / 100,
+        pl.col("addition").cast(pl.Float64) / 100,
+        pl.col("discount").cast(pl.Float64) / 100,
+        pl.col("type").cast(pl.Utf8),
+        pl.lit(insert_date).alias("insert_date")
+    ).unique()
+    return apply_schema(df_itens, "silver.order_details", report=report)
+
+
+### CAMADA GOLD ###
+# Consultas usadas pelo notebook etl_camada_gold e pelo pipeline.py
+
+# Consulta por semana da gold.sales (uma linha por item do pedido): '{particao}' é substituído pela semana
+qry_gold_sales = """
+    WITH
+    tbl_order AS (
+        SELECT
+                o.order_id,
+                o.order_created_at,
+                o.order_total_amount,
+                o.customer_id,
+                o.cpf,
+                o.customer_name,
+                o.delivery_address_district,
+                o.delivery_address_city,
+                o.delivery_address_state,
+                o.delivery_address_country,
+                o.merchant_id,
+                o.order_scheduled,
+                o.order_scheduled_date,
+                o.origin_platform
+        FROM `silver.order` o
+        -- Filtra a semana já na leitura dos pedidos, para que os joins abaixo processem somente essa semana
+        WHERE CAST(DATE(DATE_TRUNC(o.order_created_at,week)) AS STRING) = '{particao}'
+        -- Na carga incremental, cada semana pode ter sido inserida em um dia diferente
+        QUALIFY o.insert_date = MAX(o.insert_date) OVER (PARTITION BY DATE_TRUNC(o.order_created_at,week))
+        ),
+    -- Dimensões: somente os registros da última carga de cada tabela
+    tbl_consumer AS (
+        SELECT
+                c.customer_id,
+                c.customer_name,
+                c.created_at AS customer_created_at,
+                c.active AS customer_active,
+                CONCAT(c.customer_phone_area,'-',c.customer_phone_number) AS customer_phone,
+                c.language AS customer_language
+        FROM silver.consumer c
+        WHERE c.insert_date = (SELECT MAX(insert_date) FROM silver.consumer)
+        ),
+    tbl_merchants AS (
+        SELECT
+                m.merchant_id,
+                m.created_at AS merchant_created_at,
+                m.enabled AS merchant_enabled,
+                m.price_range,
+                m.average_ticket,
+                m.takeout_time,
+                m.delivery_time,
+                m.minimum_order_value,
+                m.merchant_city,
+                m.merchant_state
+        FROM silver.merchants m
+        WHERE m.insert_date = (SELECT MAX(insert_date) FROM silver.merchants)
+        ),
+    tbl_ab_test AS (
+        SELECT
+                ab.customer_id,
+                ab.is_target
+        FROM silver.ab_test ab
+        WHERE ab.insert_date = (SELECT MAX(insert_date) FROM silver.ab_test)
+        ),
+    -- Itens: última carga de cada pedido
+    tbl_order_details AS (
+        SELECT
+                od.order_id,
+                od.cpf,
+                od.name AS product,
+                od.quantity,
+                od.unitPrice,
+                od.addition,
+                od.discount,
+                od.type AS product_type,
+                od.sequence
+        FROM silver.order_details od
+        -- Somente os itens dos pedidos da semana, antes da janela (a silver.order_details é clusterizada por order_id)
+        WHERE od.order_id IN (SELECT order_id FROM tbl_order)
+        QUALIFY od.insert_date = MAX(od.insert_date) OVER (PARTITION BY od.order_id)
+        )
+    SELECT
+        o.order_id,
+        o.order_created_at,
+        od.product,
+        od.quantity,
+        od.unitPrice,
+        od.addition,
+        od.discount,
+        o.order_total_amount,
+        od.product_type,
+        od.sequence,
+        o.customer_id,
+        o.cpf,
+        COALESCE(c.customer_name, o.customer_name) AS customer_name,
+        c.customer_created_at,
+        c.customer_active,
+        c.customer_phone,
+        ab.is_target,
+        c.customer_language,
+        o.delivery_address_district,
+        o.delivery_address_city,
+        o.delivery_address_state,
+        o.delivery_address_country,
+        o.merchant_id,
+        m.merchant_created_at,
+        m.merchant_enabled,
+        m.price_range,
+        m.average_ticket,
+        m.takeout_time,
+        m.delivery_time,
+        m.minimum_order_value,
+        m.merchant_city,
+        m.merchant_state,
+        IF(od.order_id IS NULL, FALSE, TRUE) has_details,
+        o.order_scheduled,
+        o.order_scheduled_date,
+        o.origin_platform
+    FROM tbl_order o
+    LEFT JOIN tbl_consumer c
+        ON o.customer_id = c.customer_id
+    LEFT JOIN tbl_merchants m
+        ON o.merchant_id = m.merchant_id
+    LEFT JOIN tbl_ab_test ab
+        ON o.customer_id = ab.customer_id
+    LEFT JOIN tbl_order_details od
+        ON  o.order_id = od.order_id
+        AND o.cpf = od.cpf
+"""
+
+# Consulta da gold.orders (uma linha por pedido, da última carga de cada semana da gold.sales)
+qry_gold_orders = """
+    WITH sales_last_load AS (
+        SELECT
+            DATE_TRUNC(order_created_at, WEEK) AS semana,
+            MAX(insert_date) AS last_date
+        FROM gold.sales
+        GROUP BY 1
+    )
+    SELECT
+        s.order_id,
+        s.order_created_at,
+        s.order_total_amount AS amount,
+        s.customer_id,
+        s.customer_name,
+        s.customer_created_at,
+        s.customer_active,
+        s.is_target,
+        s.delivery_address_district,
+        s.delivery_address_city,
+        s.delivery_address_state,
+        s.merchant_id,
+        s.merchant_city,
+        s.merchant_state,
+        s.merchant_enabled,
+        s.price_range,
+        s.average_ticket,
+        s.delivery_time,
+        s.minimum_order_value,
+        s.order_scheduled,
+        s.origin_platform,
+        s.has_details,
+        COUNT(*) OVER (PARTITION BY s.order_id) AS item_rows,
+        CURRENT_TIMESTAMP() AS insert_date
+    FROM gold.sales s
+    INNER JOIN sales_last_load sll
+        ON DATE_TRUNC(s.order_created_at, WEEK) = sll.semana
+        AND s.insert_date = sll.last_date
+    -- O BigQuery só aceita QUALIFY junto de WHERE, GROUP BY ou HAVING
+    WHERE TRUE
+    -- Mantém uma linha por pedido (as colunas do pedido se repetem em todos os itens)
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY s.order_id ORDER BY s.sequence) = 1
+"""
+
+# Consulta da gold.customer_summary (uma linha por cliente e grupo do teste A/B)
+qry_gold_customer_summary = """
+    SELECT
+        customer_id,
+        is_target,
+        ANY_VALUE(customer_name) AS customer_name,
+        ANY_VALUE(customer_created_at) AS customer_created_at,
+        ANY_VALUE(customer_active) AS customer_active,
+        -- Dimensões de localização do primeiro pedido do cliente
+        MIN_BY(delivery_address_city, order_created_at) AS delivery_address_city,
+        MIN_BY(delivery_address_state, order_created_at) AS delivery_address_state,
+        MIN_BY(merchant_city, order_created_at) AS merchant_city,
+        COUNT(DISTINCT order_id) AS orders,
+        SUM(amount) AS revenue,
+        MIN(order_created_at) AS first_order_at,
+        MAX(order_created_at) AS last_order_at,
+        COUNT(DISTINCT merchant_id) AS distinct_merchants,
+        CURRENT_TIMESTAMP() AS insert_date
+    FROM gold.orders
+    GROUP BY customer_id, is_target
+"""
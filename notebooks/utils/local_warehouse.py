@@ -0,0 +1,236 @@
+from google.cloud.exceptions import Conflict, NotFound
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+import sqlglot
+from sqlglot import exp
+import os
+import shutil
+import threading
+import uuid
+
+# Warehouse local com a mesma interface do cliente do BigQuery usada no projeto (query, create_dataset,
+# load_table_from_file, load_table_from_dataframe e get_job).
+# Cada tabela é uma pasta '{pasta}/{dataset}/{tabela}/' com arquivos 'part-*.parquet'; as consultas são
+# escritas em SQL do BigQuery, traduzidas para DuckDB com o sqlglot e executadas sobre esses arquivos.
+# CREATE TABLE ... AS SELECT e INSERT INTO ... SELECT gravam o resultado como novos arquivos da tabela
+# (PARTITION BY e CLUSTER BY são aceitos e ignorados).
+
+
+# Job concluído (carga ou consulta), com os atributos do job do BigQuery usados no projeto
+class LocalJob:
+    def __init__(self, job_id, job_type, output_rows=None, arrow_table=None, num_dml_affected_rows=None):
+        self.job_id = job_id
+        self.job_type = job_type
+        self.state = "DONE"
+        self.error_result = None
+        self.output_rows = output_rows
+        self.num_dml_affected_rows = num_dml_affected_rows
+        self._arrow_table = arrow_table
+
+    def result(self):
+        return self
+
+    def to_arrow(self):
+        return self._arrow_table
+
+    def __iter__(self):
+        return iter(self._arrow_table.to_pylist() if self._arrow_table is not None else [])
+
+
+# Função que verifica se a configuração do job pede para substituir a tabela (WRITE_TRUNCATE)
+def _is_truncate(job_config):
+    return getattr(job_config, "write_disposition", None) == "WRITE_TRUNCATE"
+
+
+class LocalWarehouseClient:
+    def __init__(self, pasta, project="local"):
+        self.pasta = pasta
+        self.project = project
+        self._jobs = {}
+        self._trava = threading.Lock()
+        os.makedirs(pasta, exist_ok=True)
+
+    ### IDENTIFICAÇÃO DE TABELAS E JOBS ###
+
+    # Função que separa 'projeto.dataset.tabela' (ou 'dataset.tabela') em (dataset, tabela)
+    def _split_table_id(self, table_id):
+        partes = str(table_id).replace("`", "").split(".")
+        if len(partes) < 2:
+            raise ValueError(f"Tabela sem dataset: {table_id}")
+        return partes[-2], partes[-1]
+
+    def _table_dir(self, dataset, tabela):
+        return os.path.join(self.pasta, dataset, tabela)
+
+    def _table_files(self, dataset, tabela):
+        pasta_tabela = self._table_dir(dataset, tabela)
+        if not os.path.isdir(pasta_tabela):
+            return []
+        return sorted(
+            os.path.join(pasta_tabela, arquivo)
+            for arquivo in os.listdir(pasta_tabela)
+            if arquivo.endswith(".parquet")
+        )
+
+    # Função que registra o job; um job_id repetido gera Conflict, como no BigQuery
+    def _register_job(self, job):
+        with self._trava:
+            if job.job_id in self._jobs:
+                raise Conflict(f"Already Exists: Job {self.project}:{job.job_id}")
+            self._jobs[job.job_id] = job
+        return job
+
+    def get_job(self, job_id):
+        try:
+            return self._jobs[job_id]
+        except KeyError:
+            raise NotFound(f"Not found: Job {self.project}:{job_id}")
+
+    ### DATASETS E CARGAS ###
+
+    def create_dataset(self, dataset, exists_ok=False):
+        dataset_id = getattr(dataset, "dataset_id", str(dataset).split(".")[-1])
+        pasta_dataset = os.path.join(self.pasta, dataset_id)
+
+        if os.path.isdir(pasta_dataset) and not exists_ok:
+            raise Conflict(f"Already Exists: Dataset {self.project}:{dataset_id}")
+
+        os.makedirs(pasta_dataset, exist_ok=True)
+        return dataset
+
+    # Sem metadados de tabela: retorna o próprio id, ou NotFound se a tabela não tem arquivos, como no BigQuery
+    def get_table(self, table_id):
+        dataset, tabela = self._split_table_id(table_id)
+        if not self._table_files(dataset, tabela):
+            raise NotFound(f"Not found: Table {self.project}:{dataset}.{tabela}")
+        return table_id
+
+    # Função que retorna o caminho de um novo arquivo da tabela (com truncate, apaga os arquivos atuais antes)
+    def _new_part_path(self, table_id, truncate=False):
+        dataset, tabela = self._split_table_id(table_id)
+        pasta_tabela = self._table_dir(dataset, tabela)
+        os.makedirs(pasta_tabela, exist_ok=True)
+
+        if truncate:
+            for arquivo in self._table_files(dataset, tabela):
+                os.remove(arquivo)
+
+        return os.path.join(pasta_tabela, f"part-{uuid.uuid4().hex}.parquet")
+
+    # Função que grava uma tabela do Arrow como um novo arquivo da tabela
+    # Grava em um arquivo temporário e renomeia, para que consultas simultâneas nunca leiam um Parquet incompleto
+    def _write_table(self, arrow_table, table_id, truncate=False):
+        caminho = self._new_part_path(table_id, truncate)
+        pq.write_table(arrow_table, caminho + ".tmp")
+        os.replace(caminho + ".tmp", caminho)
+        return arrow_table.num_rows
+
+    # Carga de um arquivo Parquet (o formato usado por create_dataset_and_table): os bytes são gravados como estão
+    def load_table_from_file(self, file_obj, table_id, job_config=None, job_id=None):
+        caminho = self._new_part_path(table_id, _is_truncate(job_config))
+        with open(caminho + ".tmp", "wb") as destino:
+            shutil.copyfileobj(file_obj, destino)
+        os.replace(caminho + ".tmp", caminho)
+
+        linhas = pq.ParquetFile(caminho).metadata.num_rows
+        return self._register_job(LocalJob(job_id or uuid.uuid4().hex, "load", output_rows=linhas))
+
+    def load_table_from_dataframe(self, dataframe, table_id, job_config=None, job_id=None):
+        arrow_table = pa.Table.from_pandas(dataframe, preserve_index=False)
+        linhas = self._write_table(arrow_table, table_id, _is_truncate(job_config))
+        return self._register_job(LocalJob(job_id or uuid.uuid4().hex, "load", output_rows=linhas))
+
+    ### CONSULTAS ###
+
+    # Função que separa um CREATE TABLE ... AS SELECT ou INSERT INTO ... SELECT em (tabela de destino, colunas, SELECT)
+    # Para as demais consultas, retorna (None, None, consulta)
+    def _split_statement(self, arvore):
+        if isinstance(arvore, exp.Create) and arvore.args.get("kind") == "TABLE" and arvore.expression is not None:
+            destino = arvore.this
+        elif isinstance(arvore, exp.Insert) and arvore.expression is not None:
+            destino = arvore.this
+        else:
+            return None, None, arvore
+
+        colunas = None
+        if isinstance(destino, exp.Schema):
+            colunas = [coluna.name for coluna in destino.expressions]
+            destino = destino.this
+
+        return destino, colunas, arvore.expression
+
+    # Função que traduz o SQL do BigQuery para DuckDB, removendo o projeto dos nomes das tabelas
+    def _translate(self, arvore):
+        tabelas = set()
+
+        for tabela in arvore.find_all(exp.Table):
+            if not tabela.db:
+                continue  # CTEs e tabelas sem dataset
+            tabela.set("catalog", None)
+            tabela.args["db"].set("quoted", True)
+            tabela.this.set("quoted", True)
+            tabelas.add((tabela.db, tabela.name))
+
+        return arvore.sql(dialect="duckdb"), tabelas
+
+    # Função que converte os parâmetros da consulta (@nome) em um dicionário para o DuckDB ($nome)
+    def _parameters(self, job_config):
+        parametros = {}
+        for parametro in getattr(job_config, "query_parameters", None) or []:
+            if hasattr(parametro, "values"):  # ArrayQueryParameter
+                parametros[parametro.name] = list(parametro.values)
+            else:
+                parametros[parametro.name] = parametro.value
+        return parametros
+
+    def query(self, qry, job_config=None, job_id=None):
+        instrucao = sqlglot.parse_one(qry, read="bigquery")
+        destino, colunas_destino, consulta = self._split_statement(instrucao)
+
+        if destino is not None:
+            table_id = f"{destino.db}.{destino.name}"
+            existe = bool(self._table_files(destino.db, destino.name))
+
+            if isinstance(instrucao, exp.Insert) and not existe:
+                raise NotFound(f"Not found: Table {self.project}:{table_id}")
+            if isinstance(instrucao, exp.Insert) and not colunas_destino:
+                # Sem lista de colunas, o INSERT segue a ordem das colunas da tabela, como no BigQuery
+                colunas_destino = pq.read_schema(self._table_files(destino.db, destino.name)[0]).names
+            if isinstance(instrucao, exp.Create) and existe and not instrucao.args.get("replace"):
+                if instrucao.args.get("exists"):  # CREATE TABLE IF NOT EXISTS
+                    return self._register_job(LocalJob(job_id or uuid.uuid4().hex, "query", output_rows=0))
+                raise Conflict(f"Already Exists: Table {self.project}:{table_id}")
+
+        sql, tabelas = self._translate(consulta)
+
+        conexao = duckdb.connect()
+        try:
+            # Cada tabela citada vira uma view sobre os arquivos Parquet dela
+            for dataset, tabela in tabelas:
+                arquivos = self._table_files(dataset, tabela)
+                if not arquivos:
+                    raise NotFound(f"Not found: Table {self.project}:{dataset}.{tabela}")
+
+                lista_arquivos = ", ".join("'" + arquivo.replace("\\", "/").replace("'", "''") + "'" for arquivo in arquivos)
+                conexao.execute(f'CREATE SCHEMA IF NOT EXISTS "{dataset}"')
+                conexao.execute(
+                    f'CREATE OR REPLACE VIEW "{dataset}"."{tabela}" AS '
+                    f"SELECT * FROM read_parquet([{lista_arquivos}], union_by_name = true)"
+                )
+
+            resultado = conexao.execute(sql, self._parameters(job_config))
+            # to_arrow_table substitui fetch_arrow_table nas versões mais novas do DuckDB
+            arrow_table = resultado.to_arrow_table() if hasattr(resultado, "to_arrow_table") else resultado.fetch_arrow_table()
+        finally:
+            conexao.close()
+
+        if destino is None:
+            return self._register_job(LocalJob(job_id or uuid.uuid4().hex, "query", output_rows=arrow_table.num_rows, arrow_table=arrow_table))
+
+        # CREATE TABLE AS / INSERT: o resultado vira um novo arquivo da tabela de destino (CREATE OR REPLACE apaga os atuais)
+        if colunas_destino:
+            arrow_table = arrow_table.rename_columns(colunas_destino)
+        linhas = self._write_table(arrow_table, table_id, truncate=isinstance(instrucao, exp.Create))
+        afetadas = linhas if isinstance(instrucao, exp.Insert) else None
+        return self._register_job(LocalJob(job_id or uuid.uuid4().hex, "query", output_rows=linhas, num_dml_affected_rows=afetadas))
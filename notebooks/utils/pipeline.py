@@ -0,0 +1,575 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sys
+import time
+
+import polars as pl
+
+import utils
+from profiling import finish_run, profile_stage, start_run
+from etl import (
+    get_pending_partitions, list_partitions, mark_partitions_processed, parse_order_items, qry_gold_customer_summary,
+    qry_gold_orders, qry_gold_sales, qry_silver_order_details, qry_silver_orders, read_last_bronze_load, transform_ab_test,
+    transform_consumer, transform_merchants, transform_order_details, transform_orders_to_parquet
+)
+from warehouse import (
+    bigquery, create_dataset_and_table, create_table_as, extract_partitions_to_parquet, get_bq_client,
+    get_storage_client, iter_csv_record_batches, iter_tar_csv_record_batches, load_record_batches,
+    materialize_partitions, open_bucket_object, read_manifest, send_parquets_to_bigquery, table_version,
+    tipos_csv_bronze, write_manifest
+)
+
+# Execução do ETL (bronze, silver e gold) como um grafo de dependências (DAG), sem rodar os notebooks célula a célula.
+# Cada etapa declara as tabelas que lê (entradas), as que grava (saídas) e os arquivos do bucket que carrega; uma etapa
+# depende das etapas que gravam as suas entradas. Etapas independentes (ex.: merchants, consumer e ab_test) rodam ao
+# mesmo tempo em um pool de threads limitado.
+# Antes de rodar, cada etapa calcula a versão das entradas: a última insert_date de cada tabela (a mesma marca usada
+# pelo cache de consultas) e o hash do conteúdo de cada arquivo. Uma etapa concluída cujas entradas não mudaram é
+# ignorada, então uma execução que falhou é retomada a partir da etapa que falhou. O estado fica em estado_pipeline.json.
+# As consultas e transformações são as mesmas dos notebooks da pasta etl, que continuam sendo o roteiro comentado.
+
+# Situações de cada etapa no resumo da execução
+situacoes_etapa = ["executada", "ignorada", "erro", "bloqueada"]
+
+
+### DECLARAÇÃO DAS ETAPAS ###
+
+# Etapa do pipeline: função(contexto) que grava 'saidas' a partir de 'entradas' (tabelas) e 'arquivos' (do bucket)
+class Etapa:
+    def __init__(self, nome, funcao, entradas=(), saidas=(), arquivos=()):
+        self.nome = nome
+        self.funcao = funcao
+        self.entradas = list(entradas)
+        self.saidas = list(saidas) or [nome]
+        self.arquivos = list(arquivos)
+
+    @property
+    def camada(self):
+        return self.nome.split(".")[0]
+
+    def __repr__(self):
+        return f"Etapa({self.nome!r}, entradas={self.entradas}, saidas={self.saidas})"
+
+# Dados compartilhados pelas etapas de uma execução
+class Contexto:
+    def __init__(self, client, origem, pasta, estado):
+        self.client = client
+        self.origem = origem
+        self.pasta = pasta
+        self.insert_date = datetime.datetime.now(datetime.UTC)  # mesma data de inserção para todas as etapas
+        self._estado = estado
+
+    # Função que retorna o resultado gravado pela última execução concluída de uma etapa (ex.: semanas carregadas)
+    def resultado(self, nome_etapa):
+        return self._estado.get(nome_etapa, {}).get("resultado") or {}
+
+# Função que monta as dependências de cada etapa a partir das entradas e saídas e valida o grafo
+def build_graph(etapas):
+    """
+    Retorna {nome_etapa: [etapas das quais depende]}. Entradas que nenhuma etapa grava (ex.: bronze.orders,
+    carregada direto no BigQuery) são tabelas externas. Gera ValueError se duas etapas gravam a mesma tabela,
+    se há nomes repetidos ou se o grafo tem ciclo.
+    """
+    nomes = [etapa.nome for etapa in etapas]
+    if len(set(nomes)) != len(nomes):
+        raise ValueError(f"Etapas com nomes repetidos: {sorted({nome for nome in nomes if nomes.count(nome) > 1})}")
+
+    produtor = {}
+    for etapa in etapas:
+        for saida in etapa.saidas:
+            if saida in produtor:
+                raise ValueError(f"A tabela {saida} é gravada por {produtor[saida]} e por {etapa.nome}")
+            produtor[saida] = etapa.nome
+
+    dependencias = {
+        etapa.nome: sorted({produtor[entrada] for entrada in etapa.entradas if entrada in produtor} - {etapa.nome})
+        for etapa in etapas
+    }
+
+    # Com ciclo, a ordenação topológica não alcança todas as etapas
+    if sum(map(len, topological_levels(dependencias))) != len(etapas):
+        raise ValueError("O grafo de etapas tem ciclo")
+
+    return dependencias
+
+# Função que agrupa as etapas em níveis: as de um mesmo nível não dependem umas das outras
+def topological_levels(dependencias):
+    restantes = {nome: set(deps) for nome, deps in dependencias.items()}
+    niveis = []
+
+    while restantes:
+        nivel = sorted(nome for nome, deps in restantes.items() if not deps)
+        if not nivel:
+            break  # ciclo: as etapas restantes nunca ficam prontas
+        niveis.append(nivel)
+        for nome in nivel:
+            del restantes[nome]
+        for deps in restantes.values():
+            deps.difference_update(nivel)
+
+    return niveis
+
+# Função que retorna as etapas que dependem (direta ou indiretamente) de nome_etapa
+def _descendants(dependencias, nome_etapa):
+    descendentes = set()
+    fronteira = [nome_etapa]
+    while fronteira:
+        atual = fronteira.pop()
+        for nome, deps in dependencias.items():
+            if atual in deps and nome not in descendentes:
+                descendentes.add(nome)
+                fronteira.append(nome)
+    return descendentes
+
+
+### VERSÃO DAS ENTRADAS (HASH DE CONTEÚDO E MARCA D'ÁGUA) ###
+
+# Função que retorna o hash do conteúdo de um arquivo da origem (pasta local ou bucket do GCP)
+def _file_version(origem, nome_arquivo):
+    if isinstance(origem, (str, os.PathLike)):
+        sha256 = hashlib.sha256()
+        with open(os.path.join(origem, nome_arquivo), "rb") as arquivo:
+            for bloco in iter(lambda: arquivo.read(8 * 1024 * 1024), b""):
+                sha256.update(bloco)
+        return sha256.hexdigest()
+
+    # No bucket, o hash vem dos metadados do objeto, sem baixar o arquivo
+    blob = origem.get_blob(nome_arquivo)
+    if blob is None:
+        raise FileNotFoundError(f"Arquivo {nome_arquivo} não encontrado no bucket")
+    return blob.md5_hash or blob.crc32c or blob.etag
+
+# Função que retorna a versão de cada entrada da etapa ({"tabela:<nome>": insert_date, "arquivo:<nome>": hash})
+def input_versions(etapa, contexto):
+    versoes = {}
+    for tabela in etapa.entradas:
+        try:
+            versoes[f"tabela:{tabela}"] = table_version(contexto.client, tabela)
+        except Exception:
+            versoes[f"tabela:{tabela}"] = None  # tabela ainda não existe
+    for nome_arquivo in etapa.arquivos:
+        versoes[f"arquivo:{nome_arquivo}"] = _file_version(contexto.origem, nome_arquivo)
+    return versoes
+
+# Função que calcula a impressão digital da etapa a partir das versões das entradas
+def _fingerprint(versoes):
+    conteudo = json.dumps(versoes, sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+### ETAPAS DA CAMADA BRONZE ###
+
+# Função que carrega um arquivo CSV (gzip ou membro de um tar.gz) da origem em uma tabela da bronze, em streaming
+def _load_bronze_file(contexto, nome_arquivo, tabela_nome, membro=None):
+    with open_bucket_object(contexto.origem, nome_arquivo) as stream:
+        tipos = tipos_csv_bronze[f"bronze.{tabela_nome}"]
+        if membro is not None:
+            batches = iter_tar_csv_record_batches(stream, member_name=membro, column_types=tipos)
+        else:
+            batches = iter_csv_record_batches(stream, compression="gzip", column_types=tipos)
+
+        # load_record_batches gera RuntimeError se um bloco falhar: a etapa termina com erro e não é registrada
+        # como executada, então a próxima execução carrega o arquivo de novo mesmo com o mesmo hash
+        linhas = load_record_batches(
+            batches,
+            dataset_nome="bronze",
+            tabela_nome=tabela_nome,
+            client=contexto.client
+        )
+
+    if not linhas:
+        raise RuntimeError(f"Nenhuma linha carregada de {nome_arquivo} em bronze.{tabela_nome}")
+    return {"linhas": linhas}
+
+def bronze_merchants(contexto):
+    return _load_bronze_file(contexto, "restaurant.csv.gz", "merchants")
+
+def bronze_consumer(contexto):
+    return _load_bronze_file(contexto, "consumer.csv.gz", "consumer")
+
+def bronze_ab_test(contexto):
+    return _load_bronze_file(contexto, "ab_test_ref.tar.gz", "ab_test", membro="ab_test_ref.csv")
+
+
+### ETAPAS DA CAMADA SILVER ###
+
+# Função que envia uma tabela da silver particionada por insert_date (um erro na carga interrompe a etapa)
+def _load_silver_table(contexto, df, tabela_nome, clustering_fields, use_chunk=False):
+    return create_dataset_and_table(
+        df=df,
+        dataset_nome="silver",
+        tabela_nome=tabela_nome,
+        client=contexto.client,
+        use_chunk=use_chunk,
+        partition_field="insert_date",
+        clustering_fields=clustering_fields
+    )
+
+def silver_merchants(contexto):
+    df_merchants = transform_merchants(read_last_bronze_load(contexto.client, "merchants"), contexto.insert_date)
+    return {"linhas": _load_silver_table(contexto, df_merchants, "merchants", ["merchant_id"])}
+
+def silver_ab_test(contexto):
+    df_ab_test = transform_ab_test(read_last_bronze_load(contexto.client, "ab_test"), contexto.insert_date)
+    return {"linhas": _load_silver_table(contexto, df_ab_test, "ab_test", ["customer_id", "is_target"])}
+
+def silver_consumer(contexto):
+    df_consumer = transform_consumer(read_last_bronze_load(contexto.client, "consumer"), contexto.insert_date)
+    return {"linhas": _load_silver_table(contexto, df_consumer, "consumer", ["customer_id"])}
+
+def silver_order(contexto):
+    semanas = get_pending_partitions(contexto.client, "bronze.orders", "silver.order")
+    if not semanas:
+        return {"semanas": []}
+
+    arquivos = extract_partitions_to_parquet(
+        contexto.client,
+        qry_silver_orders,
+        list(semanas),
+        pasta_destino=os.path.join(contexto.pasta, "extracao_silver"),
+        prefixo="orders",
+        max_workers=4
+    )
+    arquivos_silver = transform_orders_to_parquet(arquivos, pasta_destino=os.path.join(contexto.pasta, "silver_order"))
+
+    enviadas = send_parquets_to_bigquery(
+        os.path.join(contexto.pasta, "silver_order"),
+        dataset_nome="silver",
+        tabela_nome="order",
+        client=contexto.client,
+        var_insert_date=contexto.insert_date,
+        particoes=list(arquivos_silver),
+        partition_field="insert_date",
+        clustering_fields=["order_id", "customer_id"],
+        prefixo="order"
+    )
+
+    # As semanas enviadas ficam registradas mesmo se outras falharam; na próxima execução só as demais são refeitas
+    mark_partitions_processed("silver.order", {semana: semanas[semana] for semana in enviadas})
+    if len(enviadas) != len(semanas):
+        raise RuntimeError(f"Semanas não enviadas para silver.order: {sorted(set(semanas) - set(enviadas))}")
+    return {"semanas": enviadas}
+
+def silver_order_details(contexto):
+    semanas = get_pending_partitions(contexto.client, "bronze.orders", "silver.order_details")
+    if not semanas:
+        return {"semanas": []}
+
+    arquivos = extract_partitions_to_parquet(
+        contexto.client,
+        qry_silver_order_details,
+        list(semanas),
+        pasta_destino=os.path.join(contexto.pasta, "extracao_silver"),
+        prefixo="order_details",
+        max_workers=4
+    )
+
+    df_itens, df_invalidos = parse_order_items(pl.read_parquet(list(arquivos.values())))
+    if df_invalidos.height > 0:
+        df_invalidos.write_csv(os.path.join(contexto.pasta, "invalid_items.csv"))
+    print(f"Itens explodidos: {df_itens.height} | Linhas inválidas: {df_invalidos.height}")
+    del df_invalidos
+
+    df_itens = transform_order_details(df_itens, contexto.insert_date)
+
+    _load_silver_table(contexto, df_itens, "order_details", ["order_id"], use_chunk=True)
+    mark_partitions_processed("silver.order_details", semanas)
+    return {"semanas": sorted(semanas)}
+
+
+### ETAPAS DA CAMADA GOLD ###
+
+def gold_sales(contexto):
+    # Se consumer, merchants ou ab_test mudaram desde a última carga concluída, todas as semanas são refeitas
+    # (no notebook, modo_incremental = False); senão, somente as semanas pendentes da silver.order
+    anteriores = contexto.resultado("gold.sales").get("versoes_dimensoes")
+    versoes_dimensoes = {
+        tabela: table_version(contexto.client, tabela)
+        for tabela in ["silver.consumer", "silver.merchants", "silver.ab_test"]
+    }
+
+    if anteriores is not None and anteriores != versoes_dimensoes:
+        print("Dimensões da gold.sales alteradas: todas as semanas serão refeitas.")
+        semanas = list_partitions(contexto.client, "silver.order")
+    else:
+        semanas = get_pending_partitions(contexto.client, "silver.order", "gold.sales")
+
+    # Cada semana é registrada assim que é inserida; se alguma falhar, a etapa termina com erro depois das demais
+    enviadas = []
+    if semanas:
+        enviadas = materialize_partitions(
+            contexto.client,
+            qry_gold_sales,
+            list(semanas),
+            "gold.sales",
+            contexto.insert_date,
+            partition_by="DATE(insert_date)",
+            cluster_by=["is_target", "customer_id", "order_id"],
+            max_workers=4,
+            ao_materializar=lambda semana: mark_partitions_processed("gold.sales", {semana: semanas[semana]})
+        )
+
+    return {
+        "semanas": enviadas,
+        "insert_date": contexto.insert_date.isoformat() if enviadas else contexto.resultado("gold.sales").get("insert_date"),
+        "versoes_dimensoes": versoes_dimensoes
+    }
+
+def gold_segment_sketches(contexto):
+    from sketches import build_sketches, colunas_segment_sketches, save_sketches  # sketches importa utils
+
+    # Semanas carregadas na última execução concluída da gold.sales (gravadas no estado do pipeline)
+    carga_sales = contexto.resultado("gold.sales")
+    semanas = carga_sales.get("semanas") or []
+    if not semanas:
+        return {"semanas": []}
+
+    insert_date = datetime.datetime.fromisoformat(carga_sales["insert_date"])
+    colunas_sketches = ["customer_id", "order_id"] + [coluna for coluna in colunas_segment_sketches if coluna != "semana"]
+    qry_sketches = f"""
+        SELECT {", ".join(colunas_sketches)}
+        FROM gold.sales
+        WHERE insert_date = @insert_date
+        AND CAST(DATE(DATE_TRUNC(order_created_at, WEEK)) AS STRING) = @semana
+    """
+
+    for semana in semanas:
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ScalarQueryParameter("insert_date", "TIMESTAMP", insert_date),
+            bigquery.ScalarQueryParameter("semana", "STRING", semana)
+        ])
+        df_semana = pl.from_arrow(contexto.client.query(qry_sketches, job_config=job_config).to_arrow()).lazy()
+        save_sketches(
+            build_sketches(df_semana.with_columns(pl.lit(semana).alias("semana")), segments=colunas_segment_sketches),
+            os.path.join(contexto.pasta, f"segment_sketches_{semana}.parquet")
+        )
+
+    enviadas = send_parquets_to_bigquery(
+        contexto.pasta, "gold", "segment_sketches", contexto.client, insert_date,
+        particoes=semanas,
+        partition_field="insert_date",
+        clustering_fields=["semana", "is_target"],
+        prefixo="segment_sketches"
+    )
+    if len(enviadas) != len(semanas):
+        raise RuntimeError(f"Sketches não enviados: {sorted(set(semanas) - set(enviadas))}")
+    return {"semanas": enviadas}
+
+def gold_orders(contexto):
+    linhas = create_table_as(
+        contexto.client, "gold.orders", qry_gold_orders,
+        partition_by="DATE(order_created_at)",
+        cluster_by=["is_target", "customer_id"]
+    )
+    return {"linhas": linhas}
+
+def gold_customer_summary(contexto):
+    linhas = create_table_as(
+        contexto.client, "gold.customer_summary", qry_gold_customer_summary,
+        cluster_by=["is_target", "customer_id"]
+    )
+    return {"linhas": linhas}
+
+# Etapas do ETL, na ordem dos notebooks; as dependências saem das entradas e saídas
+etapas_etl = [
+    Etapa("bronze.merchants", bronze_merchants, arquivos=["restaurant.csv.gz"]),
+    Etapa("bronze.consumer", bronze_consumer, arquivos=["consumer.csv.gz"]),
+    Etapa("bronze.ab_test", bronze_ab_test, arquivos=["ab_test_ref.tar.gz"]),
+    Etapa("silver.merchants", silver_merchants, entradas=["bronze.merchants"]),
+    Etapa("silver.ab_test", silver_ab_test, entradas=["bronze.ab_test"]),
+    Etapa("silver.consumer", silver_consumer, entradas=["bronze.consumer"]),
+    Etapa("silver.order", silver_order, entradas=["bronze.orders"]),
+    Etapa("silver.order_details", silver_order_details, entradas=["bronze.orders"]),
+    Etapa("gold.sales", gold_sales, entradas=[
+        "silver.order", "silver.consumer", "silver.merchants", "silver.ab_test", "silver.order_details"
+    ]),
+    Etapa("gold.segment_sketches", gold_segment_sketches, entradas=["gold.sales"]),
+    Etapa("gold.orders", gold_orders, entradas=["gold.sales"]),
+    Etapa("gold.customer_summary", gold_customer_summary, entradas=["gold.orders"])
+]
+
+
+### EXECUÇÃO ###
+
+# Função que lê o estado das etapas: {nome_etapa: {situacao, fingerprint, versoes, resultado, erro, ...}}
+def load_state(caminho=None):
+    return read_manifest(caminho or utils.arquivo_estado_pipeline) or {}
+
+# Função que grava o estado das etapas (arquivo temporário + rename)
+def save_state(estado, caminho=None):
+    caminho = caminho or utils.arquivo_estado_pipeline
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    write_manifest(caminho, estado)
+
+# Função que seleciona as etapas pelo nome ou prefixo (ex.: "silver" ou "gold.sales")
+def _select_steps(etapas, nomes):
+    if not nomes:
+        return {etapa.nome for etapa in etapas}
+
+    selecionadas = {etapa.nome for etapa in etapas if any(etapa.nome == nome or etapa.nome.startswith(f"{nome}.") for nome in nomes)}
+    desconhecidas = [nome for nome in nomes if not any(etapa == nome or etapa.startswith(f"{nome}.") for etapa in selecionadas)]
+    if desconhecidas:
+        raise ValueError(f"Etapas desconhecidas: {desconhecidas}")
+    return selecionadas
+
+# Função executada em cada thread: decide se a etapa pode ser ignorada e, se não, executa a etapa
+def _run_step(etapa, contexto, anterior, forcar):
+    inicio = time.perf_counter()
+    versoes = input_versions(etapa, contexto)
+    fingerprint = _fingerprint(versoes)
+
+    if not forcar and anterior.get("situacao") in ("executada", "ignorada") and anterior.get("fingerprint") == fingerprint:
+        return {"situacao": "ignorada", "fingerprint": fingerprint, "versoes": versoes, "tempo_s": time.perf_counter() - inicio}
+
+    print(f"[pipeline] Iniciando {etapa.nome}")
+    with profile_stage(etapa.nome):
+        resultado = etapa.funcao(contexto)
+
+    return {
+        "situacao": "executada",
+        "fingerprint": fingerprint,
+        "versoes": versoes,
+        "resultado": resultado,
+        "tempo_s": time.perf_counter() - inicio
+    }
+
+# Função que executa as etapas em ordem de dependência, com até max_workers etapas ao mesmo tempo
+def run_pipeline(etapas=None, client=None, origem=None, max_workers=3, somente=None, forcar=None, retomar=True,
+                 caminho_estado=None, pasta=None, pasta_perfis=None):
+    """
+    Cada etapa começa assim que as etapas das quais depende terminam. Uma etapa é ignorada quando já foi concluída
+    com as mesmas versões das entradas (última insert_date das tabelas e hash dos arquivos);
+    forcar (nomes ou prefixos) executa as etapas mesmo assim e retomar=False ignora o estado salvo.
+    Quando uma etapa falha, as que dependem dela ficam bloqueadas e as independentes continuam; na próxima
+    execução, as etapas concluídas são ignoradas e a execução recomeça pela etapa que falhou.
+    somente (nomes ou prefixos, ex.: ["silver"]) limita as etapas executadas; as demais são consideradas concluídas.
+    origem é o bucket do GCP ou uma pasta local com os arquivos da bronze. Com pasta_perfis, grava o relatório de
+    desempenho da execução (uma etapa por etapa do pipeline). Retorna um DataFrame com a situação de cada etapa.
+    """
+    etapas = etapas_etl if etapas is None else etapas
+    dependencias = build_graph(etapas)
+    por_nome = {etapa.nome: etapa for etapa in etapas}
+    selecionadas = _select_steps(etapas, somente)
+    forcadas = _select_steps(etapas, forcar) if forcar else set()
+
+    client = client or get_bq_client()
+    if origem is None and any(por_nome[nome].arquivos for nome in selecionadas):
+        origem = get_storage_client().bucket(utils.bucket_name)
+
+    estado = load_state(caminho_estado) if retomar else {}
+    contexto = Contexto(client, origem, pasta or utils.pasta_projeto, estado)
+
+    if pasta_perfis is not None:
+        start_run("pipeline_etl", pasta_perfis)
+
+    # Etapas fora da seleção contam como concluídas para as que dependem delas
+    concluidas = set(por_nome) - selecionadas
+    pendentes = set(selecionadas)
+    resumo = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        em_execucao = {}
+
+        while pendentes or em_execucao:
+            prontas = sorted(nome for nome in pendentes if set(dependencias[nome]) <= concluidas)
+            for nome in prontas:
+                pendentes.discard(nome)
+                futuro = executor.submit(_run_step, por_nome[nome], contexto, estado.get(nome, {}), nome in forcadas)
+                em_execucao[futuro] = nome
+
+            if not em_execucao:
+                break
+
+            finalizados, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in finalizados:
+                nome = em_execucao.pop(futuro)
+                try:
+                    registro = futuro.result()
+                    concluidas.add(nome)
+                except Exception as e:
+                    registro = {"situacao": "erro", "erro": f"{type(e).__name__}: {e}"}
+                    print(f"[pipeline] Erro na etapa {nome}: {registro['erro']}")
+
+                    # As etapas que dependem da que falhou não são executadas
+                    for bloqueada in sorted(_descendants(dependencias, nome) & pendentes):
+                        pendentes.discard(bloqueada)
+                        resumo[bloqueada] = {"situacao": "bloqueada", "erro": f"depende de {nome}"}
+
+                if registro["situacao"] == "ignorada":
+                    # Mantém o resultado da execução que gravou as saídas (ex.: semanas carregadas)
+                    registro["resultado"] = estado.get(nome, {}).get("resultado")
+                    registro["concluida_em"] = estado.get(nome, {}).get("concluida_em")
+                elif registro["situacao"] == "executada":
+                    registro["concluida_em"] = datetime.datetime.now(datetime.UTC).isoformat()
+                    print(f"[pipeline] {nome} concluída em {registro['tempo_s']:.1f}s")
+
+                resumo[nome] = registro
+                # Uma etapa com erro mantém o fingerprint da última conclusão, então é refeita na próxima execução
+                estado[nome] = {**estado.get(nome, {}), "erro": None, **registro}
+                save_state(estado, caminho_estado)
+
+    if pasta_perfis is not None:
+        finish_run()
+
+    return pl.DataFrame(
+        [
+            {
+                "etapa": nome,
+                "camada": por_nome[nome].camada,
+                "situacao": resumo.get(nome, {}).get("situacao", "bloqueada"),
+                "tempo_s": round(resumo[nome]["tempo_s"], 3) if "tempo_s" in resumo.get(nome, {}) else None,
+                "erro": resumo.get(nome, {}).get("erro")
+            }
+            for nome in [etapa.nome for etapa in etapas if etapa.nome in selecionadas]
+        ],
+        schema={"etapa": pl.Utf8, "camada": pl.Utf8, "situacao": pl.Enum(situacoes_etapa), "tempo_s": pl.Float64, "erro": pl.Utf8}
+    )
+
+# Função que imprime o plano de execução: etapas de um mesmo nível podem rodar ao mesmo tempo
+def print_plan(etapas=None):
+    etapas = etapas_etl if etapas is None else etapas
+    dependencias = build_graph(etapas)
+    for posicao, nivel in enumerate(topological_levels(dependencias), start=1):
+        print(f"Nível {posicao}: " + ", ".join(
+            f"{nome} (depende de {', '.join(dependencias[nome])})" if dependencias[nome] else nome for nome in nivel
+        ))
+
+
+# Uso: python pipeline.py [--max-workers 3] [--somente silver gold] [--forcar gold.sales] [--sem-retomar] [--origem pasta]
+# Termina com código 1 se alguma etapa falhou ou ficou bloqueada
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executa as etapas do ETL (bronze, silver e gold) em ordem de dependência.")
+    parser.add_argument("--max-workers", type=int, default=3, help="Etapas executadas ao mesmo tempo")
+    parser.add_argument("--somente", nargs="+", help="Etapas ou camadas a executar (ex.: silver gold.sales)")
+    parser.add_argument("--forcar", nargs="+", help="Etapas ou camadas executadas mesmo sem mudança nas entradas")
+    parser.add_argument("--sem-retomar", action="store_true", help="Ignora o estado salvo e executa todas as etapas")
+    parser.add_argument("--origem", help="Pasta local com os arquivos da bronze (padrão: bucket do GCP)")
+    parser.add_argument("--backend", choices=["bigquery", "local"], help="Warehouse (padrão: backend_warehouse do utils)")
+    parser.add_argument("--estado", help="Arquivo de estado (padrão: estado_pipeline.json na pasta do projeto)")
+    parser.add_argument("--plano", action="store_true", help="Somente imprime o plano de execução")
+    args = parser.parse_args()
+
+    if args.plano:
+        print_plan()
+        sys.exit(0)
+
+    resumo = run_pipeline(
+        client=get_bq_client(args.backend),
+        origem=args.origem,
+        max_workers=args.max_workers,
+        somente=args.somente,
+        forcar=args.forcar,
+        retomar=not args.sem_retomar,
+        caminho_estado=args.estado,
+        pasta_perfis=utils.pasta_perfis
+    )
+
+    with pl.Config(tbl_rows=-1, tbl_cols=-1, tbl_width_chars=200, fmt_str_lengths=120):
+        print(resumo)
+
+    if resumo.filter(pl.col("situacao").is_in(["erro", "bloqueada"])).height:
+        sys.exit(1)
@@ -0,0 +1,35 @@
+import matplotlib.pyplot as plt
+import polars as pl
+import seaborn as sns
+
+### GRÁFICOS DAS ANÁLISES ###
+
+# Função que desenha um gráfico de barras (seaborn) com título, rótulos e grade, a partir de um DataFrame do Polars ou do Pandas
+def bar_chart(data_frame, x, y, hue=None, title=None, xlabel=None, ylabel=None, figsize=(10, 6), grid_axis=None, ylim=None, legend_title=None, rotation=None, show=True, **kwargs):
+    """
+    Os demais argumentos (palette, estimator, errorbar...) são repassados ao sns.barplot.
+    Retorna o eixo do gráfico.
+    """
+    if isinstance(data_frame, (pl.DataFrame, pl.LazyFrame)):
+        data_frame = data_frame.lazy().collect().to_pandas()
+
+    plt.figure(figsize=figsize)
+    ax = sns.barplot(data=data_frame, x=x, y=y, hue=hue, **kwargs)
+
+    plt.title(title)
+    plt.xlabel(xlabel if xlabel is not None else x)
+    plt.ylabel(ylabel if ylabel is not None else y)
+    if ylim is not None:
+        plt.ylim(*ylim)
+    if legend_title is not None:
+        plt.legend(title=legend_title)
+    if grid_axis is not None:
+        plt.grid(axis=grid_axis, linestyle="--", alpha=0.6)
+    if rotation is not None:
+        plt.xticks(rotation=rotation)
+    plt.tight_layout()
+
+    if show:
+        plt.show()
+
+    return ax
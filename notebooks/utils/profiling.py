@@ -0,0 +1,369 @@
+from contextlib import contextmanager
+import datetime
+import functools
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+import polars as pl
+
+try:
+    import psutil
+except ImportError:  # Sem psutil, o relatório sai sem as medidas de memória
+    psutil = None
+
+# Medição por etapa (tempo, pico de memória, linhas e estatísticas dos jobs do warehouse) das funções do ETL e das análises.
+# Uma execução começa com start_run e termina com finish_run, que grava um relatório JSON; sem execução ativa,
+# os decoradores e context managers não medem nada e o custo é só o de uma verificação.
+# Etapas dentro de etapas são registradas com o caminho completo (ex.: 'send_parquets_to_bigquery/create_dataset_and_table').
+
+# Execução ativa (uma por processo) e a pilha de etapas de cada thread
+_execucao = None
+_trava = threading.Lock()
+_local = threading.local()
+_pilhas_principal = []  # pilha de etapas da thread principal, vista pelas threads auxiliares
+
+# Atributos dos jobs do BigQuery copiados para o relatório (os que o backend não expõe ficam de fora)
+atributos_job = [
+    "job_type", "total_bytes_processed", "total_bytes_billed", "slot_millis",
+    "cache_hit", "output_rows", "num_dml_affected_rows"
+]
+
+
+### AMOSTRAGEM DE MEMÓRIA (RSS) ###
+
+# Thread que amostra o RSS do processo a cada 'intervalo' segundos e atualiza o pico de todas as etapas abertas
+class _AmostradorRSS:
+    def __init__(self, intervalo=0.01):
+        self.intervalo = intervalo
+        self.etapas = set()
+        self._trava = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def rss(self):
+        return psutil.Process().memory_info().rss if psutil is not None else None
+
+    def abrir(self, etapa):
+        if psutil is None:
+            return
+        with self._trava:
+            self.etapas.add(etapa)
+            if self._thread is None:
+                self._parar.clear()
+                self._thread = threading.Thread(target=self._amostrar, daemon=True)
+                self._thread.start()
+
+    def fechar(self, etapa):
+        if psutil is None:
+            return
+        etapa.atualizar_pico(self.rss())
+        with self._trava:
+            self.etapas.discard(etapa)
+            if not self.etapas and self._thread is not None:
+                self._parar.set()
+                self._thread = None
+
+    def _amostrar(self):
+        processo = psutil.Process()
+        while not self._parar.is_set():
+            rss = processo.memory_info().rss
+            with self._trava:
+                for etapa in list(self.etapas):
+                    etapa.atualizar_pico(rss)
+            self._parar.wait(self.intervalo)
+
+_amostrador = _AmostradorRSS()
+
+
+### ETAPAS E EXECUÇÕES ###
+
+# Função que conta as linhas de um DataFrame (Polars ou Pandas) ou tabela do Arrow; LazyFrames e outros tipos retornam None
+def count_rows(objeto):
+    if isinstance(objeto, pl.DataFrame):
+        return objeto.height
+    if hasattr(objeto, "num_rows"):  # pa.Table / pa.RecordBatch
+        return objeto.num_rows
+    if hasattr(objeto, "shape") and hasattr(objeto, "columns"):  # pd.DataFrame
+        return objeto.shape[0]
+    return None
+
+# Medidas de uma etapa; rows_out e jobs podem ser preenchidos dentro do bloco
+class Stage:
+    def __init__(self, nome, caminho, rows_in=None):
+        self.nome = nome
+        self.caminho = caminho
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.jobs = []
+        self.erro = None
+        self._rss_inicial = None
+        self._rss_pico = None
+
+    def atualizar_pico(self, rss):
+        if rss is not None and (self._rss_pico is None or rss > self._rss_pico):
+            self._rss_pico = rss
+
+    # Função que registra um job do warehouse (consulta ou carga) na etapa
+    def add_job(self, job):
+        self.jobs.append(job)
+
+    def to_dict(self, inicio, fim, inicio_execucao):
+        jobs = []
+        for job in self.jobs:
+            estatisticas = {"job_id": getattr(job, "job_id", None)}
+            for atributo in atributos_job:
+                valor = getattr(job, atributo, None)
+                if valor is not None:
+                    estatisticas[atributo] = valor
+            jobs.append(estatisticas)
+
+        def somar(atributo):
+            valores = [job[atributo] for job in jobs if job.get(atributo) is not None]
+            return sum(valores) if valores else None
+
+        return {
+            "stage": self.nome,
+            "path": self.caminho,
+            "thread": threading.current_thread().name,
+            "start_offset_s": round(inicio - inicio_execucao, 6),
+            "wall_time_s": round(fim - inicio, 6),
+            "rss_start_mb": _mb(self._rss_inicial),
+            "rss_peak_delta_mb": _mb(self._rss_pico - self._rss_inicial) if self._rss_pico is not None else None,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "bytes_processed": somar("total_bytes_processed"),
+            "bytes_billed": somar("total_bytes_billed"),
+            "slot_millis": somar("slot_millis"),
+            "jobs": jobs,
+            "error": self.erro
+        }
+
+def _mb(valor):
+    return round(valor / 1024 ** 2, 3) if valor is not None else None
+
+# Execução (run) com as etapas concluídas, gravada em JSON por finish_run
+class Run:
+    def __init__(self, nome, pasta):
+        self.nome = nome
+        self.pasta = pasta
+        self.inicio = time.perf_counter()
+        self.iniciado_em = datetime.datetime.now(datetime.UTC)
+        self.etapas = []
+
+    def to_dict(self):
+        return {
+            "run": self.nome,
+            "started_at": self.iniciado_em.isoformat(),
+            "wall_time_s": round(time.perf_counter() - self.inicio, 6),
+            "environment": {
+                "python": platform.python_version(),
+                "polars": pl.__version__,
+                "platform": platform.platform(),
+                "cpus": os.cpu_count()
+            },
+            "stages": self.etapas
+        }
+
+# Função que inicia uma execução; as etapas medidas a partir daqui entram no relatório dela
+def start_run(nome, pasta=None):
+    global _execucao
+    with _trava:
+        _execucao = Run(nome, pasta or os.getcwd())
+    return _execucao
+
+# Função que encerra a execução ativa e grava o relatório '{pasta}/perfil_{nome}_{AAAAMMDD_HHMMSS}.json'
+def finish_run():
+    """
+    Retorna o caminho do relatório (None se não há execução ativa). O arquivo é gravado em um temporário e
+    renomeado, e pode ser comparado com o de outra execução em compare_reports.
+    """
+    global _execucao
+    with _trava:
+        execucao, _execucao = _execucao, None
+
+    if execucao is None:
+        return None
+
+    os.makedirs(execucao.pasta, exist_ok=True)
+    caminho = os.path.join(execucao.pasta, f"perfil_{execucao.nome}_{execucao.iniciado_em:%Y%m%d_%H%M%S}.json")
+    with open(caminho + ".tmp", "w", encoding="utf-8") as arquivo:
+        json.dump(execucao.to_dict(), arquivo, indent=2, default=str)
+    os.replace(caminho + ".tmp", caminho)
+
+    print(f"Relatório de desempenho salvo em {caminho} ({len(execucao.etapas)} etapas).")
+    return caminho
+
+# Função que retorna a etapa aberta na thread atual (None fora de uma etapa ou sem execução ativa)
+def current_stage():
+    pilha = getattr(_local, "pilha", None)
+    return pilha[-1] if pilha else None
+
+# Função que retorna a etapa aberta na thread principal
+def _main_stage():
+    pilha = _pilhas_principal[0] if _pilhas_principal else None
+    return pilha[-1] if pilha else None
+
+# Função que registra um job do warehouse na etapa aberta (não faz nada fora de uma etapa)
+def record_job(job):
+    etapa = current_stage()
+    if etapa is not None:
+        etapa.add_job(job)
+    return job
+
+# Context manager que mede um bloco como uma etapa da execução ativa
+@contextmanager
+def profile_stage(nome, rows_in=None):
+    """
+    Mede o tempo de parede, o pico de RSS acima do RSS inicial, as linhas de entrada e saída e os jobs do
+    warehouse registrados com record_job dentro do bloco. O objeto retornado aceita 'rows_out' e add_job.
+    Sem execução ativa, retorna None e não mede nada.
+    """
+    execucao = _execucao
+    if execucao is None:
+        yield None
+        return
+
+    pilha = getattr(_local, "pilha", None)
+    if pilha is None:
+        pilha = _local.pilha = []
+        if threading.current_thread() is threading.main_thread():
+            _pilhas_principal[:] = [pilha]
+
+    # Em threads auxiliares (ex.: ThreadPoolExecutor), a primeira etapa fica abaixo da etapa aberta na thread principal
+    pai = pilha[-1] if pilha else None
+    if pai is None and threading.current_thread() is not threading.main_thread():
+        pai = _main_stage()
+
+    caminho = f"{pai.caminho}/{nome}" if pai is not None else nome
+    etapa = Stage(nome, caminho, rows_in)
+    etapa._rss_inicial = _amostrador.rss()
+    etapa.atualizar_pico(etapa._rss_inicial)
+    pilha.append(etapa)
+    _amostrador.abrir(etapa)
+    inicio = time.perf_counter()
+
+    try:
+        yield etapa
+    except BaseException as e:
+        etapa.erro = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        fim = time.perf_counter()
+        _amostrador.fechar(etapa)
+        pilha.pop()
+        registro = etapa.to_dict(inicio, fim, execucao.inicio)
+        with _trava:
+            execucao.etapas.append(registro)
+
+# Decorador que mede cada chamada da função como uma etapa (nome da etapa = nome da função, se não informado)
+def profiled(nome=None):
+    """
+    As linhas de entrada vêm do primeiro argumento que for um DataFrame ou tabela do Arrow, e as de saída do
+    retorno (DataFrame, tabela do Arrow ou um inteiro, como o total de linhas carregadas). LazyFrames não são
+    coletados para contar linhas.
+    """
+    def decorador(funcao):
+        nome_etapa = nome or funcao.__name__
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if _execucao is None:
+                return funcao(*args, **kwargs)
+
+            rows_in = next((linhas for linhas in map(count_rows, list(args) + list(kwargs.values())) if linhas is not None), None)
+            with profile_stage(nome_etapa, rows_in) as etapa:
+                resultado = funcao(*args, **kwargs)
+                if isinstance(resultado, int) and not isinstance(resultado, bool):
+                    etapa.rows_out = resultado
+                else:
+                    etapa.rows_out = count_rows(resultado)
+                return resultado
+
+        return envolvida
+
+    return decorador
+
+
+### COMPARAÇÃO ENTRE EXECUÇÕES ###
+
+# Função que lê um relatório (caminho ou dicionário) e soma as medidas por caminho de etapa
+def _stage_totals(relatorio):
+    if not isinstance(relatorio, dict):
+        with open(relatorio, encoding="utf-8") as arquivo:
+            relatorio = json.load(arquivo)
+
+    colunas = ["path", "wall_time_s", "rss_peak_delta_mb", "rows_out", "bytes_processed", "slot_millis"]
+    etapas = pl.DataFrame(
+        [{coluna: etapa.get(coluna) for coluna in colunas} for etapa in relatorio["stages"]],
+        schema={"path": pl.Utf8, "wall_time_s": pl.Float64, "rss_peak_delta_mb": pl.Float64,
+                "rows_out": pl.Int64, "bytes_processed": pl.Int64, "slot_millis": pl.Int64}
+    )
+
+    # Soma que continua nula quando o backend não informa a medida (em vez de virar zero)
+    somar = lambda coluna: pl.when(pl.col(coluna).is_not_null().any()).then(pl.col(coluna).sum()).alias(coluna)
+
+    return etapas.group_by("path").agg([
+        pl.len().alias("calls"),
+        pl.col("wall_time_s").sum(),
+        pl.col("rss_peak_delta_mb").max(),
+        somar("rows_out"),
+        somar("bytes_processed"),
+        somar("slot_millis")
+    ])
+
+# Função que compara dois relatórios etapa a etapa e marca as regressões
+def compare_reports(base, novo, tolerance=0.2, min_wall_time_s=0.5, min_rss_mb=50):
+    """
+    Retorna uma linha por caminho de etapa com as medidas das duas execuções (sufixos _base e _new) e a
+    variação relativa do tempo, da memória e dos bytes processados. 'regression' marca as etapas em que o
+    tempo (acima de min_wall_time_s) ou o pico de memória (acima de min_rss_mb) cresceu mais que tolerance.
+    Etapas que só existem em uma das execuções aparecem com nulos do outro lado.
+    """
+    comparacao = _stage_totals(base).join(_stage_totals(novo), on="path", how="full", coalesce=True, suffix="_new")
+    comparacao = comparacao.rename({
+        coluna: f"{coluna}_base" for coluna in comparacao.columns
+        if coluna != "path" and not coluna.endswith("_new")
+    })
+
+    variacao = lambda coluna: (pl.col(f"{coluna}_new") / pl.col(f"{coluna}_base") - 1).round(4).fill_nan(None)
+
+    return comparacao.with_columns([
+        variacao("wall_time_s").alias("wall_time_change"),
+        variacao("rss_peak_delta_mb").alias("rss_change"),
+        variacao("bytes_processed").alias("bytes_change")
+    ]).with_columns([
+        (
+            ((pl.col("wall_time_change") > tolerance) & (pl.col("wall_time_s_new") >= min_wall_time_s))
+            | ((pl.col("rss_change") > tolerance) & (pl.col("rss_peak_delta_mb_new") >= min_rss_mb))
+            | (pl.col("bytes_change") > tolerance)
+        ).fill_null(False).alias("regression")
+    ]).select([
+        "path", "calls_base", "calls_new",
+        "wall_time_s_base", "wall_time_s_new", "wall_time_change",
+        "rss_peak_delta_mb_base", "rss_peak_delta_mb_new", "rss_change",
+        "bytes_processed_base", "bytes_processed_new", "bytes_change",
+        "regression"
+    ]).sort("wall_time_s_new", descending=True, nulls_last=True)
+
+
+# Uso: python profiling.py perfil_base.json perfil_novo.json [tolerância]
+# Imprime a comparação e termina com código 1 se alguma etapa regrediu
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Uso: python profiling.py perfil_base.json perfil_novo.json [tolerância]")
+        sys.exit(2)
+
+    tolerancia = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    resultado = compare_reports(sys.argv[1], sys.argv[2], tolerance=tolerancia)
+
+    with pl.Config(tbl_rows=-1, tbl_cols=-1, tbl_width_chars=200):
+        print(resultado)
+
+    regressoes = resultado.filter(pl.col("regression"))
+    if regressoes.height:
+        print(f"{regressoes.height} etapas com regressão acima de {tolerancia:.0%}: {regressoes['path'].to_list()}")
+        sys.exit(1)
@@ -0,0 +1,117 @@
+import polars as pl
+
+### SCHEMA COMPACTO DAS TABELAS (CATEGÓRICAS E INTEIROS ESTREITOS) ###
+
+# Grupo do teste A/B como Enum; as categorias seguem a ordem alfabética, então a ordenação é a mesma do texto
+dtype_is_target = pl.Enum(["control", "target"])
+
+# Textos com poucos valores distintos (cidades, estados, plataformas), ordenados como texto
+dtype_categoria = pl.Categorical("lexical")
+
+# Tipos compactos por tabela. Somente as colunas listadas mudam de tipo; valores monetários continuam em Float64
+schemas_tabelas = {
+    "bronze.merchants": {
+        "price_range": pl.Int8,
+        "takeout_time": pl.Int16,
+        "delivery_time": pl.Int16,
+        "merchant_state": dtype_categoria,
+        "merchant_country": dtype_categoria
+    },
+    "bronze.ab_test": {
+        "is_target": dtype_is_target
+    },
+    "silver.merchants": {
+        "price_range": pl.Int8,
+        "takeout_time": pl.Int16,
+        "delivery_time": pl.Int16,
+        "merchant_city": dtype_categoria,
+        "merchant_state": dtype_categoria,
+        "merchant_country": dtype_categoria
+    },
+    "silver.consumer": {
+        "language": dtype_categoria,
+        "customer_name": pl.Utf8
+    },
+    "silver.ab_test": {
+        "is_target": dtype_is_target
+    },
+    "silver.order": {
+        "customer_name": pl.Utf8,
+        "delivery_address_city": dtype_categoria,
+        "delivery_address_state": dtype_categoria,
+        "delivery_address_country": dtype_categoria,
+        "merchant_timezone": dtype_categoria,
+        "origin_platform": dtype_categoria
+    },
+    "silver.order_details": {
+        "type": dtype_categoria,
+        "sequence": pl.Int16
+    },
+    "gold.sales": {
+        "product_type": dtype_categoria,
+        "sequence": pl.Int16,
+        "customer_name": pl.Utf8,
+        "is_target": dtype_is_target,
+        "customer_language": dtype_categoria,
+        "delivery_address_city": dtype_categoria,
+        "delivery_address_state": dtype_categoria,
+        "delivery_address_country": dtype_categoria,
+        "price_range": pl.Int8,
+        "takeout_time": pl.Int16,
+        "delivery_time": pl.Int16,
+        "merchant_city": dtype_categoria,
+        "merchant_state": dtype_categoria,
+        "origin_platform": dtype_categoria
+    },
+    "gold.orders": {
+        "customer_name": pl.Utf8,
+        "is_target": dtype_is_target,
+        "delivery_address_city": dtype_categoria,
+        "delivery_address_state": dtype_categoria,
+        "merchant_city": dtype_categoria,
+        "merchant_state": dtype_categoria,
+        "price_range": pl.Int8,
+        "delivery_time": pl.Int16,
+        "origin_platform": dtype_categoria,
+        "item_rows": pl.Int16
+    },
+    "gold.customer_summary": {
+        "customer_name": pl.Utf8,
+        "is_target": dtype_is_target,
+        "delivery_address_city": dtype_categoria,
+        "delivery_address_state": dtype_categoria,
+        "merchant_city": dtype_categoria,
+        "orders": pl.Int32,
+        "distinct_merchants": pl.Int32
+    }
+}
+
+# Função que aplica os tipos compactos da tabela (somente às colunas presentes) em um DataFrame ou LazyFrame
+def apply_schema(data_frame, tabela, report=False):
+    """
+    Converte as colunas de schemas_tabelas[tabela] que existem no DataFrame: textos de poucos valores
+    distintos para Categorical/Enum e inteiros para a menor largura que comporta os valores da tabela.
+    A conversão é estrita: um valor fora do Enum ou do intervalo do inteiro gera erro, em vez de virar nulo.
+    Com report=True (somente DataFrame), imprime a memória antes e depois da conversão.
+    """
+    if tabela not in schemas_tabelas:
+        raise ValueError(f"Tabela sem schema registrado: {tabela}")
+
+    colunas = data_frame.collect_schema() if isinstance(data_frame, pl.LazyFrame) else data_frame.schema
+    conversoes = {
+        coluna: dtype for coluna, dtype in schemas_tabelas[tabela].items()
+        if coluna in colunas and colunas[coluna] != dtype
+    }
+
+    if not conversoes:
+        return data_frame
+
+    antes = data_frame.estimated_size("mb") if report and isinstance(data_frame, pl.DataFrame) else None
+    data_frame = data_frame.cast(conversoes)
+
+    if antes is not None:
+        depois = data_frame.estimated_size("mb")
+        economia = 1 - depois / antes if antes else 0
+        print(f"Tabela {tabela}: {antes:,.1f} MB -> {depois:,.1f} MB ({economia:.0%} menos memória)")
+
+    return data_frame
@@ -0,0 +1,248 @@
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import os
+
+from profiling import profiled
+from analytics import _normalize_columns_groupby
+from warehouse import bigquery, cached_query, get_bq_client
+
+# Contagens distintas aproximadas (HyperLogLog) de pedidos e clientes por segmento.
+# Um sketch é uma tabela longa (column, precision, segmentos..., idx, rank) com o maior rank de cada registrador;
+# sketches de segmentos mais finos (cidade, semana) se combinam pelo máximo do rank, então os recortes mais
+# grossos (estado, grupo, período inteiro) saem dos sketches já gravados, sem reler os pedidos.
+# Com precisão p há 2^p registradores por segmento e o erro padrão relativo é de cerca de 1,04 / sqrt(2^p)
+# (p=12: ~1,6%; p=14: ~0,8%).
+
+# Colunas de segmento gravadas pela camada gold em gold.segment_sketches (uma tabela por semana de pedidos)
+colunas_segment_sketches = ["is_target", "semana", "delivery_address_state", "delivery_address_city", "merchant_city"]
+
+_FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+_FNV_PRIME = np.uint64(0x100000001B3)
+
+
+### HASH ESTÁVEL DE 64 BITS ###
+
+# Função que espalha os bits de um hash de 64 bits (finalizador do splitmix64)
+def _mix64(valores):
+    valores = valores ^ (valores >> np.uint64(30))
+    valores = valores * np.uint64(0xBF58476D1CE4E5B9)
+    valores = valores ^ (valores >> np.uint64(27))
+    valores = valores * np.uint64(0x94D049BB133111EB)
+    return valores ^ (valores >> np.uint64(31))
+
+# Função que calcula o FNV-1a dos textos direto dos buffers do Arrow, uma posição de byte por vez para todas as linhas
+def _hash_strings(series):
+    arrow_array = series.cast(pl.Utf8).to_arrow(compat_level=pl.CompatLevel.oldest())
+    if isinstance(arrow_array, pa.ChunkedArray):
+        arrow_array = arrow_array.combine_chunks()
+
+    _, buffer_offsets, buffer_dados = arrow_array.buffers()
+    offsets = np.frombuffer(buffer_offsets, dtype=np.int64)[arrow_array.offset:arrow_array.offset + len(arrow_array) + 1]
+    dados = np.frombuffer(buffer_dados, dtype=np.uint8) if buffer_dados is not None else np.empty(0, dtype=np.uint8)
+
+    inicio = offsets[:-1]
+    tamanhos = np.diff(offsets)
+    hashes = np.full(len(arrow_array), _FNV_OFFSET, dtype=np.uint64)
+
+    for posicao in range(int(tamanhos.max()) if len(tamanhos) else 0):
+        if tamanhos.min() > posicao:
+            hashes = (hashes ^ dados[inicio + posicao]) * _FNV_PRIME
+        else:
+            ativos = np.flatnonzero(tamanhos > posicao)
+            hashes[ativos] = (hashes[ativos] ^ dados[inicio[ativos] + posicao]) * _FNV_PRIME
+
+    return _mix64(hashes)
+
+# Função que retorna um hash de 64 bits (uint64) de cada valor, igual entre execuções e versões das bibliotecas
+def hash_values(series):
+    """
+    Inteiros usam o próprio valor e textos (ou qualquer outro tipo, convertido para texto) usam o FNV-1a
+    dos bytes em UTF-8; nos dois casos o resultado passa pelo finalizador do splitmix64.
+    O Series.hash do Polars não serve aqui: ele pode mudar entre versões, e os sketches gravados precisam
+    ser combinados com os de execuções futuras. Valores nulos devem ser removidos antes.
+    """
+    if series.dtype.is_integer() or series.dtype == pl.Boolean:
+        return _mix64(series.cast(pl.Int64).to_numpy().view(np.uint64))
+
+    return _hash_strings(series)
+
+
+### CONSTRUÇÃO, COMBINAÇÃO E ESTIMATIVA DOS SKETCHES ###
+
+# Função que valida a precisão (bits do índice do registrador)
+def _check_precision(precision):
+    if not 4 <= int(precision) <= 16:
+        raise ValueError(f"precision deve estar entre 4 e 16: {precision}")
+    return int(precision)
+
+# Função que calcula o registrador (p primeiros bits do hash) e o rank (zeros à esquerda dos bits restantes + 1)
+def _registers(hashes, precision):
+    bits_restantes = 64 - precision
+    idx = (hashes >> np.uint64(bits_restantes)).astype(np.uint16)
+    resto = hashes & np.uint64((1 << bits_restantes) - 1)
+
+    # Número de bits significativos do resto, calculado em duas metades de 32 bits (exatas em float64)
+    alto = (resto >> np.uint64(32)).astype(np.float64)
+    baixo = (resto & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    bits = np.where(alto > 0, 32 + np.frexp(alto)[1], np.frexp(baixo)[1])
+
+    rank = (bits_restantes - bits + 1).astype(np.uint8)
+    return idx, rank
+
+# Função que monta os sketches HyperLogLog das colunas informadas para cada segmento
+@profiled()
+def build_sketches(data_frame, columns=("customer_id", "order_id"), segments=None, precision=12, filter_cities=None):
+    """
+    Retorna um DataFrame com as colunas 'column', 'precision', os segmentos, 'idx' e 'rank', com uma linha por
+    registrador ocupado de cada coluna e segmento. Aceita DataFrame ou LazyFrame; linhas repetidas (itens do
+    mesmo pedido) não mudam o sketch. O resultado pode ser gravado com save_sketches e combinado com
+    merge_sketches para qualquer subconjunto dos segmentos.
+    """
+    precision = _check_precision(precision)
+    segments = _normalize_columns_groupby(segments)
+    columns = [columns] if isinstance(columns, str) else list(columns)
+
+    lazy_frame = data_frame.lazy()
+    if filter_cities is not None:
+        lazy_frame = lazy_frame.filter(pl.col("merchant_city").is_in(filter_cities))
+
+    # Pares distintos (segmento, valor) de cada coluna, coletados juntos
+    pares = pl.collect_all([
+        lazy_frame.select(segments + [column]).drop_nulls(column).unique()
+        for column in columns
+    ])
+
+    sketches = []
+    for column, df_pares in zip(columns, pares):
+        idx, rank = _registers(hash_values(df_pares[column]), precision)
+        sketches.append(
+            df_pares.select(segments).with_columns([
+                pl.Series("idx", idx, dtype=pl.UInt16),
+                pl.Series("rank", rank, dtype=pl.UInt8)
+            ]).group_by(segments + ["idx"]).agg(
+                pl.col("rank").max()
+            ).select(
+                [pl.lit(column).alias("column"), pl.lit(precision, dtype=pl.UInt8).alias("precision")]
+                + segments + ["idx", "rank"]
+            )
+        )
+
+    return pl.concat(sketches, how="vertical_relaxed")
+
+# Função que combina sketches (pelo maior rank de cada registrador) nos segmentos informados
+def merge_sketches(sketches, segments=None):
+    """
+    Recebe um ou mais sketches (DataFrame, LazyFrame ou lista deles, ex.: um por semana) e retorna o sketch
+    agrupado somente por 'segments' (os demais segmentos são combinados). Sketches com precisões diferentes
+    não podem ser combinados. Sketches com segmentos categóricos gerados separadamente (ex.: um por semana) devem
+    ser gerados e combinados dentro do mesmo 'with pl.StringCache():', para que as categorias tenham a mesma codificação.
+    """
+    segments = _normalize_columns_groupby(segments)
+    if isinstance(sketches, (list, tuple)):
+        sketches = pl.concat([sketch.lazy() for sketch in sketches], how="vertical_relaxed")
+
+    sketches = sketches.lazy().group_by(["column", "precision"] + segments + ["idx"]).agg(pl.col("rank").max()).collect()
+
+    if sketches["precision"].n_unique() > 1:
+        raise ValueError(f"Sketches com precisões diferentes: {sorted(sketches['precision'].unique().to_list())}")
+
+    return sketches
+
+# Função que estima a contagem distinta de cada coluna por segmento
+@profiled()
+def estimate_distinct(sketches, segments=None):
+    """
+    Retorna uma linha por coluna e segmento com 'approx_distinct' (estimativa do HyperLogLog, com a correção
+    por linear counting quando há registradores vazios e a contagem é pequena) e 'relative_error'
+    (erro padrão relativo esperado, 1,04 / sqrt(2^precision)).
+    """
+    segments = _normalize_columns_groupby(segments)
+    sketches = merge_sketches(sketches, segments)
+
+    m = 2.0 ** pl.col("precision").cast(pl.Float64)
+    alpha = (
+        pl.when(m == 16).then(0.673)
+        .when(m == 32).then(0.697)
+        .when(m == 64).then(0.709)
+        .otherwise(0.7213 / (1 + 1.079 / m))
+    )
+
+    return sketches.group_by(["column", "precision"] + segments).agg([
+        pl.len().alias("_ocupados"),
+        (2.0 ** -pl.col("rank").cast(pl.Float64)).sum().alias("_soma")
+    ]).with_columns([
+        # Registradores vazios têm rank 0 e somam 2^0 = 1
+        (m - pl.col("_ocupados")).alias("_vazios"),
+        (alpha * m * m / (pl.col("_soma") + m - pl.col("_ocupados"))).alias("_estimativa")
+    ]).with_columns([
+        pl.when((pl.col("_estimativa") <= 2.5 * m) & (pl.col("_vazios") > 0))
+        .then(m * (m / pl.col("_vazios")).log())
+        .otherwise(pl.col("_estimativa"))
+        .round(0).cast(pl.Int64).alias("approx_distinct"),
+        (1.04 / m.sqrt()).alias("relative_error")
+    ]).select(
+        ["column"] + segments + ["approx_distinct", "relative_error"]
+    ).sort(["column"] + segments)
+
+# Função que calcula pedidos e clientes únicos aproximados do teste A/B a partir dos sketches
+def approx_ab_counts(sketches, columns_groupby=None):
+    """
+    Modo aproximado das contagens de calculate_evaluation_metrics / calculate_ab_metrics: retorna, por grupo
+    (is_target) e segmento, 'orders' e 'unique_customers' estimados pelos sketches de 'order_id' e
+    'customer_id', e 'total_orders' e 'total_customers' somados entre os grupos do segmento.
+    """
+    columns_groupby = _normalize_columns_groupby(columns_groupby)
+    if columns_groupby:
+        total = lambda coluna: pl.col(coluna).sum().over(columns_groupby)
+    else:
+        total = lambda coluna: pl.col(coluna).sum()
+
+    estimativas = estimate_distinct(sketches, ["is_target"] + columns_groupby)
+    contagens = estimativas.pivot(
+        on="column", index=["is_target"] + columns_groupby, values="approx_distinct"
+    ).rename({"order_id": "orders", "customer_id": "unique_customers"})
+
+    return contagens.with_columns([
+        total("orders").alias("total_orders"),
+        total("unique_customers").alias("total_customers")
+    ]).select(
+        ["is_target"] + columns_groupby + ["orders", "unique_customers", "total_orders", "total_customers"]
+    ).sort(["is_target"] + columns_groupby, descending=[True] + [False] * len(columns_groupby))
+
+
+### PERSISTÊNCIA DOS SKETCHES ###
+
+# Função que grava um sketch em Parquet (arquivo temporário + rename, para nunca deixar um arquivo incompleto)
+def save_sketches(sketches, caminho):
+    sketches.write_parquet(caminho + ".tmp")
+    os.replace(caminho + ".tmp", caminho)
+    return caminho
+
+# Função que lê sketches gravados em Parquet (um arquivo, uma lista ou um padrão como 'sketches_*.parquet')
+def load_sketches(source):
+    return pl.scan_parquet(source).collect()
+
+# Função que lê os sketches da gold (gold.segment_sketches), somente da última carga de cada semana
+def read_segment_sketches(semanas=None, client=None, use_cache=True):
+    parametros = []
+    # Sem filtro de semanas, WHERE TRUE: o BigQuery só aceita QUALIFY junto de WHERE, GROUP BY ou HAVING
+    where = "WHERE TRUE"
+    if semanas is not None:
+        where = "WHERE semana IN UNNEST(@semanas)"
+        parametros.append(bigquery.ArrayQueryParameter("semanas", "STRING", list(semanas)))
+
+    qry = f"""
+            SELECT
+                column, precision, {", ".join(colunas_segment_sketches)}, idx, rank
+            FROM gold.segment_sketches
+            {where}
+            QUALIFY insert_date = MAX(insert_date) OVER (PARTITION BY semana)
+        """
+    job_config = bigquery.QueryJobConfig(query_parameters=parametros)
+
+    client = client or get_bq_client()
+    if use_cache:
+        return cached_query(client, qry, "gold.segment_sketches", job_config=job_config)
+
+    return pl.from_arrow(client.query(qry, job_config=job_config).to_arrow())
@@ -0,0 +1,812 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+import datetime
+import hashlib
+import io
+import json
+import os
+import sys
+import tarfile
+import threading
+import time
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+import utils # configuração do projeto (credenciais, backend, pastas de cache e de manifestos)
+from profiling import profile_stage, profiled, record_job # medição por etapa (tempo, memória, linhas e jobs)
+from schemas import apply_schema
+from utils import lazy_import
+
+# SDKs do GCP importados no primeiro uso (o modo local e as análises sobre arquivos não precisam deles)
+bigquery = lazy_import("google.cloud.bigquery")
+storage = lazy_import("google.cloud.storage")
+service_account = lazy_import("google.oauth2.service_account")
+exceptions = lazy_import("google.cloud.exceptions")
+
+### CLIENTES DO WAREHOUSE E DO STORAGE (UM POR PROCESSO) ###
+
+# Clientes já criados, por backend, credencial e projeto. As credenciais e o pool de conexões HTTP de cada
+# cliente são reaproveitados por todas as chamadas e threads do processo
+_clientes = {}
+_trava_clientes = threading.RLock()
+
+# Conexões HTTP mantidas abertas por cliente (cargas e extrações concorrentes usam uma conexão por thread)
+tamanho_pool_conexoes = 32
+
+# Função que retorna o objeto guardado em 'chave' ou cria com criar(), uma única vez mesmo com várias threads
+def _pooled(chave, criar):
+    with _trava_clientes:
+        if chave not in _clientes:
+            _clientes[chave] = criar()
+        return _clientes[chave]
+
+# Função que lê a chave da conta de serviço uma única vez por arquivo
+def _credentials(caminho):
+    return _pooled(("credencial", caminho), lambda: service_account.Credentials.from_service_account_file(caminho))
+
+# Função que cria a sessão HTTP autenticada, com pool de até tamanho_pool_conexoes conexões
+def _authorized_session(credencial, scopes):
+    from google.auth.credentials import with_scopes_if_required
+    from google.auth.transport.requests import AuthorizedSession
+    from requests.adapters import HTTPAdapter
+
+    sessao = AuthorizedSession(with_scopes_if_required(credencial, scopes))
+    sessao.mount("https://", HTTPAdapter(pool_connections=tamanho_pool_conexoes, pool_maxsize=tamanho_pool_conexoes))
+    return sessao
+
+# Função para autenticar e retornar o cliente BigQuery, criado na primeira chamada e reaproveitado nas seguintes
+# Com backend="local" (ou backend_warehouse = "local"), retorna o warehouse local, que tem a mesma interface
+def get_bq_client(backend=None):
+    backend = backend or utils.backend_warehouse
+
+    if backend == "local":
+        def criar():
+            from local_warehouse import LocalWarehouseClient  # Importado aqui para que o DuckDB só seja exigido no modo local
+            return LocalWarehouseClient(utils.pasta_warehouse_local, project=utils.id_projeto)
+
+        return _pooled(("local", utils.pasta_warehouse_local, utils.id_projeto), criar)
+
+    def criar():
+        credencial = _credentials(utils.credencial_gcp)
+        sessao = _authorized_session(credencial, bigquery.Client.SCOPE)
+        return bigquery.Client(credentials=credencial, project=utils.id_projeto, _http=sessao)
+
+    return _pooled(("bigquery", utils.credencial_gcp, utils.id_projeto), criar)
+
+# Função que retorna o cliente do Cloud Storage, criado na primeira chamada e reaproveitado nas seguintes
+def get_storage_client():
+    def criar():
+        credencial = _credentials(utils.credencial_gcp)
+        sessao = _authorized_session(credencial, storage.Client.SCOPE)
+        return storage.Client(credentials=credencial, project=utils.id_projeto, _http=sessao)
+
+    return _pooled(("storage", utils.credencial_gcp, utils.id_projeto), criar)
+
+# Função que descarta os clientes e as credenciais guardados (ex.: depois de trocar a chave da conta de serviço)
+def reset_clients():
+    with _trava_clientes:
+        clientes = list(_clientes.values())
+        _clientes.clear()
+
+    for cliente in clientes:
+        fechar = getattr(cliente, "close", None)
+        if callable(fechar):
+            fechar()
+
+    return len(clientes)
+
+### CACHE LOCAL DE CONSULTAS ###
+
+# Função que retorna a última insert_date da tabela de origem, usada como versão dos dados no cache
+def table_version(client, tabela_origem):
+    qry = f"SELECT CAST(MAX(insert_date) AS STRING) AS versao FROM {tabela_origem}"
+    return client.query(qry).to_arrow().column(0)[0].as_py()
+
+# Função que monta o caminho do arquivo em cache: '{tabela_origem}__{sha256(consulta + parâmetros + versão)}.arrow'
+def _cache_path(pasta, qry, tabela_origem, versao, job_config=None):
+    parametros = []
+    if job_config is not None:
+        parametros = [parametro.to_api_repr() for parametro in job_config.query_parameters]
+
+    conteudo = f"{qry}|{json.dumps(parametros, sort_keys=True, default=str)}|{versao}"
+    chave = hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+    return os.path.join(pasta, f"{tabela_origem}__{chave}.arrow")
+
+# Função que grava o resultado em Arrow IPC sem compressão (permite abrir com memory map)
+def _write_cache(arrow_table, caminho):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    caminho_temporario = caminho + ".tmp"
+    with pa.OSFile(caminho_temporario, "wb") as destino:
+        with pa.ipc.new_file(destino, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+    os.replace(caminho_temporario, caminho)
+
+# Função que remove os arquivos usados há mais tempo até o cache ficar abaixo de limite_bytes (LRU)
+def _evict_cache(pasta, limite_bytes, manter=None):
+    arquivos = [os.path.join(pasta, arq) for arq in os.listdir(pasta) if arq.endswith(".arrow")]
+    arquivos.sort(key=os.path.getmtime)
+    total = sum(os.path.getsize(arq) for arq in arquivos)
+
+    for arquivo in arquivos:
+        if total <= limite_bytes:
+            break
+        if arquivo == manter:
+            continue
+        try:
+            tamanho = os.path.getsize(arquivo)
+            os.remove(arquivo)
+            total -= tamanho
+            print(f"Removido do cache: {os.path.basename(arquivo)}")
+        except OSError as e:
+            # No Windows, um arquivo ainda mapeado em memória não pode ser removido
+            print(f"Não foi possível remover {arquivo} do cache: {e}")
+
+# Função que executa a consulta usando o cache local quando a tabela de origem não mudou
+@profiled()
+def cached_query(client, qry, tabela_origem, job_config=None, pasta=None, limite_bytes=None):
+    """
+    A chave do cache é a consulta + a última insert_date de tabela_origem, então uma nova carga na
+    tabela invalida o resultado automaticamente. O resultado é salvo em Arrow IPC e lido com
+    memory map; o cache é limitado a limite_bytes, removendo os arquivos usados há mais tempo.
+    """
+    pasta = pasta or utils.pasta_cache
+    limite_bytes = limite_bytes or utils.limite_cache_bytes
+
+    versao = table_version(client, tabela_origem)
+    caminho = _cache_path(pasta, qry, tabela_origem, versao, job_config)
+
+    if os.path.exists(caminho):
+        os.utime(caminho)  # Marca o uso do arquivo para o LRU
+        print(f"Resultado lido do cache ({tabela_origem}, versão {versao}).")
+        return pl.read_ipc(caminho, memory_map=True)
+
+    with profile_stage("query_to_arrow") as etapa:
+        arrow_table = record_job(client.query(qry, job_config=job_config)).to_arrow()
+        if etapa is not None:
+            etapa.rows_out = arrow_table.num_rows
+    _write_cache(arrow_table, caminho)
+    _evict_cache(pasta, limite_bytes, manter=caminho)
+    print(f"Resultado salvo no cache ({tabela_origem}, versão {versao}).")
+
+    return pl.from_arrow(arrow_table)
+
+# Função que apaga o cache local (somente os resultados de tabela_origem, se informada)
+def invalidate_cache(tabela_origem=None, pasta=None):
+    pasta = pasta or utils.pasta_cache
+
+    # Descarta também as vendas guardadas em memória por get_sales_data, se o analytics já foi importado
+    analytics = sys.modules.get("analytics")
+    if analytics is not None:
+        analytics.df_sales = None
+
+    if not os.path.isdir(pasta):
+        return 0
+
+    prefixo = f"{tabela_origem}__" if tabela_origem else ""
+    removidos = 0
+    for arquivo in os.listdir(pasta):
+        if arquivo.startswith(prefixo) and arquivo.endswith(".arrow"):
+            try:
+                os.remove(os.path.join(pasta, arquivo))
+                removidos += 1
+            except OSError as e:
+                print(f"Não foi possível remover {arquivo} do cache: {e}")
+
+    print(f"{removidos} arquivos removidos do cache.")
+    return removidos
+
+# Função que verifica se o objeto é um DataFrame do Pandas, sem importar o Pandas (se ele não foi importado, não é)
+def _is_pandas(df):
+    pd = sys.modules.get("pandas")
+    return pd is not None and isinstance(df, pd.DataFrame)
+
+def split_dataframe(df, chunk_size):
+    """Divide um DataFrame Pandas em pedaços menores."""
+    return [df[i:i+chunk_size] for i in range(0, len(df), chunk_size)]
+
+# Função que verifica se o objeto pode seguir pelo caminho Arrow (Polars, tabela ou lote do Arrow)
+def _is_arrow_compatible(df):
+    return isinstance(df, (pl.DataFrame, pa.Table, pa.RecordBatch))
+
+# Função que divide um DataFrame do Polars ou uma tabela do Arrow em fatias de até chunk_size linhas
+# As fatias não copiam os dados; no Polars, a conversão para Arrow é feita por fatia, e não na tabela inteira
+def split_arrow_table(table, chunk_size):
+    if isinstance(table, pl.DataFrame):
+        for fatia in table.iter_slices(chunk_size):
+            yield fatia.to_arrow()
+        return
+
+    if isinstance(table, pa.RecordBatch):
+        table = pa.Table.from_batches([table])
+
+    for inicio in range(0, table.num_rows, chunk_size):
+        yield table.slice(inicio, chunk_size)
+
+# Função que verifica se a tabela de destino já existe no warehouse
+def _table_exists(client, table_id):
+    try:
+        client.get_table(table_id)
+        return True
+    except exceptions.NotFound:
+        return False
+
+# Função que monta a configuração do job de carga (append)
+# Particionamento e clustering só podem ser enviados quando o job cria a tabela: em WRITE_APPEND, o BigQuery recusa o
+# job se a especificação for diferente da tabela existente (ver _load_chunk)
+def _load_job_config(source_format=None, partition_field=None, clustering_fields=None):
+    job_config = bigquery.LoadJobConfig(write_disposition=bigquery.WriteDisposition.WRITE_APPEND)
+
+    if source_format is not None:
+        job_config.source_format = source_format
+    if partition_field is not None:
+        job_config.time_partitioning = bigquery.TimePartitioning(
+            type_=bigquery.TimePartitioningType.DAY,
+            field=partition_field
+        )
+    if clustering_fields:
+        job_config.clustering_fields = list(clustering_fields)
+
+    return job_config
+
+# Função que serializa um chunk em Parquet e envia ao BigQuery como um job de carga (append)
+@profiled()
+def _load_chunk(client, chunk, table_id, job_id=None, partition_field=None, clustering_fields=None):
+    # Tabela existente: append sem particionamento e clustering, que continuam os da própria tabela
+    if (partition_field is not None or clustering_fields) and _table_exists(client, table_id):
+        partition_field, clustering_fields = None, None
+
+    # Pandas: mantém o caminho original
+    if _is_pandas(chunk):
+        job_config = _load_job_config(partition_field=partition_field, clustering_fields=clustering_fields)
+        job = record_job(client.load_table_from_dataframe(chunk, table_id, job_config=job_config, job_id=job_id))
+        job.result()
+        return job
+
+    # Arrow: grava a fatia direto em Parquet, sem passar pelo Pandas
+    buffer = io.BytesIO()
+    pq.write_table(chunk, buffer, coerce_timestamps="us", allow_truncated_timestamps=True)
+    buffer.seek(0)
+
+    job_config = _load_job_config(bigquery.SourceFormat.PARQUET, partition_field, clustering_fields)
+    job = record_job(client.load_table_from_file(buffer, table_id, job_config=job_config, job_id=job_id))
+    job.result()
+    return job
+
+# Função que gera um identificador estável para a carga (mesma tabela de destino, mesmos dados e mesmo chunk_size)
+# O hash cobre o conteúdo inteiro (soma dos hashes das linhas) e o schema, para que duas cargas diferentes com o mesmo
+# número de linhas e as mesmas pontas nunca compartilhem o manifesto
+def _load_fingerprint(df, table_id, chunk_size):
+    if _is_pandas(df):
+        schema = list(df.dtypes.astype(str).items())
+        hash_linhas = int(sys.modules["pandas"].util.hash_pandas_object(df, index=False).sum())
+    else:
+        df = df if isinstance(df, pl.DataFrame) else pl.from_arrow(df)
+        schema = list(df.schema.items())
+        # Categóricas como texto: os códigos físicos dependem da ordem em que as categorias apareceram no processo
+        hash_linhas = df.with_columns(pl.col(pl.Categorical).cast(pl.Utf8)).hash_rows(seed=0).sum() if len(df) else 0
+
+    conteudo = f"{table_id}|{len(df)}|{chunk_size}|{schema}|{hash_linhas}"
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()[:16]
+
+# Função que lê o manifesto de uma carga em chunks (None se a carga ainda não começou)
+def read_manifest(caminho_manifesto):
+    if not os.path.exists(caminho_manifesto):
+        return None
+    with open(caminho_manifesto, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+# Função que grava o manifesto em um arquivo temporário e renomeia, para nunca deixar um manifesto incompleto
+def write_manifest(caminho_manifesto, manifesto):
+    caminho_temporario = caminho_manifesto + ".tmp"
+    with open(caminho_temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(manifesto, arquivo, indent=2)
+    os.replace(caminho_temporario, caminho_manifesto)
+
+# Função que retorna as linhas de um job de carga já concluído com sucesso (None se o job não existe ou falhou)
+def _finished_job_rows(client, job_id):
+    try:
+        job = client.get_job(job_id)
+        job.result()
+        return job.output_rows
+    except Exception:
+        return None
+
+# Função que envia um chunk com novas tentativas
+# Cada tentativa usa um job_id próprio; antes de tentar de novo, confere se o job anterior não terminou com
+# sucesso (ex.: a resposta se perdeu na rede), evitando linhas duplicadas na tabela
+def _load_chunk_with_retry(client, chunk, table_id, job_prefix, max_retries, backoff, partition_field=None, clustering_fields=None):
+    for tentativa in range(1, max_retries + 1):
+        job_id = f"{job_prefix}_{tentativa}"
+        try:
+            return _load_chunk(client, chunk, table_id, job_id, partition_field, clustering_fields).output_rows
+        except Exception as e:
+            linhas = _finished_job_rows(client, job_id)
+            if linhas is not None:
+                return linhas
+            if tentativa == max_retries:
+                raise
+            espera = backoff ** tentativa
+            print(f"Erro no job {job_id} ({e}). Nova tentativa em {espera}s...")
+            time.sleep(espera)
+
+# Função que envia os chunks com até max_in_flight jobs de carga simultâneos, registrando cada chunk concluído em um manifesto
+def load_chunks_concurrently(df, table_id, client, chunk_size=1_000_000, max_in_flight=4, max_retries=3, backoff=2, load_id=None, pasta_manifesto=None, partition_field=None, clustering_fields=None):
+    """
+    Enquanto até max_in_flight chunks estão sendo serializados e enviados, o próximo chunk já é preparado.
+    Cada chunk concluído é gravado no manifesto '{pasta_manifesto}/{load_id}.json'; ao executar de novo
+    a mesma carga (mesmo load_id), os chunks já registrados são pulados, então uma carga interrompida é
+    retomada sem duplicar linhas. O manifesto é apagado quando todos os chunks terminam. Retorna o total
+    de linhas carregadas.
+    """
+    if load_id is None:
+        load_id = _load_fingerprint(df, table_id, chunk_size)
+
+    pasta_manifesto = pasta_manifesto or utils.pasta_manifestos_carga
+    os.makedirs(pasta_manifesto, exist_ok=True)
+    caminho_manifesto = os.path.join(pasta_manifesto, f"{load_id}.json")
+
+    total_chunks = -(-len(df) // chunk_size)
+    manifesto = read_manifest(caminho_manifesto) or {
+        "load_id": load_id,
+        "table_id": table_id,
+        "chunk_size": chunk_size,
+        "total_chunks": total_chunks,
+        "chunks": {}
+    }
+    concluidos = manifesto["chunks"]
+
+    if len(concluidos) == total_chunks:
+        print(f"Carga {load_id} já concluída anteriormente ({total_chunks} chunks). Nada a enviar.")
+        os.remove(caminho_manifesto)
+        return sum(concluidos.values())
+    if concluidos:
+        print(f"Retomando a carga {load_id}: {len(concluidos)}/{total_chunks} chunks já enviados.")
+
+    trava = threading.Lock()
+    erros = {}
+    em_andamento = {}
+
+    def coletar(futuro):
+        i = em_andamento.pop(futuro)
+        try:
+            linhas = futuro.result()
+        except Exception as e:
+            erros[i] = e
+            print(f"Erro ao carregar o chunk {i+1}/{total_chunks}: {e}")
+            return
+        with trava:
+            concluidos[str(i)] = linhas
+            write_manifest(caminho_manifesto, manifesto)
+
+    if _is_arrow_compatible(df):
+        chunks = split_arrow_table(df, chunk_size)
+    else:
+        chunks = (df[i:i+chunk_size] for i in range(0, len(df), chunk_size))
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for i, chunk in enumerate(chunks):
+            if str(i) in concluidos:
+                continue
+
+            # Limita os chunks em memória: espera algum job terminar antes de preparar o próximo
+            while len(em_andamento) >= max_in_flight:
+                feitos, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+                for futuro in feitos:
+                    coletar(futuro)
+
+            print(f"Enviando chunk {i+1}/{total_chunks} com {len(chunk)} linhas...")
+            futuro = executor.submit(
+                _load_chunk_with_retry, client, chunk, table_id, f"carga_{load_id}_{i}",
+                max_retries, backoff, partition_field, clustering_fields
+            )
+            em_andamento[futuro] = i
+
+        for futuro in as_completed(list(em_andamento)):
+            coletar(futuro)
+
+    if erros:
+        raise RuntimeError(
+            f"Falha nos chunks {sorted(i + 1 for i in erros)} de {total_chunks}. "
+            f"Execute novamente para retomar a carga {load_id} a partir do manifesto {caminho_manifesto}."
+        )
+
+    # Carga concluída: o manifesto só é necessário para retomar uma carga interrompida
+    if os.path.exists(caminho_manifesto):
+        os.remove(caminho_manifesto)
+    return sum(concluidos.values())
+
+@profiled()
+def create_dataset_and_table(df, dataset_nome, tabela_nome, client, location="southamerica-east1", use_chunk=False, chunk_size=1_000_000, max_in_flight=4, max_retries=3, load_id=None, partition_field=None, clustering_fields=None):
+    """
+    Cria um dataset (se necessário) e insere os dados em uma tabela BigQuery usando chunks, se use_chunk=True
+    Suporta DataFrames do Polars e tabelas do Arrow (enviados como Parquet, em fatias sem cópia e
+    sem conversão para Pandas) e também DataFrames do Pandas.
+    Com use_chunk=True, até max_in_flight chunks são enviados ao mesmo tempo, cada um com até max_retries
+    tentativas, e a carga pode ser retomada sem duplicar linhas (ver load_chunks_concurrently).
+    Se a tabela ainda não existe, ela é criada particionada por partition_field (diário) e com clustering
+    em clustering_fields. Retorna o total de linhas carregadas; os erros de criação do dataset e de carga
+    são propagados (na carga por chunks, RuntimeError com o manifesto para retomar).
+    """
+    dataset_id = f"{utils.id_projeto}.{dataset_nome}"
+    table_id = f"{dataset_id}.{tabela_nome}"
+
+    # 1. Polars e Arrow seguem como tabela do Arrow; Pandas segue como está
+    if not _is_arrow_compatible(df) and not _is_pandas(df):
+        raise ValueError("O objeto fornecido não é um DataFrame válido.")
+
+    # 2. Criar dataset se não existir
+    dataset = bigquery.Dataset(dataset_id)
+    dataset.location = location
+    client.create_dataset(dataset, exists_ok=True)
+    print(f"Dataset '{dataset_id}' pronto.")
+
+    if use_chunk == False:
+        if isinstance(df, pl.DataFrame):
+            df = df.to_arrow()
+        elif isinstance(df, pa.RecordBatch):
+            df = pa.Table.from_batches([df])
+
+        job = _load_chunk(client, df, table_id, partition_field=partition_field, clustering_fields=clustering_fields)
+        print(f"Tabela '{table_id}' criada com {job.output_rows} linhas.")
+        return job.output_rows
+
+    # 3. Inserir em chunks
+    total_rows = load_chunks_concurrently(
+        df, table_id, client,
+        chunk_size=chunk_size,
+        max_in_flight=max_in_flight,
+        max_retries=max_retries,
+        load_id=load_id,
+        partition_field=partition_field,
+        clustering_fields=clustering_fields
+    )
+    print(f"Tabela '{table_id}' carregada com {total_rows} linhas.")
+    return total_rows
+
+### TABELAS MATERIALIZADAS NO WAREHOUSE ###
+
+# Função que monta as cláusulas PARTITION BY e CLUSTER BY de um CREATE TABLE
+def _table_options(partition_by=None, cluster_by=None):
+    opcoes = ""
+    if partition_by:
+        opcoes += f"\nPARTITION BY {partition_by}"
+    if cluster_by:
+        opcoes += f"\nCLUSTER BY {', '.join(cluster_by)}"
+    return opcoes
+
+# Função que cria (ou recria) uma tabela a partir de uma consulta, executada inteiramente no warehouse
+@profiled()
+def create_table_as(client, tabela_destino, qry, partition_by=None, cluster_by=None, job_config=None):
+    """
+    Executa CREATE OR REPLACE TABLE tabela_destino [PARTITION BY ...] [CLUSTER BY ...] AS qry,
+    sem trazer os dados para a memória. Funciona também no warehouse local (PARTITION BY e CLUSTER BY
+    são ignorados). Retorna o total de linhas da tabela criada; os erros são propagados.
+    """
+    ddl = f"CREATE OR REPLACE TABLE {tabela_destino}{_table_options(partition_by, cluster_by)}\nAS\n{qry}"
+
+    record_job(client.query(ddl, job_config=job_config)).result()
+    linhas = client.query(f"SELECT COUNT(*) FROM {tabela_destino}").to_arrow().column(0)[0].as_py()
+    print(f"Tabela '{tabela_destino}' criada com {linhas} linhas.")
+    return linhas
+
+# Função que insere o resultado de uma consulta em uma tabela, criando a tabela (CREATE TABLE ... AS) se ela não existe
+@profiled()
+def insert_as_select(client, tabela_destino, qry, partition_by=None, cluster_by=None, job_config=None):
+    """
+    Executa INSERT INTO tabela_destino qry dentro do warehouse. Se a tabela ainda não existe, ela é criada
+    com CREATE TABLE tabela_destino [PARTITION BY ...] [CLUSTER BY ...] AS qry. As colunas de qry devem
+    seguir a ordem das colunas da tabela. Retorna o total de linhas inseridas; os erros são propagados.
+    """
+    try:
+        job = record_job(client.query(f"INSERT INTO {tabela_destino}\n{qry}", job_config=job_config))
+        job.result()
+        return job.num_dml_affected_rows
+    except exceptions.NotFound:
+        pass
+
+    try:
+        ddl = f"CREATE TABLE {tabela_destino}{_table_options(partition_by, cluster_by)}\nAS\n{qry}"
+        record_job(client.query(ddl, job_config=job_config)).result()
+    except exceptions.Conflict:
+        # Outra execução criou a tabela entre o INSERT e o CREATE: insere normalmente
+        job = record_job(client.query(f"INSERT INTO {tabela_destino}\n{qry}", job_config=job_config))
+        job.result()
+        return job.num_dml_affected_rows
+
+    print(f"Tabela '{tabela_destino}' criada.")
+    return client.query(f"SELECT COUNT(*) FROM {tabela_destino}").to_arrow().column(0)[0].as_py()
+
+# Função que materializa várias partições (ex.: semanas) de uma consulta direto em uma tabela do warehouse
+@profiled()
+def materialize_partitions(client, qry_template, particoes, tabela_destino, insert_date, partition_by=None, cluster_by=None, max_workers=4, ao_materializar=None):
+    """
+    Para cada partição, executa INSERT INTO tabela_destino SELECT *, @insert_date FROM (qry_template.format(particao=...)),
+    sem baixar nem reenviar os dados (a tabela é criada com CREATE TABLE ... AS na primeira partição, se não existe).
+    Todas as partições recebem o mesmo insert_date (coluna 'insert_date', no fim da tabela). A primeira partição é
+    executada sozinha e as demais com até max_workers consultas simultâneas. Funciona também no warehouse local.
+    ao_materializar, se informada, é chamada com cada partição assim que ela é inserida (ex.: para registrar a
+    marca d'água). Se alguma partição falhar, as demais seguem e, ao final, é gerado RuntimeError com as partições
+    que falharam. Retorna a lista de partições materializadas, na ordem de 'particoes'.
+    """
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter("insert_date", "TIMESTAMP", insert_date)
+    ])
+
+    def materializar(particao):
+        qry = f"SELECT *, @insert_date AS insert_date\nFROM (\n{qry_template.format(particao=particao)}\n)"
+        return insert_as_select(client, tabela_destino, qry, partition_by, cluster_by, job_config)
+
+    particoes = list(particoes)
+    erros = {}
+
+    def registrar(particao, futuro):
+        try:
+            linhas = futuro.result()
+        except Exception as e:
+            erros[particao] = e
+            print(f"Erro ao materializar a partição {particao}: {e}")
+            return
+        print(f"Partição {particao}: {linhas} linhas inseridas em {tabela_destino}")
+        if ao_materializar is not None:
+            ao_materializar(particao)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # A primeira partição pode criar a tabela; as demais só começam depois dela
+        if particoes:
+            registrar(particoes[0], executor.submit(materializar, particoes[0]))
+
+        futuros = {executor.submit(materializar, particao): particao for particao in particoes[1:]}
+        for futuro in as_completed(futuros):
+            registrar(futuros[futuro], futuro)
+
+    if erros:
+        raise RuntimeError(f"Falha ao materializar as partições em {tabela_destino}: {sorted(erros)}")
+
+    return particoes
+
+### EXTRAÇÃO CONCORRENTE POR PARTIÇÃO (SEMANA) ###
+
+# Função que executa a consulta de uma partição e grava o resultado direto em Parquet, com novas tentativas
+# Com schema_tabela, o resultado é gravado com os tipos compactos dessa tabela (ver schemas_tabelas)
+@profiled()
+def _extract_partition(client, qry, caminho_arquivo, max_retries, backoff, schema_tabela=None):
+    for tentativa in range(1, max_retries + 1):
+        try:
+            arrow_table = record_job(client.query(qry)).to_arrow()
+
+            # Grava em um arquivo temporário e renomeia, para não deixar Parquet incompleto em caso de falha
+            caminho_temporario = caminho_arquivo + ".tmp"
+            if schema_tabela is not None:
+                apply_schema(pl.from_arrow(arrow_table), schema_tabela).write_parquet(caminho_temporario)
+            else:
+                pq.write_table(arrow_table, caminho_temporario)
+            os.replace(caminho_temporario, caminho_arquivo)
+
+            return arrow_table.num_rows
+        except Exception as e:
+            if tentativa == max_retries:
+                raise
+            espera = backoff ** tentativa
+            print(f"Erro na tentativa {tentativa}/{max_retries} ({e}). Nova tentativa em {espera}s...")
+            time.sleep(espera)
+
+# Função que extrai várias partições (ex.: semanas) em paralelo, gravando cada uma em um arquivo Parquet
+@profiled()
+def extract_partitions_to_parquet(client, qry_template, particoes, pasta_destino, prefixo, max_workers=4, max_retries=3, backoff=2, schema_tabela=None):
+    """
+    Executa qry_template.format(particao=...) para cada partição com até max_workers consultas simultâneas.
+    Cada resultado é gravado em '{pasta_destino}/{prefixo}_{particao}.parquet' assim que chega, sem
+    acumular as partições em memória. Com schema_tabela (ex.: "gold.sales"), os arquivos são gravados
+    com os tipos compactos da tabela. Retorna um dicionário {particao: caminho_arquivo}.
+    """
+    os.makedirs(pasta_destino, exist_ok=True)
+    arquivos = {}
+    erros = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {}
+        for particao in particoes:
+            caminho_arquivo = os.path.join(pasta_destino, f"{prefixo}_{particao}.parquet")
+            qry = qry_template.format(particao=particao)
+            futuro = executor.submit(_extract_partition, client, qry, caminho_arquivo, max_retries, backoff, schema_tabela)
+            futuros[futuro] = (particao, caminho_arquivo)
+
+        for futuro in as_completed(futuros):
+            particao, caminho_arquivo = futuros[futuro]
+            try:
+                linhas = futuro.result()
+                arquivos[particao] = caminho_arquivo
+                print(f"Partição {particao}: {linhas} linhas salvas em {caminho_arquivo}")
+            except Exception as e:
+                erros[particao] = e
+                print(f"Erro ao extrair a partição {particao}: {e}")
+
+    if erros:
+        raise RuntimeError(f"Falha ao extrair as partições: {sorted(erros)}")
+
+    return {particao: arquivos[particao] for particao in particoes}
+
+@profiled()
+def send_parquets_to_bigquery(pasta_projeto, dataset_nome, tabela_nome, client, var_insert_date, location="southamerica-east1", particoes=None, partition_field=None, clustering_fields=None, prefixo="sales"):
+    """
+    Percorre os arquivos '{prefixo}_*.parquet' na pasta_projeto e faz append no BigQuery, um arquivo por vez.
+    Se particoes for informado, envia somente os arquivos dessas semanas ('{prefixo}_{semana}.parquet').
+    Retorna a lista de semanas enviadas com sucesso.
+    """
+    arquivos = sorted([arq for arq in os.listdir(pasta_projeto) if arq.startswith(f"{prefixo}_") and arq.endswith(".parquet")])
+
+    if particoes is not None:
+        arquivos = [arq for arq in arquivos if arq[len(prefixo) + 1:-len(".parquet")] in set(particoes)]
+
+    enviadas = []
+
+    if not arquivos:
+        print(f"Nenhum arquivo '{prefixo}_*.parquet' encontrado na pasta.")
+        return enviadas
+
+    for arquivo in arquivos:
+        caminho_arquivo = os.path.join(pasta_projeto, arquivo)
+        print(f"Lendo arquivo: {arquivo}")
+
+        try:
+            df = pl.read_parquet(caminho_arquivo)
+            df = df.with_columns([
+                    pl.lit(var_insert_date).alias("insert_date")
+                ])
+        except Exception as e:
+            print(f"Erro ao ler {arquivo}: {e}")
+            continue
+
+        print(f"Enviando para BigQuery: {arquivo}")
+        try:
+            create_dataset_and_table(
+                df=df,
+                dataset_nome=dataset_nome,
+                tabela_nome=tabela_nome,
+                client=client,
+                use_chunk=True,
+                location=location,
+                partition_field=partition_field,
+                clustering_fields=clustering_fields
+            )
+        except Exception as e:
+            # A semana fica fora da lista de enviadas e volta como pendente na próxima execução
+            print(f"Erro ao enviar {arquivo}: {e}")
+            continue
+
+        enviadas.append(arquivo[len(prefixo) + 1:-len(".parquet")])
+
+    return enviadas
+
+### INGESTÃO EM STREAMING DA CAMADA BRONZE ###
+
+# Função que abre um arquivo do bucket como stream de leitura (o download é feito em partes, sob demanda).
+# Uma pasta local pode ser usada no lugar do bucket, passando o caminho da pasta em 'origem'.
+def open_bucket_object(origem, file_name, chunk_size=8 * 1024 * 1024):
+    if isinstance(origem, (str, os.PathLike)):
+        return open(os.path.join(origem, file_name), "rb")
+
+    return origem.blob(file_name).open("rb", chunk_size=chunk_size)
+
+# Função que converte colunas de data/hora inferidas pelo Arrow de volta para texto,
+# mantendo o mesmo schema que o pd.read_csv gerava na camada bronze
+def _temporal_as_string(batch, column_types):
+    colunas = []
+    for campo, coluna in zip(batch.schema, batch.columns):
+        if campo.name not in column_types and pa.types.is_temporal(campo.type):
+            coluna = coluna.cast(pa.string())
+        colunas.append(coluna)
+
+    return pa.RecordBatch.from_arrays(colunas, names=batch.schema.names)
+
+# Tipos fixos das colunas dos CSVs da bronze. Sem eles, os tipos são inferidos só pelo primeiro bloco, e um valor
+# fora do tipo em um bloco seguinte interrompe a leitura no meio do arquivo, depois de blocos já enviados.
+# Datas continuam como texto (convertidas na silver); códigos (CEP, DDD e telefone) são texto, como o CONCAT da gold espera
+tipos_csv_bronze = {
+    "bronze.merchants": {
+        "id": pa.string(),
+        "created_at": pa.string(),
+        "enabled": pa.bool_(),
+        "price_range": pa.int64(),
+        "average_ticket": pa.float64(),
+        "takeout_time": pa.int64(),
+        "delivery_time": pa.int64(),
+        "minimum_order_value": pa.float64(),
+        "merchant_zip_code": pa.string(),
+        "merchant_city": pa.string(),
+        "merchant_state": pa.string(),
+        "merchant_country": pa.string()
+    },
+    "bronze.consumer": {
+        "customer_id": pa.string(),
+        "language": pa.string(),
+        "created_at": pa.string(),
+        "active": pa.bool_(),
+        "customer_name": pa.string(),
+        "customer_phone_area": pa.string(),
+        "customer_phone_number": pa.string()
+    },
+    "bronze.ab_test": {
+        "customer_id": pa.string(),
+        "is_target": pa.string()
+    }
+}
+
+# Função que lê um CSV (com ou sem gzip) em record batches do Arrow de tamanho limitado
+def iter_csv_record_batches(stream, compression=None, block_size=16 * 1024 * 1024, column_types=None):
+    """
+    Descomprime e converte o CSV sob demanda: apenas um bloco de ~block_size bytes fica em memória por vez.
+    Os tipos são inferidos a partir do primeiro bloco; use column_types ({coluna: tipo Arrow}) para fixá-los
+    (ex.: tipos_csv_bronze["bronze.merchants"]).
+    """
+    column_types = column_types or {}
+
+    reader = pa_csv.open_csv(
+        pa.input_stream(stream, compression=compression),
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        # Parser de timestamp que nunca casa: datas continuam como texto, igual ao pd.read_csv
+        convert_options=pa_csv.ConvertOptions(column_types=column_types, timestamp_parsers=["\x00"])
+    )
+
+    for batch in reader:
+        yield _temporal_as_string(batch, column_types)
+
+# Função que lê os CSVs de dentro de um .tar.gz em modo streaming, sem extrair o arquivo em disco
+def iter_tar_csv_record_batches(stream, member_name=None, block_size=16 * 1024 * 1024, column_types=None):
+    with tarfile.open(fileobj=stream, mode="r|gz") as tar:
+        for member in tar:
+            nome = os.path.basename(member.name)
+
+            # Ignora diretórios, arquivos de metadados do macOS ('._arquivo.csv') e outros membros
+            if not member.isfile() or nome.startswith("._") or not nome.endswith(".csv"):
+                continue
+            if member_name is not None and nome != member_name:
+                continue
+
+            print(f"Lendo membro do arquivo tar: {member.name}")
+            yield from iter_csv_record_batches(tar.extractfile(member), block_size=block_size, column_types=column_types)
+
+# Função que carrega os record batches na camada bronze em blocos de até rows_per_load linhas
+@profiled()
+def load_record_batches(batches, dataset_nome, tabela_nome, client, insert_date=None, rows_per_load=1_000_000, location="southamerica-east1"):
+    """
+    Acumula os record batches até rows_per_load linhas e envia cada bloco com create_dataset_and_table,
+    de modo que o pico de memória depende do tamanho do bloco e não do tamanho do arquivo.
+    Todos os blocos recebem a mesma coluna insert_date. Retorna o total de linhas carregadas; se um bloco
+    falhar, a ingestão é interrompida com o erro da carga.
+    """
+    if insert_date is None:
+        insert_date = datetime.datetime.now()
+
+    buffer = []
+    linhas_buffer = 0
+    total_linhas = 0
+
+    def enviar(buffer):
+        tabela = pa.Table.from_batches(buffer)
+        df = pl.from_arrow(tabela).with_columns(pl.lit(insert_date).alias("insert_date"))
+        # Um erro na carga interrompe a ingestão em vez de perder o bloco
+        return create_dataset_and_table(
+            df=df,
+            dataset_nome=dataset_nome,
+            tabela_nome=tabela_nome,
+            client=client,
+            location=location
+        )
+
+    for batch in batches:
+        buffer.append(batch)
+        linhas_buffer += batch.num_rows
+
+        if linhas_buffer >= rows_per_load:
+            total_linhas += enviar(buffer)
+            buffer = []
+            linhas_buffer = 0
+
+    if buffer:
+        total_linhas += enviar(buffer)
+
+    print(f"Ingestão de '{dataset_nome}.{tabela_nome}' finalizada com {total_linhas} linhas.")
+    return total_linhas